@@ -0,0 +1,75 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmarks for ``ilcli`` hot paths. Run them with::
+
+  $ python -m benchmarks [--save FILE] [--compare FILE] [filter ...]
+
+Each benchmark is a function registered with :func:`benchmark` which
+returns a dictionary of metric names and values. Time metrics are in
+seconds and memory metrics in bytes: lower is always better.
+"""
+
+import time
+import tracemalloc
+
+#: registered benchmarks, by name
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Register a benchmark function.
+
+    :param name: the name of the benchmark (``group.name``).
+    """
+    def decorator(f):
+        BENCHMARKS[name] = f
+        return f
+    return decorator
+
+
+def best_time(f, repeat=5, number=1):
+    """
+    Run a function several times and return the best time per call.
+
+    :param f: the function to measure (no arguments).
+    :param repeat: number of measures.
+    :param number: number of calls per measure.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            f()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(f):
+    """
+    Return the peak of memory allocated while running a function.
+
+    :param f: the function to measure (no arguments).
+    """
+    tracemalloc.start()
+    try:
+        f()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
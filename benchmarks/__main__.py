@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import benchmarks
+import benchmarks.completion  # noqa: F401
+import benchmarks.dispatch  # noqa: F401
+import benchmarks.help  # noqa: F401
+import benchmarks.kvargs  # noqa: F401
+import benchmarks.output  # noqa: F401
+import benchmarks.startup  # noqa: F401
+
+import ilcli
+
+
+class bench(ilcli.Command):
+    """
+    Run ilcli benchmarks and, optionally, compare them with a baseline.
+    """
+
+    def _init_arguments(self):
+        self.add_argument(
+            'filter', nargs='*',
+            help='run only benchmarks starting with these prefixes'
+        )
+        self.add_argument('--save', help='save the results as baseline')
+        self.add_argument('--compare', help='baseline to compare with')
+        self.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='relative increase considered as a regression '
+                 '(default: %(default)s)'
+        )
+        self.add_argument(
+            '--list', action='store_true', help='list the benchmarks'
+        )
+
+    def _run(self, args):
+        names = sorted(
+            n for n in benchmarks.BENCHMARKS
+            if not args.filter or any(n.startswith(f) for f in args.filter)
+        )
+        if args.list:
+            for name in names:
+                self.out(name)
+            return 0
+
+        baseline = {}
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+
+        results = {}
+        regressions = 0
+        for name in names:
+            results[name] = benchmarks.BENCHMARKS[name]()
+            for metric, value in sorted(results[name].items()):
+                old = baseline.get(name, {}).get(metric)
+                self.out(self._format(name, metric, value, old))
+                if old and value > old * (1 + args.threshold):
+                    regressions += 1
+
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        if regressions:
+            self.err('%d regression(s) found', regressions)
+            return 1
+        return 0
+
+    def _format(self, name, metric, value, old):
+        if 'memory' in metric:
+            line = '{:<24} {:<14} {:>12.1f} KiB'.format(
+                name, metric, value / 1024.0
+            )
+        else:
+            line = '{:<24} {:<14} {:>12.3f} ms'.format(
+                name, metric, value * 1000
+            )
+        if old:
+            line += '  ({:+.1%})'.format(value / old - 1)
+        return line
+
+
+exit(bench().run())
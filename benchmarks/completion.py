@@ -0,0 +1,58 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shell completion latency: the ``awk`` lookup run by the completion
+scripts at every TAB press, in the index of a tree with thousands of
+commands. The lookups complete the options of the last command of the
+index, which is the worst case.
+"""
+
+import os
+import shutil
+import subprocess as sp
+import tempfile
+
+from benchmarks import benchmark, best_time
+from benchmarks.trees import wide
+
+from ilcli import completion
+
+
+@benchmark('completion.wide')
+def completion_metrics():
+    if shutil.which('awk') is None:
+        return {}
+    root, args = wide(leaves=5000)
+    cmd = root()
+    directory = tempfile.mkdtemp()
+    try:
+        index = completion.write_index(
+            cmd, os.path.join(directory, 'completion.idx')
+        )
+        env = dict(os.environ, ILCLI_WORDS=args[0], ILCLI_CUR='--')
+
+        def lookup():
+            sp.check_output(['awk', completion.AWK, index], env=env)
+
+        return {
+            'index': best_time(
+                lambda: completion.write_index(cmd, index), repeat=3
+            ),
+            'lookup': best_time(lookup, number=5)
+        }
+    finally:
+        shutil.rmtree(directory)
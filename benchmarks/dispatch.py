@@ -0,0 +1,40 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Argument dispatch: argparse nested subparsers vs the subcommand lookup
+done by ``Command._parse_known_args()``.
+"""
+
+import functools
+
+from benchmarks import benchmark, best_time
+from benchmarks.trees import TREES
+
+
+def dispatch_metrics(tree):
+    root, args = TREES[tree]()
+    cmd = root()
+    return {
+        'argparse': best_time(
+            lambda: cmd.parser.parse_known_args(args), number=50
+        ),
+        'fast': best_time(lambda: cmd._parse_known_args(args), number=50)
+    }
+
+
+for _tree in TREES:
+    benchmark('dispatch.' + _tree)(functools.partial(dispatch_metrics, _tree))
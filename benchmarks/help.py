@@ -0,0 +1,38 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Help rendering: formatting the help of a leaf inheriting lots of
+options, compared with getting it from the cache of its parser.
+"""
+
+import argparse
+
+from benchmarks import benchmark, best_time
+from benchmarks.trees import heavy
+
+
+@benchmark('help.heavy')
+def help_metrics():
+    root, args = heavy()
+    leaf = root()._subcommands[0]
+    leaf.parser.format_help()
+    return {
+        'format': best_time(
+            lambda: argparse.ArgumentParser.format_help(leaf.parser)
+        ),
+        'cached': best_time(leaf.parser.format_help, number=20)
+    }
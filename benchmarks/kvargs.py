@@ -0,0 +1,54 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Conversion of extra ``--key value`` arguments into a dictionary, from
+a list, from an iterator and with typed values.
+"""
+
+import functools
+
+from benchmarks import benchmark, best_time, peak_memory
+
+from ilcli.args import kv_args_to_dict
+
+
+def _pairs(count):
+    for i in range(count):
+        yield '--key{}'.format(i)
+        yield str(i)
+
+
+def kv_args_metrics(count):
+    arg_list = list(_pairs(count))
+    schema = dict(('key{}'.format(i), int) for i in range(0, count, 2))
+    repeat = 5 if count < 100000 else 2
+    return {
+        'list': best_time(lambda: kv_args_to_dict(arg_list), repeat),
+        'iterator': best_time(
+            lambda: kv_args_to_dict(_pairs(count)), repeat
+        ),
+        'schema': best_time(
+            lambda: kv_args_to_dict(arg_list, schema=schema), repeat
+        ),
+        'iterator_memory': peak_memory(
+            lambda: kv_args_to_dict(_pairs(count))
+        )
+    }
+
+
+benchmark('kvargs.10k')(functools.partial(kv_args_metrics, 10000))
+benchmark('kvargs.1m')(functools.partial(kv_args_metrics, 1000000))
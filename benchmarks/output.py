@@ -0,0 +1,71 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Output of many lines through ``Command.out()`` to a file with each
+buffering policy, and of many records through ``Command.emit()`` in
+each format.
+"""
+
+import functools
+import os
+
+from benchmarks import benchmark, best_time
+
+import ilcli
+
+LINES = 100000
+
+
+def output_metrics(policy):
+    class emitter(ilcli.Command):
+        output_buffering = policy
+
+        def _run(self, args):
+            for i in range(LINES):
+                self.out('line %d', i)
+
+    def run():
+        with open(os.devnull, 'w') as f:
+            emitter(out=f).run([])
+
+    return {'run': best_time(run, repeat=3)}
+
+
+for _policy in ('unbuffered', 'line', 'block'):
+    benchmark('output.' + _policy)(functools.partial(output_metrics, _policy))
+
+
+def records_metrics(output_format):
+    class emitter(ilcli.Command):
+        output_buffering = 'block'
+        record_formats = [output_format]
+
+        def _run(self, args):
+            for i in range(LINES):
+                self.emit({'id': i, 'name': 'item', 'tags': ['a', 'b']})
+
+    def run():
+        with open(os.devnull, 'w') as f:
+            emitter(out=f).run([])
+
+    return {'run': best_time(run, repeat=3)}
+
+
+for _format in ('ndjson', 'csv'):
+    benchmark('output.records.' + _format)(
+        functools.partial(records_metrics, _format)
+    )
@@ -0,0 +1,93 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Construction, parsing and dispatch benchmarks of synthetic trees, built
+as usual, in lazy mode or from a snapshot.
+"""
+
+import functools
+import os
+import shutil
+import subprocess as sp
+import sys
+import tempfile
+import time
+
+from benchmarks import benchmark, best_time, peak_memory
+from benchmarks.trees import TREES
+
+from ilcli import snapshot
+
+
+def tree_metrics(tree, **attrs):
+    root, args = TREES[tree](**attrs)
+    cmd = root()
+    return {
+        'construction': best_time(root),
+        'parse': best_time(
+            lambda: cmd.parser.parse_known_args(args), number=20
+        ),
+        'run': best_time(lambda: cmd.run(args), number=20),
+        'peak_memory': peak_memory(root)
+    }
+
+
+for _tree in TREES:
+    benchmark('tree.' + _tree)(functools.partial(tree_metrics, _tree))
+    benchmark('lazy.' + _tree)(
+        functools.partial(tree_metrics, _tree, lazy_subcommands=True)
+    )
+
+
+def snapshot_metrics(tree):
+    """
+    Loading a tree from its snapshot, and a whole invocation (loading
+    and running the selected leaf) compared with building the tree as
+    usual.
+    """
+    root, args = TREES[tree]()
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'snapshot.json')
+        snapshot.compile_snapshot(root, path)
+        return {
+            'load': best_time(lambda: root.from_snapshot(path)),
+            'invocation': best_time(
+                lambda: root.from_snapshot(path).run(args)
+            ),
+            'plain_invocation': best_time(lambda: root().run(args))
+        }
+    finally:
+        shutil.rmtree(directory)
+
+
+for _tree in TREES:
+    benchmark('snapshot.' + _tree)(functools.partial(snapshot_metrics, _tree))
+
+
+@benchmark('import')
+def import_time():
+    def run():
+        sp.check_call([sys.executable, '-c', 'import ilcli'])
+
+    start = time.perf_counter()
+    sp.check_call([sys.executable, '-c', 'pass'])
+    interpreter = time.perf_counter() - start
+    return {
+        'interpreter': interpreter,
+        'import': max(best_time(run) - interpreter, 0.0)
+    }
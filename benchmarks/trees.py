@@ -0,0 +1,95 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Synthetic command trees used by the benchmarks.
+"""
+
+import ilcli
+
+
+class Leaf(ilcli.Command):
+    """a synthetic leaf command"""
+
+    def _init_arguments(self):
+        self.add_argument('target')
+        self.add_argument('--count', type=int, default=1)
+
+    def _run(self, args):
+        return 0
+
+
+def _node(name, subcommands, options=(), **attrs):
+    def _init_arguments(self):
+        for option in options:
+            self.add_argument(option, help='option ' + option)
+
+    attrs.update({
+        '__doc__': 'synthetic command ' + name,
+        'subcommands': subcommands,
+        '_init_arguments': _init_arguments
+    })
+    return type(name, (ilcli.Command,), attrs)
+
+
+def _leaf(name):
+    return type(name, (Leaf,), {'__doc__': 'synthetic leaf ' + name})
+
+
+def wide(leaves=1000, **attrs):
+    """
+    A root command with lots of leaves.
+
+    :returns: the root class and the arguments selecting the last leaf.
+    """
+    subcommands = [_leaf('leaf{}'.format(i)) for i in range(leaves)]
+    root = _node('wide', subcommands, ['--global'], **attrs)
+    return root, ['leaf{}'.format(leaves - 1), 'x', '--global', 'g']
+
+
+def deep(levels=10, **attrs):
+    """
+    A chain of commands where every level defines an option inherited by
+    the single leaf at the bottom.
+
+    :returns: the root class and the arguments selecting the leaf.
+    """
+    cmd = _leaf('bottom')
+    path = ['bottom']
+    for i in reversed(range(levels)):
+        cmd = _node('level{}'.format(i), [cmd], ['--opt{}'.format(i)],
+                    **(attrs if i == 0 else {}))
+        path.insert(0, cmd.__name__)
+    return cmd, path[1:] + ['x', '--opt0', 'a', '--opt9', 'b']
+
+
+def heavy(options=200, leaves=20, **attrs):
+    """
+    A root command defining lots of options inherited by all its leaves.
+
+    :returns: the root class and the arguments selecting the first leaf.
+    """
+    subcommands = [_leaf('leaf{}'.format(i)) for i in range(leaves)]
+    root = _node(
+        'heavy', subcommands,
+        ['--option{}'.format(i) for i in range(options)],
+        **attrs
+    )
+    return root, ['leaf0', 'x', '--option0', 'a', '--option199', 'b']
+
+
+#: available trees
+TREES = {'wide': wide, 'deep': deep, 'heavy': heavy}
@@ -16,6 +16,6 @@
 
 __version__ = '0.3.2'
 
-from ilcli.command import Command
+from ilcli.command import Command, SubcommandRef
 
-__all__ = ['Command']
+__all__ = ['Command', 'SubcommandRef']
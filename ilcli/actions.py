@@ -17,12 +17,29 @@
 import argparse
 import os
 import shlex
+import shutil
 import subprocess as sp
-import sys
+
+
+class BatchAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        exit(namespace.batch.run_batch())
+
+
+class CompletionAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        from ilcli import completion
+
+        cmd = namespace.completion
+        completion.write_index(cmd)
+        print(completion.script(cmd, values), end='')
+        exit(0)
 
 
 class DocAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
+        from ilcli import manpage
+
         environ = os.environ.copy()
         page = namespace.doc.man_page
         if os.path.isabs(page) and not os.path.isfile(page):
@@ -31,20 +48,29 @@ class DocAction(argparse.Action):
 
         section = getattr(namespace.doc, 'man_section', 1)
         jump_section = getattr(namespace.doc, 'man_jump_into', None)
+        has_man = shutil.which('man') is not None
+        path = None
+        if jump_section is not None or not has_man:
+            path = manpage.locate(page, section)
+        if jump_section is not None and (
+            path is None or manpage.find(path, jump_section) is None
+        ):
+            print(
+                'ERROR - unable to find {} section at {}'.format(
+                    jump_section, page)
+            )
+            exit(1)
+
+        if not has_man:
+            if path is None:
+                print('ERROR - unable to man page "{}"'.format(page))
+                exit(1)
+            import pydoc
+            pydoc.pager(manpage.render(path, jump_section))
+            exit(0)
+
         command = 'man ' + str(section)
         if jump_section is not None:
-            try:
-                sp.check_output(
-                    shlex.split('grep "{}" "{}"'.format(jump_section, page)),
-                    stderr=sp.PIPE,
-                    env=environ
-                )
-            except sp.CalledProcessError:
-                print(
-                    'ERROR - unable to find {} section at {}'.format(
-                        jump_section, page)
-                )
-                exit(1)
             command += " -P 'less -p \"{}\" -G'".format(jump_section)
         command += ' "{}"'.format(page)
         try:
@@ -55,56 +81,20 @@ class DocAction(argparse.Action):
         exit(0)
 
 
+class ServeDaemonAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        from ilcli import daemon
+
+        cmd = namespace.serve_daemon
+        path = getattr(cmd, 'daemon_socket', None)
+        print('serving {} on {}'.format(
+            cmd.name, path or daemon.default_socket_path(cmd)
+        ))
+        exit(daemon.serve(cmd, path))
+
+
 class ServeRestAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
-        import json
-        import io
-
-        from contextlib import contextmanager
-
-        from flask import Flask, request
-
-        @contextmanager
-        def catch_stdout_stderr(cmd, out, err):
-            old_stdout = cmd._out
-            old_stderr = cmd._err
-            old_sys_stdout = sys.stdout
-            old_sys_stderr = sys.stderr
-            cmd._out = out
-            cmd._err = err
-            # sys's out/err need to be caught in case "parse_args" fails
-            # (as it is managed by ArgumentParser)
-            sys.stdout = out
-            sys.stderr = err
-            try:
-                yield
-            finally:
-                cmd.stdout = old_stdout
-                cmd.stderr = old_stderr
-                sys.stdout = old_sys_stdout
-                sys.stderr = old_sys_stderr
-
-        def run_wrapper(cmd):
-            def wrapper():
-                args = [v for _, v in request.args.items()]
-                out = io.StringIO()
-                err = io.StringIO()
-                with catch_stdout_stderr(cmd, out, err):
-                    try:
-                        parsed_args = cmd.parser.parse_args(args)
-                        retcode = cmd._validate_and_run(parsed_args)
-                    except SystemExit:
-                        retcode = 1
-                response = {
-                    'retcode': retcode,
-                    'out': out.getvalue(),
-                    'err': err.getvalue()
-                }
-                return json.dumps(response)
-            return wrapper
-
-        cmd = namespace.serve_rest
-        app = Flask(cmd.name)
-        if not cmd.subcommands:
-            app.add_url_rule('/', cmd.name, run_wrapper(cmd))
-        exit(app.run(host='127.0.0.1'))
+        from ilcli import rest
+
+        exit(rest.serve(namespace.serve_rest))
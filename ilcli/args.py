@@ -14,36 +14,121 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import re
+"""
+Helpers for extra arguments.
+"""
 
+import argparse
+import itertools
 
-def kv_args_to_dict(arg_list):
+#: maximum number of errors detailed in the message of
+#: :class:`ExtraArgumentsError`
+MAX_REPORTED_ERRORS = 10
+
+#: maximum number of arguments shown in the message of
+#: :class:`ExtraArgumentsError`
+MAX_REPORTED_ARGUMENTS = 20
+
+# marker of a missing value
+_MISSING = object()
+
+
+class ExtraArgumentsError(ValueError):
+    """
+    Extra arguments are not pairs of ``--key value``.
+
+    :param errors: list of ``(position, reason)`` of every bad argument.
+    :param arg_list: the arguments, if they are a list.
+    """
+
+    def __init__(self, errors, arg_list=None):
+        self.errors = errors
+        message = "bad extra arguments. Pairs of '--key value' are expected."
+        if arg_list is not None:
+            got = ' '.join(arg_list[:MAX_REPORTED_ARGUMENTS])
+            if len(arg_list) > MAX_REPORTED_ARGUMENTS:
+                got += ' ... ({} more)'.format(
+                    len(arg_list) - MAX_REPORTED_ARGUMENTS
+                )
+            message += ' Got: {}.'.format(got)
+        details = [
+            '{}: {}'.format(position, reason)
+            for position, reason in errors[:MAX_REPORTED_ERRORS]
+        ]
+        if len(errors) > MAX_REPORTED_ERRORS:
+            details.append(
+                '... ({} more)'.format(len(errors) - MAX_REPORTED_ERRORS)
+            )
+        message += ' Errors at {}'.format('; '.join(details))
+        super(ExtraArgumentsError, self).__init__(message)
+
+
+def kv_args_to_dict(arg_list, schema=None):
     """
     Convert a list of key-value args with the form::
 
       --key value
 
-    into a dictionary. In case of parsing failure, ``cmd.parser.error``
-    will be called, making the program existing with error status.
+    into a dictionary. Arguments are read once, in a single pass, so
+    ``arg_list`` can also be an iterator (e.g. reading a file) which is
+    never held in memory as a whole.
+
+    Values are strings unless their key is in ``schema``, which maps
+    keys to functions converting values, as the ``type`` of argparse
+    arguments::
+
+      kv_args_to_dict(extra_args, schema={'count': int})
 
-    :param arg_list: the list of arguments (typically the parameter of
-      ``_validate_extra_arguments()``).
+    :param arg_list: the list or iterable of arguments (typically the
+      parameter of ``_validate_extra_arguments()``).
+    :param schema: optional dictionary of conversion functions by key.
+    :raises ExtraArgumentsError: (a ``ValueError``) if the arguments are
+      not pairs of ``--key value`` or a value cannot be converted. All
+      the bad arguments are reported, with their position.
     """
-    short_arg_list = [a for a in arg_list if re.match(r'^\-[^\-]', a)]
-    bad_size = len(arg_list) % 2 == 1
-    bad_keys = [
-        k for i, k in enumerate(arg_list)
-        if k.startswith('--') and i % 2 == 1
-    ]
-    bad_vals = [
-        k for i, k in enumerate(arg_list)
-        if not k.startswith('--') and i % 2 == 0
-    ]
-    if short_arg_list or bad_size or bad_keys or bad_vals:
-        raise ValueError(
-            "bad extra arguments. Pairs of '--key value' are expected. "
-            "Got: {}".format(' '.join(arg_list))
+    result = {}
+    errors = []
+    schema = schema or {}
+    args = iter(arg_list)
+    pairs = itertools.zip_longest(args, args, fillvalue=_MISSING)
+    for position, (key, value) in zip(itertools.count(0, 2), pairs):
+        bad = False
+        if key.startswith('--'):
+            key = key.lstrip('-')
+        else:
+            errors.append((position, _reason(key, 'a key')))
+            bad = True
+        if value is _MISSING:
+            errors.append((position + 1, 'missing value'))
+            break
+        if value[:1] == '-' and value != '-':
+            errors.append((position + 1, _reason(value, 'a value')))
+            bad = True
+        if bad:
+            continue
+
+        convert = schema.get(key)
+        if convert is not None:
+            try:
+                value = convert(value)
+            except argparse.ArgumentTypeError as e:
+                errors.append((position + 1, str(e)))
+                continue
+            except (TypeError, ValueError):
+                errors.append((position + 1, 'invalid {} value {!r}'.format(
+                    getattr(convert, '__name__', repr(convert)), value
+                )))
+                continue
+        result[key] = value
+
+    if errors:
+        raise ExtraArgumentsError(
+            errors, arg_list if isinstance(arg_list, (list, tuple)) else None
         )
-    extra_arg_list = [a.lstrip('-') for a in arg_list if a.startswith('--')]
-    extra_values = [a for a in arg_list if not a.startswith('--')]
-    return dict(zip(extra_arg_list, extra_values))
+    return result
+
+
+def _reason(arg, expected):
+    if arg.startswith('-') and not arg.startswith('--') and len(arg) > 1:
+        return '{!r} is a short option'.format(arg)
+    return '{!r} is not {}'.format(arg, expected)
@@ -0,0 +1,240 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Batch execution: run many invocations of a command tree in a single
+process.
+
+Records are read one per line, with the arguments of an invocation
+using shell syntax (empty lines and ``#`` comments are skipped). The
+result of every record is written as a JSON object per line, numbered
+by its line in the input::
+
+  {"record": 1, "args": ["net", "ssh", "host"], "retcode": 0,
+   "out": "...", "err": ""}
+
+Errors exiting the program (e.g. argument errors), unexpected
+exceptions and lines which cannot be split (e.g. unterminated quotes,
+reported with exit code 2 and ``null`` args) only affect the record
+causing them.
+
+Records can also be run in parallel by a pool of processes, each one
+building the command tree once (from the same snapshot, if any) and
+running the records with the same command. Results are written in the
+order of the records or, optionally, as soon as they finish. In that
+case, the root command class must be importable by the worker processes
+and it is built without constructor arguments.
+"""
+
+import collections
+import io
+import json
+import os
+import shlex
+import sys
+import traceback
+from concurrent import futures
+
+from ilcli import streams
+
+
+def iter_records(source):
+    """
+    Read the records of a batch.
+
+    :param source: a file-like object or a path (``-`` for
+      ``sys.stdin``).
+    :returns: a generator of ``(number, args)``: the line number and its
+      list of arguments or, if the line cannot be split, the
+      ``ValueError`` describing it.
+    """
+    if isinstance(source, str) and source != '-':
+        with open(source) as f:
+            for record in iter_records(f):
+                yield record
+        return
+    if source == '-':
+        source = sys.stdin
+    for number, line in enumerate(source, 1):
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as e:
+            yield number, ValueError(
+                'invalid record: {}: {}'.format(e, line.strip())
+            )
+            continue
+        if args:
+            yield number, args
+
+
+def run_record(cmd, args):
+    """
+    Run a single invocation of a command tree capturing its output.
+
+    :param cmd: the root command.
+    :param args: list of arguments.
+    :returns: a dictionary with the arguments, return code, output and
+      error output.
+    """
+    out = io.StringIO()
+    err = io.StringIO()
+    with streams.capture(out, err):
+        try:
+            parsed_args, extra_args = cmd._parse_known_args(args)
+            retcode = parsed_args.func(parsed_args, extra_args=extra_args)
+        except SystemExit as e:
+            retcode = e.code
+        except Exception:
+            err.write(traceback.format_exc())
+            retcode = 1
+        retcode = exit_code(retcode, err)
+    return {
+        'args': args,
+        'retcode': retcode,
+        'out': out.getvalue(),
+        'err': err.getvalue()
+    }
+
+
+def exit_code(retcode, err):
+    """
+    Convert a return value into an exit code as ``sys.exit()`` does:
+    ``None`` is success and anything but an integer is written to the
+    error output and treated as a failure.
+
+    :param retcode: the return value of a command.
+    :param err: the error output.
+    """
+    if retcode is None:
+        return 0
+    if isinstance(retcode, int):
+        return retcode
+    err.write('{}\n'.format(retcode))
+    return 1
+
+
+def aggregate(retcodes):
+    """
+    Exit code of a batch: the highest exit code of its records (so
+    ``0`` only if all of them succeeded).
+
+    :param retcodes: iterable of exit codes.
+    """
+    return max(retcodes, default=0)
+
+
+def run_batch(cmd, source=None, workers=1, ordered=True):
+    """
+    Run a batch of invocations of a command tree.
+
+    :param cmd: the root command.
+    :param source: a file-like object or a path with the records.
+      Default ``sys.stdin``.
+    :param workers: number of worker processes running the records (0
+      for the number of CPUs). If 1, records run in this process.
+    :param ordered: if ``False``, results are written as soon as the
+      records finish instead of in the order of the records.
+    :returns: the exit code of the batch (see :func:`aggregate`).
+    """
+    streams.install()
+    records = iter_records(source or '-')
+    if workers == 1:
+        results = (_run_numbered(cmd, record) for record in records)
+    else:
+        results = _run_parallel(
+            cmd, records, workers or os.cpu_count(), ordered
+        )
+    retcodes = []
+    for result in results:
+        retcodes.append(result['retcode'])
+        cmd.out(json.dumps(result))
+    return aggregate(retcodes)
+
+
+def _run_numbered(cmd, record):
+    number, args = record
+    result = {'record': number}
+    if isinstance(args, ValueError):
+        result.update(args=None, retcode=2, out='', err=str(args) + '\n')
+    else:
+        result.update(run_record(cmd, args))
+    return result
+
+
+def _run_parallel(cmd, records, workers, ordered):
+    """
+    Run records in a pool of processes, keeping a bounded number of
+    them in flight so records are read as they are needed.
+
+    :returns: a generator of results.
+    """
+    with futures.ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=_tree(cmd)
+    ) as pool:
+        pending = collections.deque()
+        for record in records:
+            pending.append(pool.submit(_run_in_worker, record))
+            if len(pending) < workers * 4:
+                continue
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = futures.wait(
+                    pending, return_when=futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+        if ordered:
+            for future in pending:
+                yield future.result()
+        else:
+            for future in futures.as_completed(pending):
+                yield future.result()
+
+
+# command tree of a worker process
+_worker_cmd = None
+
+
+def _tree(cmd):
+    """
+    How worker processes build a command: the class of its root command,
+    the path of the snapshot the tree was built from (if any) and the
+    names of the subcommands down to the command.
+    """
+    names = []
+    while cmd._parent is not None:
+        names.insert(0, cmd.name)
+        cmd = cmd._parent
+    snapshot_file = getattr(cmd, '_snapshot_file', None)
+    return type(cmd), snapshot_file and snapshot_file[0], names
+
+
+def _init_worker(cmd_class, snapshot_path, names):
+    global _worker_cmd
+    streams.install()
+    if snapshot_path is None:
+        cmd = cmd_class()
+    else:
+        cmd = cmd_class.from_snapshot(snapshot_path)
+    for name in names:
+        cmd = cmd._subcommand(name)
+    _worker_cmd = cmd
+
+
+def _run_in_worker(record):
+    return _run_numbered(_worker_cmd, record)
@@ -0,0 +1,232 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+On-disk cache of command results (see ``result_cache_ttl`` class
+attribute of :class:`~ilcli.Command`).
+
+The output, error output and return code of a successful run are
+stored in a file per result (only readable by the user), keyed by the
+command (including the class of the root command, so different CLIs
+never share results), its parsed and extra arguments and the values of
+some environment variables, under ``~/.cache/ilcli/results``. Results
+expire after a number of seconds and only the most recently used ones
+are kept. Only the output written through the command (``out()``,
+``err()``, ``emit()``) is cached.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+
+from ilcli import streams
+from ilcli.files import cache_dir, write_json
+
+# parsed arguments which do not change the result of a command
+_IGNORED = frozenset(['func', 'no_cache'])
+
+
+class ResultCache(object):
+    """
+    Results of a command, one JSON file each in a directory.
+
+    :param directory: the directory of the results.
+    :param ttl: seconds a result is valid.
+    :param size: maximum number of results kept.
+    """
+
+    def __init__(self, directory, ttl, size):
+        self.directory = directory
+        self.ttl = ttl
+        self.size = size
+
+    def get(self, key):
+        """
+        Get a result.
+
+        :param key: the key of the result (see :func:`key`).
+        :returns: a dictionary with the return code, output and error
+          output, or ``None`` if the result is not cached or expired.
+        """
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            if time.time() < result['expires']:
+                # most recently used
+                os.utime(path)
+                return result
+            os.remove(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def put(self, key, retcode, out, err):
+        """
+        Store a result if the command succeeded, evicting the least
+        recently used ones if there are too many.
+
+        :param key: the key of the result (see :func:`key`).
+        :param retcode: the return code of the command.
+        :param out: the output.
+        :param err: the error output.
+        """
+        if retcode not in (None, 0):
+            return
+        try:
+            write_json(self._path(key), {
+                'expires': time.time() + self.ttl,
+                'retcode': retcode,
+                'out': out,
+                'err': err
+            }, mode=0o600)
+            self._evict()
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        if len(entries) <= self.size:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.size]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+
+def directory(cmd):
+    """
+    Directory of the cached results of a command.
+
+    :param cmd: the command.
+    """
+    return os.path.join(
+        cache_dir(), 'results', _root_class(cmd), '.'.join(_names(cmd))
+    )
+
+
+def key(cmd, parsed_args, extra_args=None, env=()):
+    """
+    Key of the result of a command.
+
+    :param cmd: the command.
+    :param parsed_args: the parsed arguments.
+    :param extra_args: the extra arguments.
+    :param env: names of the environment variables the result depends
+      on.
+    :returns: the key or ``None`` if the arguments have values which
+      cannot be compared between processes (e.g. open files).
+    """
+    from ilcli.command import _ADDRESS, Command
+
+    values = sorted(
+        (dest, '.'.join(_names(value)) if isinstance(value, Command)
+         else value)
+        for dest, value in vars(parsed_args).items() if dest not in _IGNORED
+    )
+    text = repr([
+        _root_class(cmd), _names(cmd), values, extra_args,
+        [(name, os.environ.get(name)) for name in env]
+    ])
+    if _ADDRESS.search(text):
+        return None
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _root_class(cmd):
+    while cmd._parent is not None:
+        cmd = cmd._parent
+    return '{}.{}'.format(type(cmd).__module__, type(cmd).__qualname__)
+
+
+def _names(cmd):
+    names = []
+    while cmd is not None:
+        names.insert(0, cmd.name)
+        cmd = cmd._parent
+    return names
+
+
+@contextlib.contextmanager
+def recording(out, err):
+    """
+    Capture the output and error output of the commands run in the
+    current context (see :func:`ilcli.streams.capture`) while still
+    writing them to their streams::
+
+      with recording(out, err) as (recorded_out, recorded_err):
+          cmd._run(args)
+
+    :param out: stream for the output.
+    :param err: stream for the error output.
+    :returns: the recorded output and error output (``io.StringIO``).
+    """
+    recorded = (io.StringIO(), io.StringIO())
+    with streams.capture(
+        _Tee(out, recorded[0]), _Tee(err, recorded[1])
+    ):
+        yield recorded
+
+
+def replay(result, out, err):
+    """
+    Write the output and error output of a cached result.
+
+    :param result: the result (see :meth:`ResultCache.get`).
+    :param out: stream for the output.
+    :param err: stream for the error output.
+    :returns: the return code of the result.
+    """
+    if result['out']:
+        out.write(result['out'])
+    if result['err']:
+        err.write(result['err'])
+    return result['retcode']
+
+
+class _Tee(object):
+    """
+    File-like object writing to a stream and recording what is written.
+    """
+
+    def __init__(self, stream, recorded):
+        self._stream = stream
+        self._recorded = recorded
+
+    def write(self, data):
+        self._recorded.write(data)
+        return self._stream.write(data)
+
+    def flush(self):
+        return self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
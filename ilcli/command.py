@@ -16,9 +16,191 @@
 
 
 import argparse
+import contextlib
+import copy
+import functools
+import hashlib
+import importlib
+import inspect
+import re
+import shutil
 import sys
 
-from ilcli.actions import DocAction, ServeRestAction
+from ilcli import response
+from ilcli import streams
+from ilcli import timing
+from ilcli.actions import (
+    BatchAction, CompletionAction, DocAction, ServeDaemonAction,
+    ServeRestAction
+)
+
+
+async def _resolve(value):
+    """
+    Await a value if it is awaitable (e.g. the result of calling a
+    coroutine function).
+    """
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+# memory addresses in the repr() of objects
+_ADDRESS = re.compile(' at 0x[0-9a-fA-F]+')
+
+
+class _Run(object):
+    """
+    Result of a run of a command (see ``Command._running()``).
+
+    :param retval: the return value.
+    :param cached: whether it was replayed from the result cache.
+    """
+
+    def __init__(self, retval=None, cached=False):
+        self.retval = retval
+        self.cached = cached
+
+
+class _Parser(argparse.ArgumentParser):
+    """
+    ``ArgumentParser`` used by :class:`Command`, caching the usage and
+    help messages. They are keyed by a hash of the definition of the
+    parser and the terminal width, so they are formatted again whenever
+    any of them changes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_Parser, self).__init__(*args, **kwargs)
+        # formatted messages, by key
+        self._ilcli_messages = {}
+        # function storing a formatted message persistently (if any)
+        self._ilcli_store = None
+
+    def format_usage(self):
+        return self._ilcli_format(
+            'usage', super(_Parser, self).format_usage
+        )
+
+    def format_help(self):
+        return self._ilcli_format('help', super(_Parser, self).format_help)
+
+    def _ilcli_format(self, kind, formatter):
+        key = '{}:{}:{}'.format(
+            kind, shutil.get_terminal_size().columns, self._ilcli_digest()
+        )
+        message = self._ilcli_messages.get(key)
+        if message is None:
+            message = self._ilcli_messages[key] = formatter()
+            if self._ilcli_store is not None:
+                self._ilcli_store(key, message)
+        return message
+
+    def _ilcli_digest(self):
+        """
+        Hash of everything in the parser which is used for formatting
+        its messages.
+        """
+        state = [
+            self.prog, self.usage, self.description, self.epilog,
+            self.formatter_class, self.prefix_chars
+        ]
+        groups = [(g.title, g.description, g._group_actions)
+                  for g in self._action_groups]
+        groups.extend((g.required, None, g._group_actions)
+                      for g in self._mutually_exclusive_groups)
+        for title, description, actions in groups:
+            state.append((title, description))
+            state.extend(
+                (type(a), a.option_strings, a.dest, a.nargs, a.const,
+                 a.default, a.required, a.help, a.metavar,
+                 sorted(a.choices) if isinstance(a.choices, set)
+                 else a.choices,
+                 [(c.dest, c.help, c.metavar)
+                  for c in getattr(a, '_choices_actions', ())])
+                for a in actions
+            )
+        text = _ADDRESS.sub('', repr(state))
+        return hashlib.sha1(text.encode()).hexdigest()
+
+
+class _LazyChoices(dict):
+    """
+    Parsers of the subcommands by name (the ``choices`` of the
+    subparsers action) of a lazy :class:`Command`. Lazy subcommands are
+    registered with a ``None`` parser, and they are built (including
+    their parser) the first time their parser is looked up.
+
+    :param loader: function building a subcommand by name.
+    """
+
+    def __init__(self, loader):
+        super(_LazyChoices, self).__init__()
+        self._loader = loader
+
+    def __getitem__(self, name):
+        parser = super(_LazyChoices, self).__getitem__(name)
+        if parser is None:
+            parser = self._loader(name).parser
+        return parser
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+
+class SubcommandRef(object):
+    """
+    A subcommand class given by its import path, so its module (and
+    everything it imports) is only imported when the subcommand is
+    selected in the command line or its help is requested::
+
+      subcommands = [
+          SubcommandRef('mycli.net:net', help='network tools')
+      ]
+
+    Referenced subcommands are always built lazily (see
+    ``lazy_subcommands``).
+
+    :param path: ``package.module:ClassName``.
+    :param name: the name of the subcommand. By default, the class name
+      in lower case.
+    :param help: one-line help of the subcommand.
+    """
+
+    def __init__(self, path, name=None, help=None):
+        module, _, qualname = path.partition(':')
+        if not module or not qualname:
+            raise ValueError('invalid subcommand path: {!r}'.format(path))
+        self.path = path
+        self.module = module
+        self.qualname = qualname
+        self.__name__ = qualname.rpartition('.')[2]
+        self.name = name or self.__name__.lower()
+        self.__doc__ = help
+        self._class = None
+
+    def load(self):
+        """
+        Import the subcommand class.
+        """
+        if self._class is None:
+            obj = importlib.import_module(self.module)
+            for attr in self.qualname.split('.'):
+                obj = getattr(obj, attr)
+            self._class = obj
+        return self._class
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return 'SubcommandRef({!r})'.format(self.path)
 
 
 class Command(object):
@@ -27,13 +209,17 @@ class Command(object):
     class in order to create a cli.
     """
 
-    #: the list classes of subcommands
+    #: the list classes of subcommands (or :class:`SubcommandRef`)
     subcommands = []
 
     #: list of arguments identified by their name (-f,--foo for options, foo
     # for positional arguments) a subcommand should ignore
     ignore_arguments = []
 
+    #: entry point group where other distributions register subcommands
+    # of this command (see :mod:`ilcli.plugins`)
+    plugin_group = None
+
     #: the name of the command (if None, class name by default)
     name = None
 
@@ -43,74 +229,356 @@ class Command(object):
     #: inherit arguments from parent commands
     inherit_arguments = True
 
+    #: number of worker threads running REST requests concurrently (see
+    # ``serve_rest``). If None, the ``ThreadPoolExecutor`` default
+    rest_workers = None
+
+    #: maximum number of output lines buffered per streamed REST response
+    rest_stream_buffer = 64
+
+    #: number of processes running batches (see ``run_batch()``): 1 to
+    # run them in the same process, 0 for the number of CPUs
+    batch_workers = 1
+
+    #: write batch results in the order of their records (otherwise, as
+    # soon as they finish)
+    batch_ordered = True
+
+    #: buffering policy of the output and error output: 'unbuffered',
+    # 'line', 'block' or 'auto' (see :mod:`ilcli.streams`)
+    output_buffering = 'line'
+
+    #: maximum number of characters buffered ('block' buffering)
+    output_buffer_size = 65536
+
+    #: maximum seconds the output stays buffered ('block' buffering)
+    output_flush_interval = 1.0
+
+    #: formats of the records written by ``emit()``, e.g. ``['ndjson',
+    # 'csv']`` (see :mod:`ilcli.records`). If set, an ``--output``
+    # argument selecting one of them (the first one by default) is
+    # inherited by the subcommands
+    record_formats = None
+
+    #: number of functions in the summary of ``--profile`` (see
+    # ``profile_mode``)
+    profile_top = 20
+
+    #: build subcommands only when they are selected in the command line
+    # (it applies to the whole tree under this command)
+    lazy_subcommands = False
+
+    #: seconds the results of the validation methods of this command are
+    # cached when it runs as an ancestor of the invoked command, keyed by
+    # the values of its arguments. If None, they are not cached (see
+    # :mod:`ilcli.validation`)
+    validation_cache_ttl = None
+
+    #: maximum number of validation results cached
+    validation_cache_size = 128
+
+    #: run the validation methods of the invoked command and its ancestors
+    # concurrently (it applies to the whole tree under this command)
+    concurrent_validation = False
+
+    #: seconds the results (output, error output and return code) of
+    # successful runs are cached on disk, keyed by the parsed arguments.
+    # If set, a ``--no-cache`` argument bypassing the cache is inherited
+    # by the subcommands. If None, results are not cached (see
+    # :mod:`ilcli.cache`). It applies to the whole tree under this
+    # command
+    result_cache_ttl = None
+
+    #: maximum number of results cached per command
+    result_cache_size = 256
+
+    #: names of the environment variables the results of this command and
+    # its subcommands depend on
+    result_cache_env = ()
+
     def __init__(
-        self, parser=None, parent=None, name=None, out=None, err=None
+        self, parser=None, parent=None, name=None, out=None, err=None,
+        snapshot=None
     ):
+        start = timing.clock() if timing.active else None
         self.name = name or self.name or self.__class__.__name__.lower()
-        self.parser = parser or argparse.ArgumentParser(
+        self.parser = parser or _Parser(
             prog=self.name,
             **self.parser_args
         )
         self._parent = parent
+        self._snapshot = snapshot
+        # distinct actions of the snapshot (see ilcli.snapshot)
+        self._snapshot_table = None
 
         self.help = self.__doc__ or ''
         self._subcommands = []
+        self._lazy = self.lazy_subcommands or bool(parent and parent._lazy)
+        self._concurrent_validation = self.concurrent_validation or bool(
+            parent and parent._concurrent_validation
+        )
+        self._validation_cache = None
+        if self.validation_cache_ttl is not None:
+            from ilcli import validation
+            self._validation_cache = validation.Cache(
+                self.validation_cache_size, self.validation_cache_ttl
+            )
+        self._validation_dests = None
+        # (ttl, size, environment variables) of the result cache
+        config = parent and parent._result_cache_config
+        if self.result_cache_ttl is not None:
+            config = (self.result_cache_ttl, self.result_cache_size,
+                      config[2] if config else ())
+        if config and self.result_cache_env:
+            config = config[:2] + (config[2] + tuple(self.result_cache_env),)
+        self._result_cache_config = config
+        self._result_cache = None
+        # subcommands not built yet (lazy mode), by name
+        self._pending = {}
+        # the subparsers action (if any)
+        self._subparsers = None
+        # built subcommands, by name
+        self._dispatch = {}
+        self._dispatch_info = None
+        self._async = None
+        # arguments passed to the children
+        self._inherited = []
+        self._resolved = False
+        self._ignored = frozenset(self.ignore_arguments)
         self._err = err or (self._parent and self._parent._err) or sys.stderr
         self._out = out or (self._parent and self._parent._out) or sys.stdout
+        self._err_writer = self._writer(
+            self._err, self._parent and self._parent._err_writer
+        )
+        self._out_writer = self._writer(
+            self._out, self._parent and self._parent._out_writer
+        )
 
         self._known_options = set()
 
+        if self.plugin_group:
+            from ilcli import plugins
+            self.subcommands = plugins.subcommands(type(self))
+
         if not self.subcommands:
             self.parser.set_defaults(func=self._validate_and_run)
         else:
             # Make sub parsers
-            subps = self.parser.add_subparsers(dest='cmd')
+            subps = self.parser.add_subparsers(
+                dest='cmd', parser_class=_Parser
+            )
             subps.required = True
+            # subcommands built from a snapshot are built lazily too
+            lazy = self._lazy or snapshot is not None
+            if lazy or any(
+                isinstance(c, SubcommandRef) for c in self.subcommands
+            ):
+                subps._name_parser_map = subps.choices = _LazyChoices(
+                    self._load_subcommand
+                )
+            self._subparsers = subps
             for c in self.subcommands:
-                new_parser = subps.add_parser(
-                    c.name or c.__name__.lower(),
-                    help=c.__doc__,
-                    **self.parser_args
+                name = c.name or c.__name__.lower()
+                if lazy or isinstance(c, SubcommandRef):
+                    # only registered (with its help): the parser is
+                    # built with the subcommand, when it is looked up
+                    self._pending[name] = c
+                    subps._choices_actions.append(
+                        subps._ChoicesPseudoAction(name, (), c.__doc__)
+                    )
+                    dict.__setitem__(subps.choices, name, None)
+                else:
+                    new_parser = subps.add_parser(
+                        name,
+                        help=c.__doc__,
+                        **self.parser_args
+                    )
+                    cmd = c(parser=new_parser, parent=self,
+                            **self._subcommand_snapshot(name))
+                    self._subcommands.append(cmd)
+                    self._dispatch[name] = cmd
+
+        if snapshot is None:
+            self.init_arguments()
+        else:
+            from ilcli import snapshot as _snapshot
+            _snapshot.apply(self, snapshot)
+            if isinstance(self.parser, _Parser):
+                self.parser._ilcli_messages.update(snapshot.get('help', {}))
+                self.parser._ilcli_store = functools.partial(
+                    _snapshot.store_help, self
                 )
-                cmd = c(parser=new_parser, parent=self)
-                self._subcommands.append(cmd)
+        if parent is None:
+            self._resolve_arguments()
+        if start is not None:
+            timing.record('construct', self, start)
+
+    @classmethod
+    def from_snapshot(cls, path=None, **kwargs):
+        """
+        Build the command tree from its persisted snapshot, so
+        ``_init_arguments()`` and the argument inheritance do not need
+        to be executed. The snapshot is (re)written when it does not
+        exist or any source module of the tree has changed. See
+        :mod:`ilcli.snapshot`.
 
-        self.init_arguments()
+        :param path: the path of the snapshot (optional).
+        :param kwargs: extra arguments for the constructor.
+        """
+        from ilcli import snapshot
+        return snapshot.load(cls, path=path, **kwargs)
+
+    def _subcommand_snapshot(self, name):
+        if self._snapshot is None or name not in self._snapshot['subcommands']:
+            # e.g. a plugin installed after the snapshot was written
+            return {}
+        return {'snapshot': self._snapshot['subcommands'][name]}
 
     def add_argument(self, *args, **kwargs):
         """
         Add an argument to the internal parser. It accepts the same syntax as
-         ``argparse.ArgumentParser.add_argument()``.
+         ``argparse.ArgumentParser.add_argument()``, plus an optional
+         ``completer``: a function returning the possible values of the
+         argument starting with a prefix, for shell completion (see
+         :mod:`ilcli.completion`).
 
         :param args: arguments to pass to ``argparse.ArgumentParser``
         :param kwargs: key-value arguments to pass to
           ``argparse.ArgumentParser``
         """
         chars = self.parser.prefix_chars
-        if not args or len(args) == 1 and args[0][0] not in chars:
-            option_strings = args
+        optional = not (not args or len(args) == 1 and args[0][0] not in chars)
+        self._inherit([(args, kwargs, optional, {})])
+
+    def _inherit(self, arguments):
+        """
+        Add arguments (defined by this command or inherited from the
+        parent). Leaf commands add them to their parser while the rest
+        keep them in ``self._inherited`` so they are passed to all the
+        subcommands at once (see ``_resolve_arguments()``).
+
+        :param arguments: list of ``(option_strings, kwargs, optional,
+          actions)`` tuples where ``actions`` caches the argparse actions
+          created for the argument.
+        """
+        for option_strings, kwargs, optional, actions in arguments:
+            if optional:
+                option_strings = tuple(
+                    o for o in option_strings if o not in self._known_options
+                )
+                if not option_strings:
+                    # Cannot add the requested argument, so do nothing
+                    continue
+                self._known_options.update(option_strings)
+
+            if not self.subcommands:
+                if self._ignored.isdisjoint(option_strings):
+                    self._add_parser_argument(option_strings, kwargs, actions)
+                continue
+
+            argument = (option_strings, kwargs, optional, actions)
+            self._inherited.append(argument)
+            if self._resolved:
+                for c in self._subcommands:
+                    self._pass_arguments(c, [argument])
+
+    def _add_parser_argument(self, option_strings, kwargs, actions):
+        """
+        Add an argument to the parser, copying the action already created
+        for another parser with the same settings (if any) as building
+        and checking argparse actions is expensive. Each parser gets its
+        own copy so changing it (e.g. ``set_defaults()``) does not affect
+        the rest. Arguments whose default was set in the parser with
+        ``set_defaults()`` are always built by the parser, as argparse
+        takes their default from there.
+        """
+        parser = self.parser
+        completer = kwargs.get('completer')
+        if completer is not None:
+            kwargs = dict(kwargs)
+            del kwargs['completer']
+        if parser.conflict_handler != 'error':
+            action = parser.add_argument(*option_strings, **kwargs)
         else:
-            opt_from_kwargs = self.parser._get_optional_kwargs(
-                *args,
-                **kwargs
-            )['option_strings']
-            option_strings = set(opt_from_kwargs) - self._known_options
-            self._known_options.update(option_strings)
-
-            if len(option_strings) == 0:
-                # Cannot add the requested argument, so do nothing
-                return
-
-        if not self._subcommands:
-            to_ignore = set(option_strings) & set(self.ignore_arguments)
-            if not to_ignore:
-                self.parser.add_argument(*option_strings, **kwargs)
-            return
+            key = (
+                option_strings, parser.prefix_chars, parser.argument_default
+            )
+            action = actions.get(key)
+            if action is not None and action.dest not in parser._defaults:
+                action = parser._add_action(copy.copy(action))
+            else:
+                action = parser.add_argument(*option_strings, **kwargs)
+                if action.dest not in parser._defaults:
+                    actions.setdefault(key, action)
+        if completer is not None:
+            action.completer = completer
+
+    def _pass_arguments(self, cmd, arguments):
+        if cmd.inherit_arguments:
+            cmd._inherit([
+                a for a in arguments if cmd._ignored.isdisjoint(a[0])
+            ])
 
+    def _resolve_arguments(self):
+        """
+        Pass the arguments of this command to the whole tree of (built)
+        subcommands in a single pass. It is executed once the whole tree
+        has been built, so each argument is passed to each command once.
+        """
+        self._resolved = True
         for c in self._subcommands:
-            to_ignore = set(option_strings) & set(c.ignore_arguments)
-            if c.inherit_arguments and not to_ignore:
-                c.add_argument(*option_strings, **kwargs)
+            self._pass_arguments(c, self._inherited)
+            c._resolve_arguments()
+
+    def _load_subcommand(self, name):
+        """
+        Build a subcommand which has not been built yet (lazy mode) and
+        pass it the arguments it inherits.
+
+        :param name: the name of the subcommand.
+        :returns: the subcommand.
+        """
+        c = self._pending.pop(name)
+        subps = self._subparsers
+        kwargs = dict(self.parser_args)
+        if kwargs.get('prog') is None:
+            kwargs['prog'] = '{} {}'.format(subps._prog_prefix, name)
+        parser = subps._parser_class(**kwargs)
+        dict.__setitem__(subps.choices, name, parser)
+        cmd = c(
+            parser=parser, parent=self, name=name,
+            **self._subcommand_snapshot(name)
+        )
+        self._pass_arguments(cmd, self._inherited)
+        cmd._resolve_arguments()
+        self._subcommands.append(cmd)
+        self._dispatch[name] = cmd
+        return cmd
+
+    def _subcommand(self, name):
+        """
+        Get a subcommand by name, building it if needed (lazy mode).
+
+        :param name: the name of the subcommand.
+        :returns: the subcommand or ``None`` if it does not exist.
+        """
+        cmd = self._dispatch.get(name)
+        if cmd is None and name in self._pending:
+            cmd = self._load_subcommand(name)
+        return cmd
+
+    def load_subcommands(self):
+        """
+        Build the whole tree of subcommands under this command. This is
+        only needed in lazy mode (see ``lazy_subcommands``) when all the
+        subcommands are required (e.g. for walking ``_subcommands``).
+        """
+        for c in self.subcommands:
+            name = c.name or c.__name__.lower()
+            if name in self._pending:
+                self._load_subcommand(name)
+        for cmd in self._subcommands:
+            cmd.load_subcommands()
 
     def init_arguments(self):
         """
@@ -121,6 +589,26 @@ class Command(object):
         """
         self._init_arguments()
 
+        if self.record_formats:
+            self.add_argument(
+                '--output', dest='output_format',
+                choices=self.record_formats, default=self.record_formats[0],
+                help='format of the output records (default: %(default)s)'
+            )
+        if self.result_cache_ttl is not None:
+            self.add_argument(
+                '--no-cache', action='store_true',
+                help='run the command instead of using its cached result'
+            )
+        if getattr(self, 'profile_mode', False):
+            self.add_argument(
+                '--profile', dest='profile_file', nargs='?', const='',
+                metavar='FILE',
+                help='profile the command and write a summary to the error '
+                     'output, and the stats to FILE (in callgrind format if '
+                     'its name starts with callgrind.out or ends with '
+                     '.callgrind)'
+            )
         if hasattr(self, 'man_page'):
             self.parser.add_argument(
                 '--doc', nargs=0, default=self,
@@ -133,6 +621,25 @@ class Command(object):
                 action=ServeRestAction,
                 help='start a REST server'
             )
+        if getattr(self, 'serve_daemon', False):
+            self.parser.add_argument(
+                '--serve-daemon', nargs=0, default=self,
+                action=ServeDaemonAction,
+                help='start a daemon serving this command on a Unix socket'
+            )
+        if getattr(self, 'completion_mode', False):
+            from ilcli import completion
+            self.parser.add_argument(
+                '--completion', default=self, choices=completion.SHELLS,
+                metavar='SHELL', action=CompletionAction,
+                help='print the completion script for SHELL (%(choices)s)'
+            )
+        if getattr(self, 'batch_mode', False):
+            self.parser.add_argument(
+                '--batch', nargs=0, default=self,
+                action=BatchAction,
+                help='run the argument lines read from stdin'
+            )
 
     def run(self, args=None):
         """
@@ -143,8 +650,156 @@ class Command(object):
 
         :param args: list of arguments. Default ``sys.argv``.
         """
+        if getattr(self, 'completion_mode', False) and self._parent is None:
+            from ilcli import completion
+            if completion.requested():
+                return completion.run(self)
+        with streams.flushing(self._out_writer, self._err_writer):
+            args = self._expand_response_files(args)
+            parsed_args, extra_args = self._parse_known_args(args)
+            return parsed_args.func(parsed_args, extra_args=extra_args)
+
+    async def run_async(self, args=None):
+        """
+        Run the command in the running event loop, so many commands can
+        run concurrently in the same loop. ``_run()`` and the validation
+        methods can be either regular methods or coroutine functions.
+
+        :param args: list of arguments. Default ``sys.argv``.
+        """
+        try:
+            args = self._expand_response_files(args)
+            parsed_args, extra_args = self._parse_known_args(args)
+            cmd = getattr(parsed_args.func, '__self__', None)
+            if isinstance(cmd, Command):
+                return await cmd._validate_and_run_async(
+                    parsed_args, extra_args=extra_args
+                )
+            return await _resolve(
+                parsed_args.func(parsed_args, extra_args=extra_args)
+            )
+        finally:
+            self.flush()
+
+    def _expand_response_files(self, args):
+        """
+        Replace the ``@path`` arguments by the contents of the response
+        files if ``response_file_mode`` is set (see
+        :mod:`ilcli.response`).
+
+        :param args: list of arguments. Default ``sys.argv``.
+        """
+        if not getattr(self, 'response_file_mode', False):
+            return args
+        try:
+            return list(response.expand(
+                sys.argv[1:] if args is None else args
+            ))
+        except response.ResponseFileError as e:
+            self.parser.error(str(e))
+
+    def run_batch(self, source=None, workers=None, ordered=None):
+        """
+        Run many invocations of this command, one per line of arguments
+        read from ``source``, reusing the command tree. The result of
+        every invocation is written as a JSON object per line. See
+        :mod:`ilcli.batch`.
+
+        :param source: a file-like object or a path with the argument
+          lines. Default ``sys.stdin``.
+        :param workers: number of worker processes (0 for the number of
+          CPUs). Default ``batch_workers``.
+        :param ordered: write the results in the order of the lines.
+          Default ``batch_ordered``.
+        :returns: the highest exit code of the invocations.
+        """
+        from ilcli import batch
+        return batch.run_batch(
+            self, source,
+            workers=self.batch_workers if workers is None else workers,
+            ordered=self.batch_ordered if ordered is None else ordered
+        )
+
+    def _parse_known_args(self, args=None):
+        """
+        Parse the arguments in the same way as
+        ``self.parser.parse_known_args()`` does but faster: the leaf
+        command is looked up directly from the subcommand names at the
+        beginning of the arguments and only its parser is used for the
+        rest of them. argparse is used as usual for anything else (e.g.
+        options before the subcommand names, unknown subcommands, etc.).
+
+        :param args: list of arguments. Default ``sys.argv``.
+        :returns: the parsed arguments and the list of extra arguments.
+        """
+        start = timing.clock() if timing.active else None
+        args = list(sys.argv[1:] if args is None else args)
+        cmd, index, values = self, 0, {}
+        try:
+            while cmd.subcommands:
+                defaults = cmd._dispatch_defaults()
+                child = None
+                if defaults is not None and index < len(args):
+                    child = cmd._subcommand(args[index])
+                if child is None:
+                    return self.parser.parse_known_args(args)
+                values.update(defaults)
+                values['cmd'] = args[index]
+                cmd, index = child, index + 1
+            if cmd is self:
+                return self.parser.parse_known_args(args)
+
+            return cmd._parse_leaf_args(args[index:], values)
+        finally:
+            if start is not None:
+                timing.record('parse', self, start)
+
+    def _parse_leaf_args(self, args, values):
+        """
+        Parse the arguments of a leaf command with its own parser.
+
+        :param args: list of arguments following the subcommand names.
+        :param values: values set by the parsers of the parent commands
+          (see ``_dispatch_defaults()``).
+        :returns: the parsed arguments and the list of extra arguments.
+        """
         parsed_args, extra_args = self.parser.parse_known_args(args)
-        return parsed_args.func(parsed_args, extra_args=extra_args)
+        values = dict(values)
+        values.update(vars(parsed_args))
+        return argparse.Namespace(**values), extra_args
+
+    def _dispatch_defaults(self):
+        """
+        Values that argparse sets when the parser of this node command
+        just selects a subcommand, or ``None`` if argparse must be used
+        to parse the arguments of this node command (e.g. if it has
+        options taking values).
+        """
+        if self._dispatch_info is not None:
+            return self._dispatch_info[0]
+
+        defaults = {}
+        for action in self.parser._actions:
+            if isinstance(action, argparse._SubParsersAction):
+                continue
+            if (
+                action.required or action.nargs != 0 or (
+                    isinstance(action.default, str)
+                    and action.default != argparse.SUPPRESS
+                )
+            ):
+                defaults = None
+                break
+            if (
+                action.dest != argparse.SUPPRESS
+                and action.default != argparse.SUPPRESS
+            ):
+                defaults.setdefault(action.dest, action.default)
+        if defaults is not None:
+            for dest, value in self.parser._defaults.items():
+                defaults.setdefault(dest, value)
+        self._dispatch_info = (defaults,)
+        return defaults
 
     def _validate_and_run(self, parsed_args, extra_args=None):
         """
@@ -157,24 +812,261 @@ class Command(object):
         :param extra_args: if provided, a list of the extra parsed
           arguments.
         """
-        # execute this method on all parents
-        retval = None
-        if self._parent and self.inherit_arguments:
-            retval = self._parent._validate_and_run(parsed_args)
+        if (
+            not self.subcommands
+            and getattr(parsed_args, 'profile_file', None) is not None
+        ):
+            return self._profile(parsed_args, extra_args)
 
-        # excecute validate_arguments and take into account the
-        # previous result from the parent
-        retval = self._validate_arguments(parsed_args) or retval
-        retval = self._validate_extra_arguments(extra_args) or retval
+        if self._is_async():
+            import asyncio
+            return asyncio.run(
+                self._validate_and_run_async(parsed_args, extra_args)
+            )
+
+        if self._concurrent_validation and self._parent:
+            from ilcli import validation
+            retval = None
+            for result in validation.run_concurrently([
+                functools.partial(
+                    c._validate, parsed_args, extra_args if c is self else None
+                ) for c in self._validation_chain()
+            ]):
+                retval = result or retval
+        else:
+            # execute this method on all parents
+            retval = None
+            if self._parent and self.inherit_arguments:
+                retval = self._parent._validate_and_run(parsed_args)
+
+            # excecute validate_arguments and take into account the
+            # previous result from the parent
+            retval = self._validate(parsed_args, extra_args) or retval
 
         if self.subcommands:
             return retval
 
         if retval is None:
-            return self._run(parsed_args)
+            with self._running(parsed_args, extra_args) as run:
+                if not run.cached:
+                    run.retval = self._run(parsed_args)
+            return run.retval
+
+        return retval
+
+    async def _validate_and_run_async(self, parsed_args, extra_args=None):
+        """
+        Same as ``_validate_and_run()`` but awaiting the coroutines
+        returned by ``_validate_arguments()``,
+        ``_validate_extra_arguments()`` and ``_run()`` when they are
+        implemented as ``async`` methods.
+        """
+        retval = None
+        if self._concurrent_validation and self._parent:
+            import asyncio
+            for result in await asyncio.gather(*[
+                c._validate_async(
+                    parsed_args, extra_args if c is self else None
+                ) for c in self._validation_chain()
+            ]):
+                retval = result or retval
+        else:
+            if self._parent and self.inherit_arguments:
+                retval = await self._parent._validate_and_run_async(
+                    parsed_args
+                )
+            retval = await self._validate_async(
+                parsed_args, extra_args
+            ) or retval
+
+        if self.subcommands:
+            return retval
+
+        if retval is None:
+            with self._running(parsed_args, extra_args) as run:
+                if not run.cached:
+                    run.retval = await _resolve(self._run(parsed_args))
+            return run.retval
+
+        return retval
+
+    @contextlib.contextmanager
+    def _running(self, parsed_args, extra_args):
+        """
+        Context of a run of ``_run()``, shared by the regular and the
+        ``async`` paths: the records session, the result cache and the
+        timing::
+
+          with self._running(parsed_args, extra_args) as run:
+              if not run.cached:
+                  run.retval = self._run(parsed_args)
+          return run.retval
+
+        :returns: a :class:`_Run`, with the result replayed from the
+          result cache (if any).
+        """
+        start = timing.clock() if timing.active else None
+        try:
+            with self._records_session(parsed_args):
+                key = self._result_key(parsed_args, extra_args)
+                if key is None:
+                    yield _Run()
+                    return
+                from ilcli import cache
+                result = self._result_cache.get(key)
+                if result is not None:
+                    yield _Run(cache.replay(result, *self._streams()), True)
+                    return
+                run = _Run()
+                with cache.recording(*self._streams()) as recorded:
+                    yield run
+                self._result_cache.put(
+                    key, run.retval, *(r.getvalue() for r in recorded)
+                )
+        finally:
+            if start is not None:
+                timing.record('run', self, start)
+
+    def _records_session(self, parsed_args):
+        """
+        Context keeping the state of the records emitted by a run (see
+        ``emit()``), only needed when the output format is selected with
+        ``--output``.
+        """
+        output_format = getattr(parsed_args, 'output_format', None)
+        if output_format is None:
+            return contextlib.nullcontext()
+        from ilcli import records
+        return records.session(output_format)
+
+    def _profile(self, parsed_args, extra_args):
+        """
+        Execute ``_validate_and_run()`` in the profiler (see
+        ``profile_mode``).
+        """
+        from ilcli import profiling
+        path = parsed_args.profile_file
+        parsed_args = copy.copy(parsed_args)
+        parsed_args.profile_file = None
+        return profiling.profile(
+            lambda: self._validate_and_run(parsed_args, extra_args),
+            path=path, err=streams.err(self._err_writer), top=self.profile_top
+        )
 
+    def _validation_chain(self):
+        """
+        The commands whose validation methods run when this command is
+        invoked: its ancestors (while they are inherited) and itself.
+        """
+        chain = [self]
+        while chain[-1]._parent and chain[-1].inherit_arguments:
+            chain.append(chain[-1]._parent)
+        chain.reverse()
+        return chain
+
+    def _validate(self, parsed_args, extra_args):
+        """
+        Run ``_validate_arguments()`` and ``_validate_extra_arguments()``
+        of this command, or get their result from the validation cache
+        when this command is an ancestor of the invoked one.
+
+        :returns: the result of the validation.
+        """
+        key = self._validation_key(parsed_args)
+        if key is not None:
+            found, retval = self._validation_cache.get(key)
+            if found:
+                return retval
+
+        start = timing.clock() if timing.active else None
+        retval = self._validate_arguments(parsed_args)
+        retval = self._validate_extra_arguments(extra_args) or retval
+        if start is not None:
+            timing.record('validate', self, start)
+
+        if key is not None:
+            self._validation_cache.put(key, retval)
         return retval
 
+    async def _validate_async(self, parsed_args, extra_args):
+        """
+        Same as ``_validate()`` but awaiting the validation methods
+        implemented as ``async`` methods.
+        """
+        key = self._validation_key(parsed_args)
+        if key is not None:
+            found, retval = self._validation_cache.get(key)
+            if found:
+                return retval
+
+        start = timing.clock() if timing.active else None
+        retval = await _resolve(self._validate_arguments(parsed_args))
+        retval = await _resolve(
+            self._validate_extra_arguments(extra_args)
+        ) or retval
+        if start is not None:
+            timing.record('validate', self, start)
+
+        if key is not None:
+            self._validation_cache.put(key, retval)
+        return retval
+
+    def _validation_key(self, parsed_args):
+        """
+        Key of the validation cache for the values of the arguments of
+        this command, or ``None`` if the result must not be cached.
+        """
+        if self._validation_cache is None or not self.subcommands:
+            return None
+        from ilcli import validation
+        if self._validation_dests is None:
+            self._validation_dests = validation.declared_dests(self)
+        return validation.key(self._validation_dests, parsed_args)
+
+    def _result_key(self, parsed_args, extra_args):
+        """
+        Key of the result cache for the arguments of a run of this
+        command, or ``None`` if the result must not be cached (see
+        ``result_cache_ttl``).
+        """
+        if (
+            self._result_cache_config is None
+            or getattr(parsed_args, 'no_cache', False)
+        ):
+            return None
+        from ilcli import cache
+        ttl, size, env = self._result_cache_config
+        if self._result_cache is None:
+            self._result_cache = cache.ResultCache(
+                cache.directory(self), ttl, size
+            )
+        return cache.key(self, parsed_args, extra_args, env)
+
+    def _streams(self):
+        """
+        The output and error output of the current context.
+        """
+        return streams.out(self._out_writer), streams.err(self._err_writer)
+
+    def _is_async(self):
+        """
+        Whether ``_run()`` or any validation method executed by
+        ``_validate_and_run()`` is a coroutine function.
+        """
+        if self._async is None:
+            methods = [
+                self._validate_arguments, self._validate_extra_arguments
+            ]
+            if not self.subcommands:
+                methods.append(self._run)
+            self._async = any(
+                inspect.iscoroutinefunction(m) for m in methods
+            ) or bool(
+                self._parent and self.inherit_arguments
+                and self._parent._is_async()
+            )
+        return self._async
+
     def _init_arguments(self):
         """
         Initialize argutments on the internal parser.
@@ -218,7 +1110,9 @@ class Command(object):
          message and the rest optional arguments will be applied to the
          first argument as string template arguments.
         """
-        self.__write_file(self._err, *args)
+        if self._err_writer.stream is not self._err:
+            self._err_writer = self._writer(self._err)
+        self.__write_file(streams.err(self._err_writer), *args)
 
     def out(self, *args):
         """
@@ -235,7 +1129,44 @@ class Command(object):
           message and the rest optional arguments will be applied to the
           first argument as string template arguments.
         """
-        self.__write_file(self._out, *args)
+        if self._out_writer.stream is not self._out:
+            self._out_writer = self._writer(self._out)
+        self.__write_file(streams.out(self._out_writer), *args)
+
+    def emit(self, record):
+        """
+        Write a record into the output in the format selected with
+        ``--output`` (see ``record_formats``)::
+
+         > self.emit({'name': 'a', 'size': 1})
+         '{"name":"a","size":1}\n'
+
+        :param record: a dictionary.
+        """
+        from ilcli import records
+        default = self.record_formats[0] if self.record_formats else 'ndjson'
+        for line in records.encode(record, default):
+            self.out(line)
+
+    def flush(self):
+        """
+        Flush the output and error output (see ``output_buffering``).
+        It is done at the end of ``run()`` anyway.
+        """
+        self._out_writer.flush()
+        self._err_writer.flush()
+
+    def _writer(self, stream, inherited=None):
+        """
+        Get the :class:`~ilcli.streams.Writer` for a stream: the parent's
+        one if it is writing to the same stream, or a new one.
+        """
+        if inherited is not None and inherited.stream is stream:
+            return inherited
+        return streams.Writer(
+            stream, self.output_buffering, self.output_buffer_size,
+            self.output_flush_interval
+        )
 
     def __write_file(self, f, *args):
         if len(args) == 1:
@@ -244,4 +1175,3 @@ class Command(object):
             f.write(args[0] % args[1:] + '\n')
         else:
             f.write('\n')
-        f.flush()
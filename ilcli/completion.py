@@ -0,0 +1,434 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shell completion (bash, zsh and fish) backed by a precomputed index, so
+the command tree is not imported and built at every TAB press.
+
+The index is a text file with a line per subcommand, option, positional
+argument, choice and dynamic completer of every command of the tree,
+with tab separated fields::
+
+  <path>  c  <subcommand>
+  <path>  o  <option string>  <nargs>
+  <path>  p  #<index>         <nargs>
+  <path>  v  <option or #index>  <choice>
+  <path>  d  <option or #index>
+
+where ``<path>`` is the subcommand names from the root separated by
+spaces, and the lines of each command are written together, before the
+ones of its subcommands. The shell scripts (see :func:`script`) look
+completions up in the index with a single ``awk`` pass, which stops as
+soon as the invoked command has been found.
+
+Only the values of arguments with a dynamic completer (a function
+taking the prefix being completed and returning the possible values,
+set with the ``completer`` argument of
+:meth:`~ilcli.Command.add_argument`) are computed by the CLI itself.
+
+The index is written in ``$XDG_CACHE_HOME/ilcli`` (``~/.cache/ilcli``
+by default) when the script is generated and by the scripts themselves
+when it is missing or (bash and zsh) older than the program. It is
+named after the class of the root command and the Python environment,
+so CLIs with the same name (or the same CLI with different plugins
+installed in another environment) do not overwrite each other's
+index.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import shlex
+import sys
+
+from ilcli.files import cache_dir
+
+#: supported shells
+SHELLS = ('bash', 'zsh', 'fish')
+
+# environment variables of a completion request to the CLI
+_TARGET = 'ILCLI_COMPLETE'
+_WORDS = 'ILCLI_WORDS'
+_PREFIX = 'ILCLI_CUR'
+_LEAD = 'ILCLI_LEAD'
+_INDEX = 'ILCLI_INDEX'
+
+# words of the command line are separated by this character
+_SEP = '\037'
+
+
+def index_path(cmd):
+    """
+    Path of the completion index of a command tree.
+
+    :param cmd: the root command.
+    """
+    root = type(cmd)
+    return os.path.join(cache_dir(), 'completion-{}.{}-{}.idx'.format(
+        root.__module__, root.__qualname__,
+        hashlib.sha256(sys.prefix.encode()).hexdigest()[:12]
+    ))
+
+
+def write_index(cmd, path=None):
+    """
+    Build the whole command tree and write its completion index.
+
+    :param cmd: the root command.
+    :param path: the path of the index. By default, see
+      :func:`index_path`.
+    :returns: the path of the index.
+    """
+    path = path or index_path(cmd)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'w') as f:
+        for fields in index_lines(cmd):
+            f.write('\t'.join(fields) + '\n')
+    os.replace(tmp, path)
+    return path
+
+
+def index_lines(cmd, path=''):
+    """
+    Generate the lines of the completion index of a command tree.
+
+    :param cmd: the root command.
+    :param path: the path of ``cmd``.
+    :returns: a generator of tuples of fields.
+    """
+    children = []
+    position = 0
+    for action in cmd.parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            children.extend(action.choices)
+            continue
+        if action.help == argparse.SUPPRESS:
+            continue
+        if action.option_strings:
+            targets = [o for o in action.option_strings if _valid(o)]
+            for option in targets:
+                yield (path, 'o', option, _nargs(action))
+        else:
+            targets = ['#{}'.format(position)]
+            position += 1
+            yield (path, 'p', targets[0], _nargs(action))
+        for target in targets:
+            if callable(getattr(action, 'completer', None)):
+                yield (path, 'd', target)
+            elif action.choices is not None:
+                for choice in action.choices:
+                    if _valid(str(choice)):
+                        yield (path, 'v', target, str(choice))
+
+    children = [name for name in children if _valid(name)]
+    for name in children:
+        yield (path, 'c', name)
+    for name in children:
+        child_path = '{} {}'.format(path, name) if path else name
+        for fields in index_lines(cmd._subcommand(name), child_path):
+            yield fields
+
+
+def _valid(word):
+    return not re.search(r'[\s\037]', word)
+
+
+def _nargs(action):
+    if action.nargs is None:
+        return '1'
+    if action.nargs == argparse.REMAINDER:
+        return 'R'
+    return str(action.nargs)
+
+
+def complete(cmd, words, target, prefix):
+    """
+    Complete the value of an argument with its dynamic completer.
+
+    :param cmd: the root command.
+    :param words: the words of the command line before the one being
+      completed.
+    :param target: the option string or ``#<index>`` of the positional
+      argument.
+    :param prefix: the prefix of the value.
+    :returns: a list of values.
+    """
+    node = cmd
+    for word in words:
+        child = node._subcommand(word) if node.subcommands else None
+        if child is not None:
+            node = child
+    parser = node.parser
+    try:
+        if target.startswith('#'):
+            action = [
+                a for a in parser._actions if not a.option_strings
+                and not isinstance(a, argparse._SubParsersAction)
+            ][int(target[1:])]
+        else:
+            action = parser._option_string_actions[target]
+    except (ValueError, IndexError, KeyError):
+        return []
+    completer = getattr(action, 'completer', None)
+    if not callable(completer):
+        return []
+    return [str(v) for v in completer(prefix) if str(v).startswith(prefix)]
+
+
+def requested():
+    """
+    Whether the CLI is being run by a completion script.
+    """
+    return _TARGET in os.environ
+
+
+def run(cmd):
+    """
+    Handle a request of a completion script: write the index or the
+    values of a dynamic completer.
+
+    :param cmd: the root command.
+    :returns: the exit code.
+    """
+    target = os.environ[_TARGET]
+    if target == '@index':
+        # the index the script reads
+        write_index(cmd, os.environ.get(_INDEX))
+        return 0
+    words = os.environ.get(_WORDS, '')
+    words = words.split(_SEP) if words else []
+    lead = os.environ.get(_LEAD, '')
+    for value in complete(cmd, words, target, os.environ.get(_PREFIX, '')):
+        cmd.out(lead + value)
+    return 0
+
+
+def script(cmd, shell):
+    """
+    Source code of the completion script of a command tree.
+
+    :param cmd: the root command.
+    :param shell: one of :data:`SHELLS`.
+    """
+    index = index_path(cmd)
+    quote = _fish_quote if shell == 'fish' else shlex.quote
+    values = {
+        'PROG': cmd.name,
+        'PROG_Q': quote(cmd.name),
+        'FUNC': re.sub(r'\W', '_', cmd.name),
+        'INDEX': quote(index),
+        'AWK': AWK.strip('\n')
+    }
+    return re.sub(
+        r'@([A-Z_]+)@', lambda m: values[m.group(1)], _SCRIPTS[shell]
+    )
+
+
+def _fish_quote(value):
+    return "'{}'".format(value.replace('\\', '\\\\').replace("'", "\\'"))
+
+
+#: program looking completions up in the index: the words of the
+# command line are read from ILCLI_WORDS (separated by \037) and the
+# word being completed from ILCLI_CUR. It prints the candidates, a line
+# per candidate, "@files" for paths, or "@dynamic" followed by the
+# target, prefix and lead (separated by \037) of a dynamic completer.
+AWK = r'''
+function reset() {
+    nc = 0; no = 0; np = 0; posk = 0; pending = ""
+    split("", children); split("", child); split("", options)
+    split("", opt); split("", pos); split("", choices); split("", dyn)
+}
+function add() {
+    if ($2 == "c") { children[++nc] = $3; child[$3] = 1 }
+    else if ($2 == "o") { options[++no] = $3; opt[$3] = $4 }
+    else if ($2 == "p") { pos[++np] = $4 }
+    else if ($2 == "v") { choices[$3] = choices[$3] "\037" $4 }
+    else if ($2 == "d") { dyn[$3] = 1 }
+}
+function advance(   word, nv) {
+    inblock = 0
+    while (i <= n) {
+        word = w[i++]
+        if (word == "--") continue
+        if (substr(word, 1, 1) == "-" && word != "-") {
+            if (index(word, "=") || !(word in opt)) continue
+            nv = opt[word]
+            if (nv ~ /^[0-9]+$/) {
+                if (i + nv - 1 > n) { pending = word; i = n + 1 }
+                else i += nv
+            } else if (i > n) pending = word
+            continue
+        }
+        if (word in child) {
+            path = (path == "" ? word : path " " word)
+            reset()
+            return
+        }
+        posk++
+    }
+    done = 1
+    complete()
+}
+function positional(k,   j, acc, nv) {
+    acc = 0
+    for (j = 1; j <= np; j++) {
+        nv = pos[j]
+        if (nv ~ /^[0-9]+$/) acc += nv
+        else if (nv == "?") acc++
+        else return j
+        if (k < acc) return j
+    }
+    return 0
+}
+function values(target, prefix, lead,   m, j, vals) {
+    if (target in dyn) {
+        print "@dynamic\037" target "\037" prefix "\037" lead
+    } else if (target in choices) {
+        m = split(substr(choices[target], 2), vals, "\037")
+        for (j = 1; j <= m; j++)
+            if (index(vals[j], prefix) == 1) print lead vals[j]
+    } else print "@files"
+}
+function complete(   k, eq, name) {
+    if (pending != "") { values(pending, cur, ""); return }
+    if (substr(cur, 1, 1) == "-") {
+        eq = index(cur, "=")
+        if (eq) {
+            name = substr(cur, 1, eq - 1)
+            if (name in opt)
+                values(name, substr(cur, eq + 1), substr(cur, 1, eq))
+            return
+        }
+        for (k = 1; k <= no; k++)
+            if (index(options[k], cur) == 1) print options[k]
+        return
+    }
+    if (nc) {
+        for (k = 1; k <= nc; k++)
+            if (index(children[k], cur) == 1) print children[k]
+        return
+    }
+    k = positional(posk)
+    if (k) values("#" (k - 1), cur, "")
+}
+BEGIN {
+    FS = "\t"
+    n = 0
+    if (ENVIRON["ILCLI_WORDS"] != "")
+        n = split(ENVIRON["ILCLI_WORDS"], w, "\037")
+    cur = ENVIRON["ILCLI_CUR"]
+    path = ""; i = 1; inblock = 0; done = 0
+    reset()
+}
+$1 == path { inblock = 1; add(); next }
+inblock {
+    advance()
+    if (done) exit
+    if ($1 == path) { inblock = 1; add() }
+}
+END { if (!done) advance() }
+'''
+
+_BASH = r'''# bash completion for @PROG@ (generated by ilcli)
+_ilcli_@FUNC@() {
+    local index=@INDEX@ prog=@PROG_Q@
+    local line="${COMP_LINE:0:COMP_POINT}" word="" words target cur lead
+    local -a argv out
+    read -r -a argv <<< "$line"
+    if [[ -n $line && $line != *[[:space:]] ]]; then
+        word="${argv[${#argv[@]}-1]}"
+        unset 'argv[${#argv[@]}-1]'
+    fi
+    if [[ ! -f $index || $(command -v "$prog") -nt $index ]]; then
+        ILCLI_COMPLETE=@index ILCLI_INDEX="$index" "$prog" >/dev/null 2>&1
+    fi
+    words=$(printf '%s\037' "${argv[@]:1}")
+    words="${words%$'\037'}"
+    mapfile -t out < <(ILCLI_WORDS="$words" ILCLI_CUR="$word" \
+        awk '@AWK@' "$index")
+    if [[ ${out[0]} == @dynamic* ]]; then
+        IFS=$'\037' read -r _ target cur lead <<< "${out[0]}"
+        mapfile -t out < <(ILCLI_COMPLETE="$target" ILCLI_WORDS="$words" \
+            ILCLI_CUR="$cur" ILCLI_LEAD="$lead" "$prog" 2>/dev/null)
+    fi
+    COMPREPLY=()
+    [[ ${out[0]} == @files ]] && return
+    if [[ $word == -*=* && $COMP_WORDBREAKS == *=* ]]; then
+        out=("${out[@]#"${word%%=*}="}")
+    fi
+    COMPREPLY=("${out[@]}")
+}
+complete -o default -F _ilcli_@FUNC@ @PROG_Q@
+'''
+
+_ZSH = r'''#compdef @PROG@
+# zsh completion for @PROG@ (generated by ilcli)
+_ilcli_@FUNC@() {
+    local index=@INDEX@ prog=@PROG_Q@ sep=$'\037' line_words
+    local -a lines parts
+    if [[ ! -f $index || ${commands[$prog]:-$prog} -nt $index ]]; then
+        ILCLI_COMPLETE=@index ILCLI_INDEX=$index $prog >/dev/null 2>&1
+    fi
+    line_words=${(pj:$sep:)words[2,CURRENT-1]}
+    lines=("${(@f)$(ILCLI_WORDS=$line_words ILCLI_CUR=${words[CURRENT]} \
+        awk '@AWK@' $index)}")
+    if [[ $lines[1] == @dynamic* ]]; then
+        parts=("${(@ps:$sep:)lines[1]}")
+        lines=("${(@f)$(ILCLI_COMPLETE=$parts[2] ILCLI_CUR=$parts[3] \
+            ILCLI_LEAD=$parts[4] ILCLI_WORDS=$line_words $prog 2>/dev/null)}")
+    fi
+    if [[ $lines[1] == @files ]]; then
+        _files
+    elif [[ -n $lines[1] ]]; then
+        compadd -- $lines
+    fi
+}
+compdef _ilcli_@FUNC@ @PROG_Q@
+'''
+
+_FISH = r'''# fish completion for @PROG@ (generated by ilcli)
+function __ilcli_@FUNC@
+    set -l index @INDEX@
+    set -l prog @PROG_Q@
+    set -l tokens (commandline -opc)
+    set -e tokens[1]
+    set -l cur (commandline -ct)
+    if not test -f $index
+        env ILCLI_COMPLETE=@index ILCLI_INDEX=$index $prog >/dev/null 2>&1
+    end
+    set -l words (string join \x1f -- $tokens)
+    set -l out (env ILCLI_WORDS="$words" ILCLI_CUR="$cur" \
+        awk '@AWK@' $index)
+    if string match -q '@dynamic*' -- "$out[1]"
+        set -l parts (string split \x1f -- $out[1])
+        set out (env ILCLI_COMPLETE=$parts[2] ILCLI_CUR="$parts[3]" \
+            ILCLI_LEAD="$parts[4]" ILCLI_WORDS="$words" $prog 2>/dev/null)
+    end
+    if test "$out[1]" = '@files'
+        __fish_complete_path $cur
+    else if set -q out[1]
+        printf '%s\n' $out
+    end
+end
+complete -c @PROG_Q@ -f -a '(__ilcli_@FUNC@)'
+'''
+
+_SCRIPTS = {'bash': _BASH, 'zsh': _ZSH, 'fish': _FISH}
@@ -0,0 +1,337 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Warm-process daemon mode.
+
+A resident process builds the command tree once and listens on a Unix
+socket. Each request is executed in a forked child of that process, so
+the interpreter startup, the imports and the tree construction are not
+paid per invocation and the state of each request is isolated from the
+rest.
+
+Clients send the arguments, working directory and environment, plus
+their standard input, output and error file descriptors, which the
+child uses as its own. They get back the exit code of the command.
+:func:`client_script` generates a standalone client which only imports
+a few standard library modules.
+
+As clients send their environment (possibly with credentials) and file
+descriptors, the default socket is in a directory only accessible by
+the user, and clients refuse to talk to a daemon run by another user.
+
+Passing file descriptors requires Python 3.9 or later (with older
+versions, :func:`serve` and :func:`client` raise ``OSError``).
+"""
+
+import inspect
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import traceback
+
+from ilcli import batch
+
+_HEADER = struct.Struct('!I')
+
+
+def default_socket_path(cmd):
+    """
+    Default path of the socket a command tree is served on, in a
+    directory private to the user (``ilcli-<uid>`` in
+    ``$XDG_RUNTIME_DIR`` or ``/tmp``).
+
+    :param cmd: the root command.
+    """
+    directory = os.path.join(
+        os.environ.get('XDG_RUNTIME_DIR') or '/tmp',
+        'ilcli-{}'.format(os.getuid())
+    )
+    return os.path.join(directory, '{}.sock'.format(cmd.name))
+
+
+def _check_supported():
+    """
+    :raises OSError: if file descriptors cannot be passed over sockets
+      (Python < 3.9).
+    """
+    if not hasattr(socket, 'send_fds'):
+        raise OSError('daemon mode requires Python 3.9 or later')
+
+
+def _private_directory(directory):
+    """
+    Create a directory only accessible by the current user, or check
+    that it already is.
+
+    :raises PermissionError: if the directory is accessible by others.
+    """
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid()
+        or st.st_mode & 0o077
+    ):
+        raise PermissionError(
+            '{} is not a directory private to the user'.format(directory)
+        )
+
+
+def serve(cmd, path=None):
+    """
+    Serve a command tree on a Unix socket until the process is
+    terminated (``SIGTERM`` or ``SIGINT``).
+
+    :param cmd: the root command.
+    :param path: the path of the socket. By default, see
+      :func:`default_socket_path`.
+    :returns: the exit code of the server.
+    :raises OSError: if daemon mode is not supported.
+    """
+    _check_supported()
+    if path is None:
+        path = default_socket_path(cmd)
+        _private_directory(os.path.dirname(path))
+    # build the whole tree in the parent so children do not pay for it
+    cmd.load_subcommands()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen(64)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt()
+
+    old_handlers = dict(
+        (s, signal.signal(s, stop)) for s in (signal.SIGTERM, signal.SIGINT)
+    )
+    server.settimeout(1)
+    try:
+        while True:
+            _reap()
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # a stop signal raised while forking would be swallowed by
+            # the fork handlers
+            signal.pthread_sigmask(signal.SIG_BLOCK, old_handlers)
+            pid = os.fork()
+            if pid == 0:
+                for s, handler in old_handlers.items():
+                    signal.signal(s, handler)
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, old_handlers)
+                server.close()
+                code = 1
+                try:
+                    code = _handle(cmd, conn)
+                finally:
+                    os._exit(code)
+            conn.close()
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, old_handlers)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for s, handler in old_handlers.items():
+            signal.signal(s, handler)
+        server.close()
+        os.unlink(path)
+
+
+def _reap():
+    try:
+        while os.waitpid(-1, os.WNOHANG)[0]:
+            pass
+    except ChildProcessError:
+        pass
+
+
+def _handle(cmd, conn):
+    """
+    Execute a request in a forked child of the server.
+
+    :returns: the exit code for the child process.
+    """
+    request, fds = _recv(conn, with_fds=True)
+    for fd, target in zip(fds, (0, 1, 2)):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.argv = [cmd.name] + request['argv']
+    _send(conn, {'pid': os.getpid()})
+
+    try:
+        retcode = cmd.run(request['argv'])
+    except SystemExit as e:
+        retcode = e.code
+    except Exception:
+        traceback.print_exc()
+        retcode = 1
+    retcode = batch.exit_code(retcode, sys.stderr)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    _send(conn, {'retcode': retcode})
+    return 0
+
+
+def client(path, argv=None, cwd=None, env=None, stdio=(0, 1, 2)):
+    """
+    Run a command in a daemon.
+
+    :param path: the path of the socket of the daemon.
+    :param argv: list of arguments. Default ``sys.argv[1:]``.
+    :param cwd: working directory. Default current one.
+    :param env: environment. Default ``os.environ``.
+    :param stdio: file descriptors for the standard input, output and
+      error of the command.
+    :returns: the exit code of the command.
+    :raises OSError: if the daemon is not available.
+    """
+    _check_supported()
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(path)
+    with conn:
+        _check_peer(conn, path)
+        _send(conn, {
+            'argv': sys.argv[1:] if argv is None else list(argv),
+            'cwd': cwd or os.getcwd(),
+            'env': dict(os.environ if env is None else env)
+        }, fds=stdio)
+        pid = _recv(conn)['pid']
+
+        def forward(signum, frame):
+            os.kill(pid, signum)
+
+        old_handlers = {}
+        for s in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            try:
+                old_handlers[s] = signal.signal(s, forward)
+            except ValueError:
+                # not in the main thread
+                break
+        try:
+            return _recv(conn)['retcode']
+        finally:
+            for s, handler in old_handlers.items():
+                signal.signal(s, handler)
+
+
+def _check_peer(conn, path):
+    """
+    Check that the daemon a client is connected to runs as the same
+    user, before sending it anything.
+
+    :raises PermissionError: if it does not.
+    """
+    if hasattr(socket, 'SO_PEERCRED'):
+        credentials = conn.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')
+        )
+        uid = struct.unpack('3i', credentials)[1]
+    else:
+        uid = os.stat(path).st_uid
+    if uid != os.getuid():
+        raise PermissionError(
+            'the daemon at {} is run by another user'.format(path)
+        )
+
+
+def _send(conn, message, fds=()):
+    data = json.dumps(message).encode('utf-8')
+    data = _HEADER.pack(len(data)) + data
+    sent = socket.send_fds(conn, [data], list(fds)) if fds else 0
+    conn.sendall(data[sent:])
+
+
+def _recv(conn, with_fds=False):
+    fds = []
+    if with_fds:
+        data, fds, _, _ = socket.recv_fds(conn, _HEADER.size, 3)
+    else:
+        data = b''
+    size = _HEADER.unpack(_read(conn, data, _HEADER.size))[0]
+    message = json.loads(_read(conn, b'', size).decode('utf-8'))
+    return (message, fds) if with_fds else message
+
+
+def _read(conn, data, size):
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise EOFError('connection closed')
+        data += chunk
+    return data
+
+
+def client_script(path, fallback=None):
+    """
+    Source code of a standalone Python client for a daemon. It only
+    imports a few standard library modules, so it starts much faster
+    than the CLI itself. Use it with ``python -S`` for even faster
+    startup.
+
+    :param path: the path of the socket of the daemon.
+    :param fallback: optional command (list of arguments) executed with
+      the same arguments when the daemon is not available.
+    """
+    functions = '\n\n'.join(
+        inspect.getsource(f)
+        for f in (client, _check_supported, _check_peer, _send, _recv, _read)
+    )
+    return '\n'.join([
+        '#! /usr/bin/env python',
+        '# -*- mode:python; coding:utf-8 -*-',
+        '# generated by ilcli.daemon.client_script()',
+        '',
+        'import json',
+        'import os',
+        'import signal',
+        'import socket',
+        'import struct',
+        'import sys',
+        '',
+        '_HEADER = struct.Struct({!r})'.format(_HEADER.format),
+        '',
+        '',
+        functions,
+        '',
+        'try:',
+        '    code = client({!r})'.format(path),
+        'except OSError:',
+        '    fallback = {!r}'.format(fallback),
+        '    if not fallback:',
+        '        raise',
+        '    os.execvp(fallback[0], fallback + sys.argv[1:])',
+        'sys.exit(code)',
+        ''
+    ])
@@ -0,0 +1,56 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Files written by ``ilcli`` itself: snapshots, plugin and completion
+indexes, cached results, etc.
+"""
+
+import json
+import os
+import threading
+
+
+def cache_dir():
+    """
+    Directory of the files cached by ``ilcli``: ``$XDG_CACHE_HOME/ilcli``
+    (``~/.cache/ilcli`` by default).
+    """
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME')
+        or os.path.join(os.path.expanduser('~'), '.cache'),
+        'ilcli'
+    )
+
+
+def write_json(path, data, mode=0o666):
+    """
+    Write a JSON file atomically (so concurrent readers never see it
+    partially written), creating its directory if needed.
+
+    :param path: the path of the file.
+    :param data: the JSON value.
+    :param mode: the permissions of the file (before applying the
+      umask).
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with open(fd, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
@@ -0,0 +1,222 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process man page lookup, used by ``--doc`` (see ``man_page``,
+``man_section`` and ``man_jump_into`` attributes of
+:class:`~ilcli.Command`).
+
+Man pages (roff sources, optionally compressed) are parsed into an index
+of their section headers (``.SH`` and ``.SS``) and byte offsets, which
+is cached in memory and in ``$XDG_CACHE_HOME/ilcli/manpages.json`` by
+path, modification time and size. It is used to check that the section
+to jump into exists and, when ``man`` is not installed, to render the
+page (or the section) as plain text for :func:`pydoc.pager`.
+"""
+
+import bz2
+import glob
+import gzip
+import json
+import lzma
+import os
+import re
+
+from ilcli.files import cache_dir, write_json
+
+#: directories searched for man pages if ``MANPATH`` is not set
+DEFAULT_MANPATH = ['/usr/local/share/man', '/usr/share/man', '/usr/man']
+
+# functions opening man pages, by extension
+_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open,
+            '.lzma': lzma.open}
+
+# indexes in memory, by path
+_indexes = {}
+
+_HEADER = re.compile(rb'^\.(SH|SS|Sh|Ss)(?:[ \t]+(.*))?$')
+_FONT = re.compile(r'\\f(\[[^\]]*\]|\(..|.)')
+_SPECIAL = re.compile(r'\\(\(..|\[[^\]]*\]|.)')
+_ARGS = re.compile(r'"[^"]*"|\S+')
+_ALTERNATING = ('BR', 'BI', 'IB', 'IR', 'RB', 'RI')
+_SPECIALS = {'-': '-', 'e': '\\', ' ': ' ', '&': '', '(em': '--',
+             '(en': '-', '(bu': '*', '(aq': "'", '(dq': '"'}
+
+
+def locate(page, section=1):
+    """
+    Find the source of a man page.
+
+    :param page: a path or the name of the page.
+    :param section: the section of the manual.
+    :returns: the path or ``None`` if it is not found.
+    """
+    if os.path.isfile(page):
+        return page
+    manpath = os.environ.get('MANPATH')
+    directories = (
+        [d for d in manpath.split(':') if d] if manpath else DEFAULT_MANPATH
+    )
+    name = '{}.{}'.format(page, section)
+    for directory in directories:
+        pattern = os.path.join(
+            glob.escape(directory), 'man{}*'.format(section),
+            glob.escape(name) + '*'
+        )
+        for path in sorted(glob.glob(pattern)):
+            base, extension = os.path.splitext(path)
+            if extension not in _OPENERS:
+                base = path
+            if os.path.basename(base).startswith(name):
+                return path
+    return None
+
+
+def read(path):
+    """
+    Read the (uncompressed) source of a man page.
+    """
+    opener = _OPENERS.get(os.path.splitext(path)[1], open)
+    with opener(path, 'rb') as f:
+        return f.read()
+
+
+def index(path):
+    """
+    Get the index of the sections of a man page: a list of ``[name,
+    level, start, end]`` where ``level`` is 1 for sections and 2 for
+    subsections, and ``start`` and ``end`` are the offsets of the
+    section in the page source.
+
+    :param path: the path of the page.
+    """
+    stat = os.stat(path)
+    key = [stat.st_mtime_ns, stat.st_size]
+    cached = _indexes.get(path)
+    if cached is not None and cached['key'] == key:
+        return cached['sections']
+
+    cache_path = os.path.join(cache_dir(), 'manpages.json')
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cached = cache.get(path)
+    if not isinstance(cached, dict) or cached.get('key') != key:
+        cached = cache[path] = {'key': key, 'sections': parse(read(path))}
+        try:
+            write_json(cache_path, cache)
+        except OSError:
+            pass
+    _indexes[path] = cached
+    return cached['sections']
+
+
+def parse(data):
+    """
+    Build the index of the sections of a man page source (see
+    :func:`index`).
+
+    :param data: the source of the page (bytes).
+    """
+    sections = []
+    offset = 0
+    for line in data.splitlines(True):
+        match = _HEADER.match(line.rstrip(b'\r\n'))
+        if match is not None:
+            level = 1 if match.group(1) in (b'SH', b'Sh') else 2
+            name = _text((match.group(2) or b'').decode('utf-8', 'replace'))
+            for s in sections:
+                if s[3] is None and s[1] >= level:
+                    s[3] = offset
+            sections.append([name.strip('"').strip(), level, offset, None])
+        offset += len(line)
+    for s in sections:
+        if s[3] is None:
+            s[3] = offset
+    return sections
+
+
+def find(path, text):
+    """
+    Find the section of a man page named as ``text`` (ignoring case) or,
+    otherwise, the section where ``text`` first appears in the page.
+
+    :param path: the path of the page.
+    :param text: the name of the section or the text to search for.
+    :returns: the section (see :func:`index`) or ``None`` if ``text`` is
+      not found. If it is found before the first section, the section
+      covers the whole page.
+    """
+    sections = index(path)
+    for s in sections:
+        if s[0].lower() == text.lower():
+            return s
+    data = read(path)
+    position = data.find(text.encode('utf-8'))
+    if position < 0:
+        # e.g. options are usually written with escaped hyphens
+        position = data.find(text.replace('-', '\\-').encode('utf-8'))
+    if position < 0:
+        return None
+    for s in reversed(sections):
+        if s[2] <= position:
+            return s
+    return ['', 0, 0, len(data)]
+
+
+def render(path, text=None):
+    """
+    Render a man page (or one of its sections) as plain text. Only the
+    most common roff requests and escapes are interpreted.
+
+    :param path: the path of the page.
+    :param text: the section to render (see :func:`find`). By default,
+      the whole page.
+    """
+    data = read(path)
+    if text is not None:
+        section = find(path, text)
+        if section is not None:
+            data = data[section[2]:section[3]]
+    lines = []
+    for line in data.decode('utf-8', 'replace').splitlines():
+        if line.startswith(('.\\"', "'\\\"")) or line in ('.', "'"):
+            continue
+        if not line.startswith(('.', "'")):
+            lines.append(_text(line))
+            continue
+        request, _, args = line[1:].partition(' ')
+        words = [w.strip('"') for w in _ARGS.findall(_text(args))]
+        args = ('' if request in _ALTERNATING else ' ').join(words)
+        if request in ('SH', 'Sh'):
+            lines.extend(['', args.upper()])
+        elif request in ('SS', 'Ss'):
+            lines.extend(['', '  ' + args])
+        elif request in ('PP', 'LP', 'P', 'Pp', 'TP', 'sp'):
+            lines.append('')
+        elif request in ('TH', 'Dd', 'Dt', 'Os', 'br', 'ad', 'na', 'nh',
+                         'fi', 'nf', 'RS', 'RE', 'in', 'ft', 'ps'):
+            continue
+        elif args:
+            lines.append(args)
+    return '\n'.join(lines).strip('\n') + '\n'
+
+
+def _text(value):
+    value = _FONT.sub('', value)
+    return _SPECIAL.sub(lambda m: _SPECIALS.get(m.group(1), ''), value)
@@ -0,0 +1,167 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Discovery of subcommands installed by other distributions through an
+entry point group (see ``plugin_group`` class attribute of
+:class:`~ilcli.Command`)::
+
+  # setup.cfg of the plugin distribution
+  [options.entry_points]
+  mycli.commands =
+      deploy = mycli_deploy.commands:deploy
+
+The name of every entry point is the name of the subcommand and its
+help is the summary of the distribution. Plugins are added as
+:class:`~ilcli.SubcommandRef`, so their modules are only imported when
+they are used.
+
+Scanning the installed distributions is slow, so the discovered entry
+points are cached in ``$XDG_CACHE_HOME/ilcli`` (``~/.cache/ilcli`` by
+default). The cache is rebuilt when the modification time of any
+directory of ``sys.path`` changes, which happens whenever a
+distribution is installed, upgraded or removed there. The current
+directory (e.g. ``''`` with ``python -c``) is not taken into account,
+as it changes for reasons unrelated to distributions.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import ilcli
+from ilcli.files import cache_dir, write_json
+
+# discovered plugins in this process, by group
+_discovered = {}
+
+
+def subcommands(cmd_class):
+    """
+    The subcommands of a command class, including the plugins of its
+    ``plugin_group`` (built-in subcommands take precedence).
+
+    :param cmd_class: the command class.
+    """
+    group = getattr(cmd_class, 'plugin_group', None)
+    if not group:
+        return cmd_class.subcommands
+    names = set(c.name or c.__name__.lower() for c in cmd_class.subcommands)
+    return list(cmd_class.subcommands) + [
+        ref for ref in discover(group) if ref.name not in names
+    ]
+
+
+def discover(group):
+    """
+    Get the subcommands registered in an entry point group.
+
+    :param group: the name of the group.
+    :returns: a list of :class:`~ilcli.SubcommandRef`.
+    """
+    refs = _discovered.get(group)
+    if refs is None:
+        refs = _discovered[group] = [
+            ilcli.SubcommandRef(e['value'], name=e['name'], help=e['help'])
+            for e in load_index(group)
+        ]
+    return refs
+
+
+def load_index(group):
+    """
+    Get the entry points of a group from the cache, scanning the
+    installed distributions if the cache is missing or stale.
+
+    :param group: the name of the group.
+    :returns: a list of dictionaries with the ``name``, ``value`` and
+      ``help`` of every entry point.
+    """
+    key = index_key()
+    path = index_path(group)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data['key'] == key:
+            return data['entry_points']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    entry_points = scan(group)
+    try:
+        write_json(path, {'key': key, 'entry_points': entry_points})
+    except OSError:
+        pass
+    return entry_points
+
+
+def scan(group):
+    """
+    Scan the installed distributions for the entry points of a group.
+    Entry points which do not reference a class (``module:Class``) are
+    ignored and, if a name is repeated, the first one in ``sys.path``
+    wins.
+
+    :param group: the name of the group.
+    :returns: see :func:`load_index`.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover
+        # Python < 3.8 (see the plugins extra)
+        import importlib_metadata as metadata
+
+    entry_points = []
+    names = set()
+    for dist in metadata.distributions():
+        for ep in dist.entry_points:
+            if ep.group != group or ep.name in names or ':' not in ep.value:
+                continue
+            names.add(ep.name)
+            entry_points.append({
+                'name': ep.name,
+                'value': ep.value,
+                'help': dist.metadata['Summary']
+            })
+    return entry_points
+
+
+def index_key():
+    """
+    Key of the cached indexes: the Python version and the directories of
+    ``sys.path`` (but the current one) with their modification times.
+    """
+    digest = hashlib.sha256(sys.version.encode())
+    cwd = os.getcwd()
+    for entry in sys.path:
+        if not entry or os.path.abspath(entry) == cwd:
+            continue
+        try:
+            mtime = os.stat(entry).st_mtime_ns
+        except OSError:
+            continue
+        digest.update('{}\0{}\0'.format(entry, mtime).encode())
+    return digest.hexdigest()
+
+
+def index_path(group):
+    """
+    Path of the cached index of an entry point group.
+
+    :param group: the name of the group.
+    """
+    return os.path.join(cache_dir(), 'plugins-{}.json'.format(group))
@@ -0,0 +1,101 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Profiling of commands with ``cProfile`` (see ``profile_mode`` class
+attribute of :class:`~ilcli.Command`).
+
+Only the validation and ``_run()`` of the invoked command are profiled:
+the interpreter startup, the construction of the command tree and the
+argument parsing are not. The stats can be written to a file, as
+``pstats`` data or in callgrind format (if the file name starts with
+``callgrind.out`` or ends with ``.callgrind``), for tools like
+``snakeviz`` or KCachegrind. A summary of the functions with the highest
+cumulative time is written to the error output anyway.
+"""
+
+import cProfile
+import collections
+import os
+import pstats
+
+
+def profile(f, path=None, err=None, top=20):
+    """
+    Profile a function call.
+
+    :param f: the function to profile (no arguments).
+    :param path: file where the stats are written (optional).
+    :param err: stream where the summary is written (optional).
+    :param top: number of functions in the summary.
+    :returns: the result of the function.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(f)
+    finally:
+        if path:
+            if is_callgrind(path):
+                with open(path, 'w') as out:
+                    write_callgrind(profiler, out)
+            else:
+                profiler.dump_stats(path)
+        if err is not None:
+            stats = pstats.Stats(profiler, stream=err)
+            stats.sort_stats('cumulative').print_stats(top)
+            if path:
+                err.write('profile written to {}\n'.format(path))
+
+
+def is_callgrind(path):
+    """
+    Whether the stats must be written to a file in callgrind format.
+    """
+    name = os.path.basename(path)
+    return name.startswith('callgrind.out') or name.endswith('.callgrind')
+
+
+def write_callgrind(profiler, out):
+    """
+    Write profiling stats in callgrind format (costs in microseconds).
+
+    :param profiler: a ``cProfile.Profile`` instance.
+    :param out: file-like object.
+    """
+    stats = pstats.Stats(profiler).stats
+    callees = collections.defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (calls, _, _, cumulative) in callers.items():
+            callees[caller].append((func, calls, cumulative))
+
+    out.write('events: Microseconds\n')
+    for func, (_, _, total, _, _) in sorted(stats.items()):
+        out.write('\nfl={}\nfn={}\n{} {}\n'.format(
+            func[0], _label(func), func[1], _cost(total)
+        ))
+        for callee, calls, cumulative in sorted(callees[func]):
+            out.write('cfl={}\ncfn={}\ncalls={} {}\n{} {}\n'.format(
+                callee[0], _label(callee), calls, callee[1], func[1],
+                _cost(cumulative)
+            ))
+
+
+def _label(func):
+    return '{}:{}'.format(func[2], func[1])
+
+
+def _cost(seconds):
+    return int(round(seconds * 1000000))
@@ -0,0 +1,150 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Structured output: records (dictionaries) written by
+:meth:`ilcli.Command.emit` one per line as they are emitted, so the
+whole result set is never held in memory.
+
+Formats:
+
+* ``ndjson``: a JSON object per line. ``orjson`` is used to encode them
+  when it is installed.
+* ``csv``: a header line with the keys of the first record, then a line
+  per record. Missing keys are left empty, nested values are encoded as
+  JSON and unknown keys raise ``ValueError``.
+
+The format is selected with the ``--output`` argument (see
+``record_formats`` class attribute of :class:`~ilcli.Command`) and the
+state of the format (e.g. whether the CSV header has been written) is
+kept per invocation of a command.
+"""
+
+import contextlib
+import contextvars
+import io
+import json
+
+#: supported formats
+FORMATS = ('ndjson', 'csv')
+
+_session = contextvars.ContextVar('ilcli_records', default=None)
+
+# the orjson module (False if it is not installed), imported on first use
+_orjson = None
+
+
+def dumps(value):
+    """
+    Encode a value as compact JSON.
+    """
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson as _orjson
+        except ImportError:  # pragma: no cover
+            _orjson = False
+    if _orjson:
+        try:
+            return _orjson.dumps(value).decode('utf-8')
+        except TypeError:
+            # e.g. non-string keys, which json converts
+            pass
+    return json.dumps(value, separators=(',', ':'))
+
+
+class NDJSONEncoder(object):
+    """
+    Encode records as JSON objects.
+    """
+
+    def encode(self, record):
+        """
+        :returns: the lines for the record.
+        """
+        return [dumps(record)]
+
+
+class CSVEncoder(object):
+    """
+    Encode records as CSV rows, with a header from the first record.
+    """
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = None
+
+    def encode(self, record):
+        """
+        :returns: the lines for the record.
+        """
+        lines = []
+        if self._writer is None:
+            import csv
+            self._writer = csv.DictWriter(
+                self._buffer, list(record), lineterminator=''
+            )
+            self._writer.writeheader()
+            lines.append(self._line())
+        self._writer.writerow(dict(
+            (k, dumps(v) if isinstance(v, (dict, list, tuple)) else v)
+            for k, v in record.items()
+        ))
+        lines.append(self._line())
+        return lines
+
+    def _line(self):
+        line = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return line
+
+
+ENCODERS = {
+    'ndjson': NDJSONEncoder,
+    'csv': CSVEncoder
+}
+
+
+@contextlib.contextmanager
+def session(output_format):
+    """
+    Keep the state of the records emitted in the current context (an
+    invocation of a command).
+
+    :param output_format: one of :data:`FORMATS`.
+    """
+    token = _session.set([output_format, None])
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def encode(record, default_format='ndjson'):
+    """
+    Encode a record in the format of the current session.
+
+    :param record: a dictionary.
+    :param default_format: the format used outside of a session.
+    :returns: the lines for the record.
+    """
+    state = _session.get()
+    if state is None:
+        return ENCODERS[default_format]().encode(record)
+    if state[1] is None:
+        state[1] = ENCODERS[state[0] or default_format]()
+    return state[1].encode(record)
@@ -0,0 +1,112 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Response files: arguments given as ``@path`` are replaced by the
+arguments read from the file at ``path``, so argument lists longer than
+the operating system allows can be passed to a command (see
+``response_file_mode`` class attribute of :class:`~ilcli.Command`).
+
+A response file contains one argument per line or, if it contains any
+NUL character, one argument per NUL-terminated string (e.g. the output
+of ``find -print0``). Arguments are not otherwise processed: there is
+no quoting nor comments. Response files can include other response
+files, with paths relative to the including file.
+
+Files are memory-mapped and their arguments are decoded one at a time,
+as they are consumed.
+"""
+
+import mmap
+import os
+
+#: prefix of the arguments naming a response file
+PREFIX = '@'
+
+
+class ResponseFileError(ValueError):
+    """
+    A response file cannot be read.
+    """
+
+
+def expand(args, directory=None):
+    """
+    Expand the response files in a list of arguments.
+
+    :param args: iterable of arguments.
+    :param directory: directory relative paths of response files are
+      relative to. Default the current directory.
+    :returns: a generator of arguments.
+    :raises ResponseFileError: if a response file cannot be read or it
+      includes itself.
+    """
+    return _expand(args, directory, ())
+
+
+def _expand(args, directory, including):
+    for arg in args:
+        if len(arg) > 1 and arg.startswith(PREFIX):
+            path = os.path.join(directory or '', arg[len(PREFIX):])
+            for a in _expand_file(path, including):
+                yield a
+        else:
+            yield arg
+
+
+def _expand_file(path, including):
+    real = os.path.realpath(path)
+    if real in including:
+        raise ResponseFileError(
+            'response file includes itself: {}'.format(
+                ' -> '.join(including + (real,))
+            )
+        )
+    try:
+        f = open(path, 'rb')
+    except OSError as e:
+        raise ResponseFileError(
+            'cannot read response file {}: {}'.format(path, e.strerror)
+        )
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for a in _expand(
+                split(data), os.path.dirname(path), including + (real,)
+            ):
+                yield a
+
+
+def split(data):
+    """
+    Split the contents of a response file into arguments.
+
+    :param data: the contents (``bytes`` or ``mmap``).
+    :returns: a generator of arguments.
+    """
+    delimiter = b'\0' if data.find(b'\0') != -1 else b'\n'
+    start = 0
+    end = len(data)
+    while start < end:
+        stop = data.find(delimiter, start)
+        if stop == -1:
+            stop = end
+        arg = data[start:stop]
+        if delimiter == b'\n' and arg.endswith(b'\r'):
+            arg = arg[:-1]
+        yield os.fsdecode(arg)
+        start = stop + 1
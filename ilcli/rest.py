@@ -0,0 +1,261 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+REST API support (requires ``flask``).
+
+Every leaf command of the served tree is available at the path made of
+its subcommand names (e.g. ``/net/ssh``, or ``/`` if the served command
+has no subcommands) and the values of the query parameters are its
+arguments.
+
+Requests are executed concurrently by a pool of worker threads (see
+``rest_workers`` class attribute of :class:`~ilcli.Command`) and the
+output of each one is captured separately (see :mod:`ilcli.streams`).
+
+By default, the response is a JSON object with the return code, output
+and error output of the command, sent once the command finishes. If
+the request accepts ``application/x-ndjson``, the response is streamed
+instead as one JSON object per line: ``{"stream": "out", "line": ...}``
+(or ``"err"``) for every line written by the command, as soon as it is
+written, and a final ``{"retcode": ...}``. At most
+``rest_stream_buffer`` lines are buffered per request: the command
+blocks when the client does not keep up, and its next write raises
+``BrokenPipeError`` if the client disconnects.
+"""
+
+import io
+import json
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from ilcli import streams
+
+#: MIME type of streamed responses
+NDJSON = 'application/x-ndjson'
+
+
+class Route(object):
+    """
+    A leaf command served at a URL path.
+
+    :param root: the served command.
+    :param names: the subcommand names from ``root`` to the leaf.
+    :param leaf: the leaf command.
+    :param values: values set by the parsers of the parent commands, or
+      ``None`` if they need to be parsed by argparse.
+    """
+
+    def __init__(self, root, names, leaf, values):
+        self.root = root
+        self.names = names
+        self.leaf = leaf
+        self.values = values
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self.names)
+
+    def parse(self, args):
+        """
+        Parse the arguments of the leaf command.
+
+        :param args: list of arguments.
+        :returns: the parsed arguments and the list of extra arguments.
+        """
+        if self.values is None:
+            return self.root._parse_known_args(self.names + args)
+        return self.leaf._parse_leaf_args(args, self.values)
+
+
+def routes(cmd):
+    """
+    Build the routing table of a (fully built) command tree.
+
+    :param cmd: the served command.
+    :returns: a list of :class:`Route`.
+    """
+    table = []
+    pending = [([], cmd, {})]
+    while pending:
+        names, node, values = pending.pop(0)
+        if not node.subcommands:
+            table.append(Route(cmd, names, node, values))
+            continue
+        defaults = node._dispatch_defaults()
+        for child in node._subcommands:
+            child_values = None
+            if values is not None and defaults is not None:
+                child_values = dict(values)
+                child_values.update(defaults)
+                child_values['cmd'] = child.name
+            pending.append((names + [child.name], child, child_values))
+    return table
+
+
+def create_app(cmd, pool):
+    """
+    Create the Flask application serving a command tree.
+
+    :param cmd: the command to serve.
+    :param pool: ``concurrent.futures.Executor`` running the requests.
+    """
+    from flask import Flask, Response, request
+
+    def run_wrapper(route):
+        def wrapper():
+            args = [v for _, v in request.args.items()]
+            accepted = request.accept_mimetypes
+            if accepted.best_match(['application/json', NDJSON]) == NDJSON:
+                return Response(
+                    stream_request(route, args, pool, cmd.rest_stream_buffer),
+                    mimetype=NDJSON
+                )
+            return json.dumps(pool.submit(run_request, route, args).result())
+        return wrapper
+
+    # built upfront as lazy loading is not thread-safe
+    cmd.load_subcommands()
+    streams.install()
+    app = Flask(cmd.name)
+    for route in routes(cmd):
+        app.add_url_rule(route.path, route.path, run_wrapper(route))
+    return app
+
+
+def run_request(route, args):
+    """
+    Run a command capturing its output.
+
+    :param route: the :class:`Route` of the command.
+    :param args: list of arguments.
+    :returns: a dictionary with the return code, output and error
+      output.
+    """
+    out = io.StringIO()
+    err = io.StringIO()
+    with streams.capture(out, err):
+        retcode = _execute(route, args)
+    return {
+        'retcode': retcode,
+        'out': out.getvalue(),
+        'err': err.getvalue()
+    }
+
+
+def stream_request(route, args, pool, size):
+    """
+    Run a command streaming its output.
+
+    :param route: the :class:`Route` of the command.
+    :param args: list of arguments.
+    :param pool: ``concurrent.futures.Executor`` running the command.
+    :param size: maximum number of lines buffered.
+    :returns: a generator of NDJSON lines.
+    """
+    frames = queue.Queue(size)
+    cancelled = threading.Event()
+    out = _FrameWriter('out', frames, cancelled)
+    err = _FrameWriter('err', frames, cancelled)
+
+    def run():
+        retcode = 1
+        try:
+            with streams.capture(out, err):
+                try:
+                    retcode = _execute(route, args)
+                except BrokenPipeError:
+                    raise
+                except Exception:
+                    err.write(traceback.format_exc())
+            out.close()
+            err.close()
+            out.put({'retcode': retcode})
+        except BrokenPipeError:
+            pass
+
+    pool.submit(run)
+
+    def generate():
+        try:
+            while True:
+                frame = frames.get()
+                yield json.dumps(frame) + '\n'
+                if 'retcode' in frame:
+                    return
+        finally:
+            cancelled.set()
+
+    return generate()
+
+
+def _execute(route, args):
+    try:
+        parsed_args, extra_args = route.parse(args)
+        return parsed_args.func(parsed_args, extra_args=extra_args)
+    except SystemExit:
+        return 1
+
+
+class _FrameWriter(object):
+    """
+    File-like object sending every line written as a frame of a
+    streamed response.
+    """
+
+    def __init__(self, name, frames, cancelled):
+        self._name = name
+        self._frames = frames
+        self._cancelled = cancelled
+        self._partial = ''
+
+    def write(self, data):
+        lines = (self._partial + data).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self.put({'stream': self._name, 'line': line})
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._partial:
+            self.put({'stream': self._name, 'line': self._partial})
+            self._partial = ''
+
+    def put(self, frame):
+        while True:
+            if self._cancelled.is_set():
+                raise BrokenPipeError('the client is gone')
+            try:
+                return self._frames.put(frame, timeout=0.1)
+            except queue.Full:
+                pass
+
+
+def serve(cmd, host='127.0.0.1', port=None):
+    """
+    Serve a command tree as a REST API.
+
+    :param cmd: the command to serve.
+    :param host: the address to listen on.
+    :param port: the port to listen on (Flask default if not provided).
+    """
+    with ThreadPoolExecutor(getattr(cmd, 'rest_workers', None)) as pool:
+        return create_app(cmd, pool).run(host=host, port=port, threaded=True)
@@ -0,0 +1,447 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persisted snapshots of :class:`~ilcli.Command` trees.
+
+A snapshot contains the resolved arguments of every parser in the tree
+(that is, once ``_init_arguments()`` and the argument inheritance have
+been executed), so the tree can be built again without executing
+them. Snapshots are stored as JSON next to the module of the root
+command (in its ``__pycache__`` directory) and they are invalidated
+when any source module of the tree changes. The list of source modules
+is stored in the snapshot, so checking it does not import the modules
+of the subcommands given as :class:`~ilcli.SubcommandRef`.
+
+Only trees whose arguments are static can be snapshotted: every
+``type``, ``action``, default value, etc. must be a JSON value or an
+importable object. Otherwise, :class:`SnapshotError` is raised when
+compiling and :func:`load` just builds the tree as usual. :func:`load`
+also remembers that in the snapshot file, so it does not try again
+(building the whole tree) until the sources change.
+
+The argparse actions inherited by many commands are stored once, in a
+table of the distinct actions, and they are decoded once per
+invocation. Commands are only built from the snapshot when they are
+selected (as in lazy mode, see ``lazy_subcommands``), so loading a
+snapshot does not depend on the size of the tree.
+
+The usage and help messages formatted by the commands of a tree built
+from a snapshot are also stored in the snapshot, so they are not
+formatted again by later invocations.
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+
+import ilcli
+from ilcli import files
+from ilcli import validation
+
+#: version of the snapshot format
+FORMAT_VERSION = 4
+
+
+class SnapshotError(Exception):
+    """
+    The command tree cannot be snapshotted.
+    """
+
+
+def load(cmd_class, path=None, **kwargs):
+    """
+    Build a command tree from its snapshot. If the snapshot does not
+    exist or it is stale, the tree is built as usual and the snapshot is
+    (re)written so next calls are faster. If the tree cannot be
+    snapshotted, it is built as usual.
+
+    :param cmd_class: the class of the root command.
+    :param path: the path of the snapshot. By default, see
+      :func:`snapshot_path`.
+    :param kwargs: extra arguments for the root command constructor.
+    :returns: the root command instance.
+    """
+    path = path or snapshot_path(cmd_class)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if (
+            data.get('version') == FORMAT_VERSION
+            and data['hash'] == _digest(data['files'])
+        ):
+            if data['tree'] is None:
+                # the tree cannot be snapshotted
+                return cmd_class(**kwargs)
+            cmd = cmd_class(snapshot=data['tree'], **kwargs)
+            cmd._snapshot_file = (path, data)
+            return cmd
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    cmd = cmd_class(**kwargs)
+    try:
+        cmd.load_subcommands()
+        data = _snapshot_data(cmd_class, cmd)
+    except SnapshotError as e:
+        data = _snapshot_data(cmd_class, None, error=str(e))
+    try:
+        files.write_json(path, data)
+    except OSError:
+        pass
+    return cmd
+
+
+def compile_snapshot(cmd_class, path=None):
+    """
+    Build the whole command tree and write its snapshot.
+
+    :param cmd_class: the class of the root command.
+    :param path: the path of the snapshot. By default, see
+      :func:`snapshot_path`.
+    :returns: the path of the snapshot.
+    :raises SnapshotError: if the tree cannot be snapshotted.
+    """
+    path = path or snapshot_path(cmd_class)
+    cmd = cmd_class()
+    cmd.load_subcommands()
+    files.write_json(path, _snapshot_data(cmd_class, cmd))
+    return path
+
+
+def _snapshot_data(cmd_class, cmd, error=None):
+    """
+    Contents of the snapshot file of a tree, without the tree (and with
+    the reason) if it cannot be snapshotted.
+    """
+    files = source_files(cmd_class)
+    data = {
+        'version': FORMAT_VERSION,
+        'files': files,
+        'hash': _digest(files),
+        'tree': None if cmd is None else dump(cmd)
+    }
+    if error is not None:
+        data['error'] = error
+    return data
+
+
+def snapshot_path(cmd_class):
+    """
+    Default path of the snapshot of a command tree: a file in the
+    ``__pycache__`` directory next to the module of the root command.
+
+    :param cmd_class: the class of the root command.
+    """
+    module = sys.modules[cmd_class.__module__]
+    directory = os.path.dirname(os.path.abspath(module.__file__))
+    return os.path.join(
+        directory, '__pycache__', '{}.{}.ilcli-{}{}.json'.format(
+            module.__name__.rpartition('.')[2],
+            cmd_class.__qualname__,
+            *sys.version_info[:2]
+        )
+    )
+
+
+def source_hash(cmd_class):
+    """
+    Hash of the source modules defining a command tree (including
+    ``ilcli``) so a snapshot is never used once any of them changes.
+
+    :param cmd_class: the class of the root command.
+    """
+    return _digest(source_files(cmd_class))
+
+
+def source_files(cmd_class):
+    """
+    Sorted list of the source modules defining a command tree (including
+    ``ilcli``). Subcommands given as :class:`~ilcli.SubcommandRef` (and
+    plugins) are imported.
+
+    :param cmd_class: the class of the root command.
+    """
+    from ilcli import plugins
+
+    files = set(
+        os.path.join(os.path.dirname(ilcli.__file__), f)
+        for f in os.listdir(os.path.dirname(ilcli.__file__))
+        if f.endswith('.py')
+    )
+    pending = [cmd_class]
+    seen = set()
+    while pending:
+        c = pending.pop()
+        if isinstance(c, ilcli.SubcommandRef):
+            c = c.load()
+        if c in seen:
+            continue
+        seen.add(c)
+        for base in c.__mro__:
+            module = sys.modules.get(base.__module__)
+            if getattr(module, '__file__', None):
+                files.add(os.path.abspath(module.__file__))
+        pending.extend(plugins.subcommands(c))
+    return sorted(files)
+
+
+def _digest(files):
+    digest = hashlib.sha256(sys.version.encode())
+    for name in files:
+        digest.update(name.encode())
+        with open(name, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def dump(cmd, table=None):
+    """
+    Convert the parsers of a (fully built) command tree into a JSON
+    serializable structure.
+
+    :param cmd: the root command.
+    :param table: distinct actions found so far, by their JSON
+      representation (only for the subcommands).
+    :raises SnapshotError: if the tree cannot be snapshotted.
+    """
+    root = table is None
+    if root:
+        table = {}
+    parser = cmd.parser
+    if parser._mutually_exclusive_groups:
+        raise SnapshotError(
+            '{}: mutually exclusive groups are not supported'.format(
+                parser.prog
+            )
+        )
+    default_groups = (parser._positionals, parser._optionals)
+    grouped = set(
+        id(a) for g in parser._action_groups if g not in default_groups
+        for a in g._group_actions
+    )
+    actions = []
+    for action in parser._actions:
+        if isinstance(
+            action, (argparse._HelpAction, argparse._SubParsersAction)
+        ):
+            continue
+        if id(action) in grouped:
+            raise SnapshotError(
+                '{}: argument groups are not supported'.format(parser.prog)
+            )
+        attrs = dict(vars(action))
+        # set again when the action is added to the parser
+        attrs.pop('container', None)
+        entry = {
+            'class': _encode(type(action), cmd),
+            'attrs': _encode(attrs, cmd)
+        }
+        key = json.dumps(entry, sort_keys=True)
+        if key not in table:
+            table[key] = (len(table), entry)
+        actions.append(table[key][0])
+    node = {
+        'known_options': sorted(cmd._known_options),
+        'actions': actions,
+        'defaults': _encode(parser._defaults, cmd),
+        'help': dict(getattr(parser, '_ilcli_messages', {})),
+        'dests': list(validation.declared_dests(cmd)),
+        'subcommands': dict(
+            (c.name, dump(c, table)) for c in cmd._subcommands
+        )
+    }
+    if root:
+        node['table'] = [entry for _, entry in sorted(table.values())]
+    return node
+
+
+def apply(cmd, node):
+    """
+    Add the arguments stored in a snapshot node to the parser of a
+    command (instead of executing ``init_arguments()``).
+
+    :param cmd: the command being built.
+    :param node: the snapshot node of the command.
+    """
+    if 'table' in node:
+        cmd._snapshot_table = _Table(node['table'])
+    else:
+        cmd._snapshot_table = cmd._parent._snapshot_table
+    cmd._known_options.update(node['known_options'])
+    for index in node['actions']:
+        cmd.parser._add_action(cmd._snapshot_table.action(index, cmd))
+    cmd.parser.set_defaults(**_decode(node['defaults'], cmd))
+    # the arguments of the commands with subcommands are not in the
+    # snapshot, only passed to the subcommands
+    cmd._validation_dests = tuple(node['dests'])
+
+
+class _Table(object):
+    """
+    The distinct actions of a snapshot, decoded once.
+
+    :param entries: the encoded actions.
+    """
+
+    def __init__(self, entries):
+        self._entries = entries
+        self._decoded = {}
+
+    def action(self, index, cmd):
+        """
+        Build an action of a command.
+
+        :param index: the index of the action in the table.
+        :param cmd: the command the action is for.
+        """
+        decoded = self._decoded.get(index)
+        if decoded is None:
+            entry = self._entries[index]
+            attrs, relative = {}, {}
+            for name, value in entry['attrs']['__dict__'].items():
+                # references to commands are relative to each command
+                if _relative(value):
+                    relative[name] = value
+                else:
+                    attrs[name] = _decode(value, cmd)
+            decoded = self._decoded[index] = (
+                _decode(entry['class'], cmd), attrs, relative
+            )
+        cls, attrs, relative = decoded
+        action = object.__new__(cls)
+        action.__dict__.update(attrs)
+        for name, value in relative.items():
+            action.__dict__[name] = _decode(value, cmd)
+        return action
+
+
+def _relative(value):
+    if isinstance(value, list):
+        return any(_relative(v) for v in value)
+    if not isinstance(value, dict):
+        return False
+    if '__command__' in value or '__method__' in value:
+        return True
+    return any(_relative(v) for v in value.values())
+
+
+def store_help(cmd, key, message):
+    """
+    Store a formatted usage or help message of a command built from a
+    snapshot in the snapshot file.
+
+    :param cmd: the command.
+    :param key: the key of the message.
+    :param message: the message.
+    """
+    cmd._snapshot.setdefault('help', {})[key] = message
+    root = cmd
+    while root._parent is not None:
+        root = root._parent
+    snapshot_file = getattr(root, '_snapshot_file', None)
+    if snapshot_file is not None:
+        try:
+            files.write_json(*snapshot_file)
+        except OSError:
+            pass
+
+
+def _encode(value, cmd):
+    from ilcli.command import Command
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_encode(v, cmd) for v in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(v, cmd) for v in value]}
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise SnapshotError('non-string keys in {!r}'.format(value))
+        return {'__dict__': dict((k, _encode(v, cmd)) for k, v in
+                                 value.items())}
+    if isinstance(value, Command):
+        return {'__command__': _levels_up(value, cmd)}
+    if (
+        getattr(value, '__func__', None) is not None
+        and isinstance(value.__self__, Command)
+    ):
+        return {'__method__': [
+            _levels_up(value.__self__, cmd), value.__func__.__name__
+        ]}
+    if isinstance(value, type) or callable(value):
+        ref = '{}:{}'.format(
+            getattr(value, '__module__', None),
+            getattr(value, '__qualname__', None)
+        )
+        try:
+            found = _resolve(ref)
+        except (ImportError, AttributeError, ValueError):
+            found = None
+        if found is value:
+            return {'__ref__': ref}
+    raise SnapshotError('{!r} cannot be snapshotted'.format(value))
+
+
+def _decode(value, cmd):
+    if isinstance(value, list):
+        return [_decode(v, cmd) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__tuple__' in value:
+        return tuple(_decode(v, cmd) for v in value['__tuple__'])
+    if '__dict__' in value:
+        return dict(
+            (k, _decode(v, cmd)) for k, v in value['__dict__'].items()
+        )
+    if '__command__' in value:
+        return _ancestor(cmd, value['__command__'])
+    if '__method__' in value:
+        levels, name = value['__method__']
+        return getattr(_ancestor(cmd, levels), name)
+    return _resolve(value['__ref__'])
+
+
+def _levels_up(target, cmd):
+    levels = 0
+    while cmd is not None:
+        if cmd is target:
+            return levels
+        cmd = cmd._parent
+        levels += 1
+    raise SnapshotError(
+        '{!r} is not an ancestor of the command'.format(target)
+    )
+
+
+def _ancestor(cmd, levels):
+    for _ in range(levels):
+        cmd = cmd._parent
+    return cmd
+
+
+def _resolve(ref):
+    module_name, _, qualname = ref.partition(':')
+    if '<locals>' in qualname:
+        raise ValueError(ref)
+    obj = importlib.import_module(module_name)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
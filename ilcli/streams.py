@@ -0,0 +1,225 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Output streams.
+
+:func:`capture` redirects the output of :meth:`ilcli.Command.out` and
+:meth:`ilcli.Command.err` (and ``sys.stdout``/``sys.stderr`` once
+:func:`install` has been called) only for the current thread or
+asyncio task, so several commands can run concurrently in the same
+process without mixing their output.
+
+Otherwise, commands write through a :class:`Writer`, which flushes the
+stream according to a buffering policy (see ``output_buffering`` class
+attribute of :class:`~ilcli.Command`):
+
+* ``unbuffered``: flush after every write.
+* ``line``: flush after every line (default).
+* ``block``: flush once ``output_buffer_size`` characters are buffered
+  or ``output_flush_interval`` seconds after the first buffered write
+  (from a timer thread if nothing else is written meanwhile).
+* ``auto``: ``line`` if the stream is a TTY, ``block`` otherwise.
+"""
+
+import collections
+import contextlib
+import contextvars
+import os
+import signal
+import sys
+import threading
+
+#: buffering policies
+POLICIES = ('unbuffered', 'line', 'block', 'auto')
+
+_streams = contextvars.ContextVar('ilcli_streams', default=None)
+
+
+@contextlib.contextmanager
+def capture(out, err):
+    """
+    Redirect the output and error output of the commands run in the
+    current context::
+
+      with capture(io.StringIO(), io.StringIO()):
+          cmd.run(args)
+
+    :param out: stream for the output.
+    :param err: stream for the error output.
+    """
+    token = _streams.set((out, err))
+    try:
+        yield
+    finally:
+        _streams.reset(token)
+
+
+def out(default):
+    """
+    The output stream of the current context.
+
+    :param default: stream to use if the output is not captured.
+    """
+    streams = _streams.get()
+    return default if streams is None else streams[0]
+
+
+def err(default):
+    """
+    The error output stream of the current context.
+
+    :param default: stream to use if the error output is not captured.
+    """
+    streams = _streams.get()
+    return default if streams is None else streams[1]
+
+
+class ContextStream(object):
+    """
+    File-like object writing to the stream of the current context (see
+    :func:`capture`), or to a default stream otherwise.
+    """
+
+    def __init__(self, default, index):
+        self._default = default
+        self._index = index
+
+    def _stream(self):
+        streams = _streams.get()
+        return self._default if streams is None else streams[self._index]
+
+    def write(self, data):
+        return self._stream().write(data)
+
+    def flush(self):
+        return self._stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream(), name)
+
+
+def install():
+    """
+    Replace ``sys.stdout`` and ``sys.stderr`` by :class:`ContextStream`
+    objects, so anything printed through them (e.g. argparse errors or
+    ``print()`` calls) is also captured by :func:`capture`. It can be
+    called several times.
+    """
+    if not isinstance(sys.stdout, ContextStream):
+        sys.stdout = ContextStream(sys.stdout, 0)
+    if not isinstance(sys.stderr, ContextStream):
+        sys.stderr = ContextStream(sys.stderr, 1)
+
+
+class Writer(object):
+    """
+    Write to a stream following a buffering policy.
+
+    :param stream: the stream to write to.
+    :param policy: one of :data:`POLICIES`.
+    :param size: maximum number of buffered characters (``block``).
+    :param interval: maximum seconds data stays buffered (``block``).
+    """
+
+    def __init__(self, stream, policy='line', size=65536, interval=1.0):
+        if policy not in POLICIES:
+            raise ValueError('unknown buffering policy: {}'.format(policy))
+        if policy == 'auto':
+            isatty = getattr(stream, 'isatty', None)
+            policy = 'line' if isatty and isatty() else 'block'
+        self.stream = stream
+        self.policy = policy
+        self.size = size
+        self.interval = interval
+        # appending to a deque is thread-safe, so writes do not need the
+        # lock taken by flushes (which can run in the timer thread)
+        self._buffer = collections.deque()
+        self._buffered = 0
+        # flushes the buffer after the interval (block)
+        self._timer = None
+        self._lock = threading.RLock()
+
+    @property
+    def buffered(self):
+        """
+        Whether the writer keeps data in its own buffer.
+        """
+        return self.policy == 'block'
+
+    def write(self, data):
+        if self.policy != 'block':
+            self.stream.write(data)
+            if self.policy == 'unbuffered' or '\n' in data:
+                self.stream.flush()
+            return
+
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.size or self.interval <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            # unset before taking the data, so a concurrent write whose
+            # data is not taken finds no timer and starts another one
+            timer, self._timer = self._timer, None
+            if timer is not None:
+                timer.cancel()
+            if self._buffer:
+                self._buffered = 0
+                buffer = self._buffer
+                data = ''.join([buffer.popleft() for _ in range(len(buffer))])
+                self.stream.write(data)
+            self.stream.flush()
+
+
+@contextlib.contextmanager
+def flushing(*writers):
+    """
+    Flush writers when the block exits, even because of an error, or
+    when the process receives a termination signal (``SIGTERM`` or
+    ``SIGHUP``) meanwhile.
+
+    :param writers: list of :class:`Writer`.
+    """
+    previous = {}
+
+    def handler(signum, frame):
+        for w in writers:
+            w.flush()
+        signal.signal(signum, previous.pop(signum))
+        os.kill(os.getpid(), signum)
+
+    if (
+        any(w.buffered for w in writers)
+        and threading.current_thread() is threading.main_thread()
+    ):
+        for name in ('SIGTERM', 'SIGHUP'):
+            signum = getattr(signal, name, None)
+            if signum is not None:
+                previous[signum] = signal.signal(signum, handler)
+    try:
+        yield
+    finally:
+        for signum, h in previous.items():
+            signal.signal(signum, h)
+        for w in writers:
+            w.flush()
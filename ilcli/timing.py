@@ -0,0 +1,114 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Opt-in timing of the phases of a command invocation, per node of the
+command tree:
+
+* ``construct``: ``Command.__init__()`` (including the subcommands built
+  with it).
+* ``parse``: the argument parsing, recorded on the root command.
+* ``validate``: ``_validate_arguments()`` and
+  ``_validate_extra_arguments()`` of every command of the validation
+  chain.
+* ``run``: ``_run()`` of the invoked command.
+
+Timings are reported as :class:`Timing` tuples to the callbacks
+registered with :func:`add_hook` and, if the ``ILCLI_TIMING``
+environment variable is set (to a non-empty value), written as a line
+per timing to the standard error of the process::
+
+  ilcli-timing construct mycli/net 0.412ms
+
+When it is disabled (the default), the cost is a flag check per phase.
+"""
+
+import collections
+import os
+import sys
+import time
+
+#: a phase of a command: the names of the commands from the root to the
+# node, the ``time.perf_counter()`` value at its start and its duration
+# in seconds
+Timing = collections.namedtuple('Timing', 'phase path start duration')
+
+#: clock used for timings
+clock = time.perf_counter
+
+#: whether timings are being recorded (do not set it directly)
+active = False
+
+_hooks = []
+_environ = False
+
+
+def add_hook(callback):
+    """
+    Register a callback called with every :class:`Timing` recorded.
+
+    :param callback: a function with a single argument.
+    """
+    global active
+    _hooks.append(callback)
+    active = True
+
+
+def remove_hook(callback):
+    """
+    Unregister a callback added with :func:`add_hook`.
+    """
+    global active
+    _hooks.remove(callback)
+    active = bool(_hooks) or _environ
+
+
+def enable_environ(enabled=None):
+    """
+    Enable (or disable) writing timings to the standard error of the
+    process. By default, it depends on ``ILCLI_TIMING`` environment
+    variable, which is checked when this module is imported.
+    """
+    global active, _environ
+    if enabled is None:
+        enabled = bool(os.environ.get('ILCLI_TIMING'))
+    _environ = enabled
+    active = bool(_hooks) or _environ
+
+
+def record(phase, cmd, start):
+    """
+    Report the timing of a phase finishing now.
+
+    :param phase: the name of the phase.
+    :param cmd: the command.
+    :param start: the :data:`clock` value at the start of the phase.
+    """
+    duration = clock() - start
+    names = []
+    while cmd is not None:
+        names.append(cmd.name)
+        cmd = cmd._parent
+    timing = Timing(phase, tuple(reversed(names)), start, duration)
+    for callback in list(_hooks):
+        callback(timing)
+    if _environ:
+        sys.__stderr__.write('ilcli-timing {} {} {:.3f}ms\n'.format(
+            phase, '/'.join(timing.path), duration * 1000
+        ))
+
+
+enable_environ()
@@ -0,0 +1,176 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Validation of the ancestors of a command.
+
+When a command runs, the validation methods of all its ancestors run
+first. :class:`Cache` keeps the results of an ancestor for the values
+of the arguments it declares (see ``validation_cache_ttl`` class
+attribute of :class:`~ilcli.Command`), so expensive validations (e.g.
+checking credentials) are not repeated by every invocation of a batch
+or a server with the same values. Only validations whose result
+depends just on those arguments must be cached: any other side effect
+is skipped when the result is cached.
+
+The validations of the whole chain can also run concurrently when they
+do not depend on each other (see ``concurrent_validation``).
+"""
+
+import argparse
+import collections
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Cache(object):
+    """
+    Thread-safe LRU cache whose entries expire.
+
+    :param size: maximum number of entries.
+    :param ttl: seconds an entry is valid.
+    """
+
+    def __init__(self, size=128, ttl=60.0):
+        self.size = size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get an entry.
+
+        :param key: the key of the entry.
+        :returns: ``(True, value)`` if the entry is cached and valid,
+          ``(False, None)`` otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if time.monotonic() >= entry[0]:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key, value):
+        """
+        Add an entry, evicting the least recently used one if the cache
+        is full.
+
+        :param key: the key of the entry.
+        :param value: the value of the entry.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def declared_dests(cmd):
+    """
+    Destinations of the arguments declared by a command (including the
+    ones it inherits), i.e. the parsed arguments its validation can
+    depend on.
+
+    :param cmd: the :class:`~ilcli.Command`.
+    :returns: a sorted tuple of destinations.
+    """
+    dests = set(
+        a.dest for a in cmd.parser._actions
+        if not isinstance(a, argparse._SubParsersAction)
+    )
+    for option_strings, kwargs, optional, _ in cmd._inherited:
+        if optional:
+            dests.add(cmd.parser._get_optional_kwargs(
+                *option_strings, **kwargs
+            )['dest'])
+        else:
+            dests.add(option_strings[0])
+    dests.discard(argparse.SUPPRESS)
+    return tuple(sorted(dests))
+
+
+def key(dests, parsed_args):
+    """
+    Cache key of the values of some parsed arguments.
+
+    :param dests: the destinations of the arguments.
+    :param parsed_args: the parsed arguments.
+    :returns: the key, or ``None`` if some value cannot be hashed.
+    """
+    try:
+        result = tuple(
+            _freeze(getattr(parsed_args, d, None)) for d in dests
+        )
+        hash(result)
+    except TypeError:
+        return None
+    return result
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+# pool of threads running validations, and the process it was created in
+_pool = None
+_lock = threading.Lock()
+
+
+def run_concurrently(functions):
+    """
+    Run functions concurrently, each one in a copy of the current
+    context (so output captured by :func:`ilcli.streams.capture` stays
+    captured). The last one runs in the current thread.
+
+    :param functions: list of functions without arguments.
+    :returns: the list of their results.
+    """
+    futures = [
+        _executor().submit(contextvars.copy_context().run, f)
+        for f in functions[:-1]
+    ]
+    last = functions[-1]()
+    return [f.result() for f in futures] + [last]
+
+
+def _executor():
+    global _pool
+    with _lock:
+        if _pool is None or _pool[1] != os.getpid():
+            _pool = (ThreadPoolExecutor(thread_name_prefix='ilcli'),
+                     os.getpid())
+        return _pool[0]
@@ -0,0 +1,37 @@
+# -*- mode:python; coding:utf-8 -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Subcommands referenced by test_subcommand_ref (imported lazily).
+"""
+
+import ilcli
+
+
+class ping(ilcli.Command):
+    """ping a host"""
+
+    def _init_arguments(self):
+        self.add_argument('host')
+
+    def _run(self, args):
+        self.out('ping %s %s', args.host, args.verbose)
+        return 0
+
+
+class net(ilcli.Command):
+    """network tools"""
+    subcommands = [ping]
@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import unittest
+
+from ilcli.args import ExtraArgumentsError, kv_args_to_dict
+
+
+class KVArgsTests(unittest.TestCase):
+
+    def test_pairs(self):
+        """
+        Test that pairs of --key value are converted into a dictionary
+        """
+        self.assertEqual(
+            {'name': 'x', 'size': '-', 'count': '3'},
+            kv_args_to_dict(['--name', 'x', '--size', '-', '--count', '3'])
+        )
+        self.assertEqual({}, kv_args_to_dict([]))
+
+    def test_iterator(self):
+        """
+        Test that the arguments can be read from an iterator
+        """
+        args = (a for i in range(1000) for a in ('--k{}'.format(i), str(i)))
+        result = kv_args_to_dict(args)
+        self.assertEqual(1000, len(result))
+        self.assertEqual('999', result['k999'])
+
+    def test_schema(self):
+        """
+        Test that values are converted by the functions of the schema
+        """
+        self.assertEqual(
+            {'count': 3, 'ratio': 0.5, 'name': '7'},
+            kv_args_to_dict(
+                ['--count', '3', '--ratio', '.5', '--name', '7'],
+                schema={'count': int, 'ratio': float}
+            )
+        )
+
+    def test_all_errors(self):
+        """
+        Test that every bad argument is reported with its position
+        """
+        with self.assertRaises(ExtraArgumentsError) as cm:
+            kv_args_to_dict(
+                ['--a', '1', '-b', '2', 'c', '--d', '--n', 'x', '--e'],
+                schema={'n': int}
+            )
+        self.assertEqual(
+            [2, 4, 5, 7, 9], [p for p, _ in cm.exception.errors]
+        )
+        message = str(cm.exception)
+        self.assertTrue(message.startswith(
+            "bad extra arguments. Pairs of '--key value' are expected. "
+            "Got: --a 1 -b 2 c --d --n x --e."
+        ))
+        self.assertIn("2: '-b' is a short option", message)
+        self.assertIn("7: invalid int value 'x'", message)
+        self.assertIn('9: missing value', message)
+        self.assertIsInstance(cm.exception, ValueError)
+
+    def test_argument_type_error(self):
+        """
+        Test that converters can raise argparse.ArgumentTypeError
+        """
+        def even(value):
+            if int(value) % 2:
+                raise argparse.ArgumentTypeError(
+                    '{} is not even'.format(value)
+                )
+            return int(value)
+
+        self.assertEqual({'n': 2}, kv_args_to_dict(
+            ['--n', '2'], schema={'n': even}
+        ))
+        with self.assertRaises(ExtraArgumentsError) as cm:
+            kv_args_to_dict(['--n', '3'], schema={'n': even})
+        self.assertEqual([(1, '3 is not even')], cm.exception.errors)
+
+    def test_long_list(self):
+        """
+        Test that only the first arguments of a long list are shown
+        """
+        args = ['--k', 'v'] * 50000 + ['x']
+        with self.assertRaises(ExtraArgumentsError) as cm:
+            kv_args_to_dict(args)
+        message = str(cm.exception)
+        self.assertIn('Got: --k v --k v', message)
+        self.assertIn('... (99981 more).', message)
+        self.assertLess(len(message), 500)
+
+    def test_errors_in_iterator(self):
+        """
+        Test that the errors of a long iterator are summarized
+        """
+        with self.assertRaises(ExtraArgumentsError) as cm:
+            kv_args_to_dict(str(i) for i in range(100))
+        self.assertEqual(50, len(cm.exception.errors))
+        self.assertNotIn('Got:', str(cm.exception))
+        self.assertIn('(40 more)', str(cm.exception))
@@ -0,0 +1,167 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import ilcli
+
+
+class a(ilcli.Command):
+
+    def _init_arguments(self):
+        self.add_argument('--foo', default='a')
+
+
+class b(ilcli.Command):
+    ignore_arguments = ['--bar']
+
+
+class c(ilcli.Command):
+    inherit_arguments = False
+
+    def _init_arguments(self):
+        self.add_argument('-v', help='c verbose')
+
+
+class node(ilcli.Command):
+    subcommands = [a, b, c]
+
+    def _init_arguments(self):
+        self.add_argument('-b', '--bar')
+
+
+class root(ilcli.Command):
+    subcommands = [node]
+
+    def _init_arguments(self):
+        self.add_argument('-f', '--foo', default='root')
+        self.add_argument('-v', '--verbose', action='store_true')
+
+
+class plain(ilcli.Command):
+    pass
+
+
+class leveled(ilcli.Command):
+
+    def _init_arguments(self):
+        self.parser.set_defaults(level='from-leveled')
+
+
+class levels(ilcli.Command):
+    subcommands = [plain, leveled]
+
+    def _init_arguments(self):
+        self.add_argument('--level')
+
+
+class InheritanceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = root()
+        self.a, self.b, self.c = self.cmd._subcommands[0]._subcommands
+
+    def options(self, cmd):
+        return [a.option_strings for a in cmd.parser._actions]
+
+    def test_inherited_options(self):
+        """
+        Test the options each leaf inherits
+        """
+        self.assertEqual(
+            [['-h', '--help'], ['--foo'], ['-b', '--bar'], ['-f'],
+             ['-v', '--verbose']],
+            self.options(self.a)
+        )
+        self.assertEqual(
+            [['-h', '--help'], ['-f', '--foo'], ['-v', '--verbose']],
+            self.options(self.b)
+        )
+        self.assertEqual([['-h', '--help'], ['-v']], self.options(self.c))
+
+    def test_parse(self):
+        """
+        Test that leaves parse their own and inherited options
+        """
+        args = self.cmd.parser.parse_args(['node', 'a', '-f', 'x', '-v'])
+        self.assertEqual(('a', 'x', True), (args.foo, args.f, args.verbose))
+        args = self.cmd.parser.parse_args(['node', 'b', '-f', 'x'])
+        self.assertEqual(('x', False), (args.foo, args.verbose))
+
+    def test_add_argument_after_build(self):
+        """
+        Test that arguments added once the tree is built are inherited
+        """
+        self.cmd.add_argument('--late', default='late')
+        self.assertIn(['--late'], self.options(self.a))
+        self.assertIn(['--late'], self.options(self.b))
+        self.assertNotIn(['--late'], self.options(self.c))
+
+    def test_conflict_resolve(self):
+        """
+        Test inheritance with parsers resolving conflicts
+        """
+        class resolving(node):
+            name = 'node'
+            parser_args = {'conflict_handler': 'resolve'}
+
+        class resolving_root(root):
+            subcommands = [resolving]
+
+        cmd = resolving_root()
+        leaf_a, leaf_b, _ = cmd._subcommands[0]._subcommands
+        leaf_b.parser.add_argument('--foo', dest='override')
+        self.assertIn(['-f'], self.options(leaf_b))
+        self.assertIn(['--foo'], self.options(leaf_b))
+        self.assertIn(['-b', '--bar'], self.options(leaf_a))
+        args = cmd.parser.parse_args(['node', 'b', '--foo', 'x'])
+        self.assertEqual(('root', 'x'), (args.foo, args.override))
+
+    def test_leaves_do_not_share_actions(self):
+        """
+        Test that changing the inherited arguments of a leaf does not
+        change them in its siblings
+        """
+        self.a.parser.set_defaults(verbose='A')
+        self.b.parser._option_string_actions['-f'].help = 'changed'
+        self.assertFalse(
+            self.cmd.parser.parse_args(['node', 'b']).verbose
+        )
+        self.assertEqual(
+            'A', self.cmd.parser.parse_args(['node', 'a']).verbose
+        )
+        self.assertIsNone(self.a.parser._option_string_actions['-f'].help)
+        self.assertTrue(set(map(id, self.a.parser._actions)).isdisjoint(
+            map(id, self.b.parser._actions)
+        ))
+
+    def test_leaf_defaults(self):
+        """
+        Test that inherited arguments take the defaults set in the parser
+        of each leaf
+        """
+        class other(plain):
+            pass
+
+        self.addCleanup(setattr, levels, 'subcommands', levels.subcommands)
+        for subcommands in ([plain, leveled, other], [leveled, plain]):
+            levels.subcommands = subcommands
+            cmd = levels()
+            for leaf in cmd._subcommands:
+                args = cmd.parser.parse_args([leaf.name])
+                expected = 'from-leveled' if leaf.name == 'leveled' else None
+                self.assertEqual(expected, args.level)
@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import io
+import time
+import unittest
+
+import ilcli
+from ilcli import streams
+
+
+class fetch(ilcli.Command):
+    """fetch something"""
+
+    def _init_arguments(self):
+        self.add_argument('what')
+
+    async def _run(self, args):
+        await asyncio.sleep(0.05)
+        self.out('fetched %s', args.what)
+        return 0
+
+
+class sync(ilcli.Command):
+    """synchronous command"""
+
+    def _init_arguments(self):
+        self.add_argument('what')
+
+    def _run(self, args):
+        self.out('sync %s', args.what)
+        return 0
+
+
+class remote(ilcli.Command):
+    subcommands = [fetch, sync]
+
+    def _init_arguments(self):
+        self.add_argument('--token', default='ok')
+
+    async def _validate_arguments(self, args):
+        await asyncio.sleep(0)
+        if args.token != 'ok':
+            self.err('bad token')
+            return 1
+
+
+class AsyncTests(unittest.TestCase):
+
+    def run_cmd(self, args):
+        out, err = io.StringIO(), io.StringIO()
+        with streams.capture(out, err):
+            retcode = remote().run(args)
+        return retcode, out.getvalue(), err.getvalue()
+
+    def test_run(self):
+        """
+        Test that run() drives coroutine methods
+        """
+        self.assertEqual((0, 'fetched x\n', ''), self.run_cmd(['fetch', 'x']))
+        self.assertEqual((0, 'sync x\n', ''), self.run_cmd(['sync', 'x']))
+
+    def test_async_validation(self):
+        """
+        Test that async validation prevents running the command
+        """
+        self.assertEqual(
+            (1, '', 'bad token\n'),
+            self.run_cmd(['fetch', 'x', '--token', 'bad'])
+        )
+
+    def test_run_async(self):
+        """
+        Test that many commands run concurrently in the same loop
+        """
+        async def run_all():
+            cmd = remote()
+            return await asyncio.gather(*[
+                cmd.run_async(['fetch', str(i)]) for i in range(10)
+            ] + [cmd.run_async(['sync', 'x'])])
+
+        out = io.StringIO()
+        start = time.monotonic()
+        with streams.capture(out, io.StringIO()):
+            retcodes = asyncio.run(run_all())
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual([0] * 11, retcodes)
+        self.assertEqual(11, len(out.getvalue().splitlines()))
@@ -0,0 +1,226 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import sys
+import unittest
+from unittest import mock
+
+import ilcli
+
+from .helpers import iostream
+
+
+class add(ilcli.Command):
+    """add numbers"""
+
+    def _init_arguments(self):
+        self.add_argument('numbers', type=int, nargs='+')
+
+    def _run(self, args):
+        self.out('%d', sum(args.numbers))
+        if sum(args.numbers) < 0:
+            sys.exit('negative!')
+        return 0
+
+
+class fail(ilcli.Command):
+    """fail with a code"""
+
+    def _init_arguments(self):
+        self.add_argument('code', type=int)
+
+    def _run(self, args):
+        self.err('failing')
+        return args.code
+
+
+class crash(ilcli.Command):
+    """raise an exception"""
+
+    def _run(self, args):
+        self.out('crashing')
+        raise RuntimeError('boom')
+
+
+class calc(ilcli.Command):
+    subcommands = [add, fail, crash]
+    batch_mode = True
+
+
+class ping(ilcli.Command):
+    """ping a host"""
+
+    def _init_arguments(self):
+        self.add_argument('host')
+
+    def _run(self, args):
+        self.out('%s %s', args.host, args.verbose)
+
+
+class net(ilcli.Command):
+    subcommands = [ping]
+    batch_mode = True
+
+
+class tool(ilcli.Command):
+    subcommands = [net]
+
+    def _init_arguments(self):
+        self.add_argument('-v', '--verbose', action='store_true')
+
+    def _validate_arguments(self, args):
+        self.err('validated')
+
+
+RECORDS = '''
+add 1 2
+# a comment
+add "3" 4  # another comment
+add x
+fail 3
+add -5 1
+'''
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout, self.stderr = sys.stdout, sys.stderr
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+
+    def check(self, out):
+        results = [json.loads(line) for line in out.splitlines()]
+        # numbered by input line
+        self.assertEqual([2, 4, 5, 6, 7], [r['record'] for r in results])
+        self.assertEqual(
+            [['add', '1', '2'], ['add', '3', '4'], ['add', 'x'], ['fail', '3'],
+             ['add', '-5', '1']],
+            [r['args'] for r in results]
+        )
+        self.assertEqual([0, 0, 2, 3, 1], [r['retcode'] for r in results])
+        self.assertEqual(
+            ['3\n', '7\n', '', '', '-4\n'], [r['out'] for r in results]
+        )
+        self.assertIn("invalid int value: 'x'", results[2]['err'])
+        self.assertEqual('failing\n', results[3]['err'])
+        self.assertEqual('negative!\n', results[4]['err'])
+
+    def test_run_batch(self):
+        """
+        Test that every record runs isolated from the rest
+        """
+        out = iostream()
+        self.assertEqual(3, calc(out=out).run_batch(iostream(RECORDS)))
+        self.check(out.getvalue())
+
+    def test_parallel(self):
+        """
+        Test records run by a pool of processes in order
+        """
+        out = iostream()
+        self.assertEqual(
+            3, calc(out=out).run_batch(iostream(RECORDS), workers=2)
+        )
+        self.check(out.getvalue())
+
+    def test_parallel_unordered(self):
+        """
+        Test records run by a pool of processes in completion order
+        """
+        out = iostream()
+        records = ''.join('add {}\n'.format(i) for i in range(20))
+        self.assertEqual(0, calc(out=out).run_batch(
+            iostream(records), workers=2, ordered=False
+        ))
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            list(range(1, 21)), sorted(r['record'] for r in results)
+        )
+        for r in results:
+            self.assertEqual('{}\n'.format(r['record'] - 1), r['out'])
+
+    def test_exception(self):
+        """
+        Test that an exception only fails the record raising it
+        """
+        for workers in (1, 2):
+            out = iostream()
+            self.assertEqual(1, calc(out=out).run_batch(
+                iostream('add 1\ncrash\nadd 2\n'), workers=workers
+            ))
+            results = [
+                json.loads(line) for line in out.getvalue().splitlines()
+            ]
+            self.assertEqual([0, 1, 0], [r['retcode'] for r in results])
+            self.assertEqual(
+                ['1\n', 'crashing\n', '2\n'], [r['out'] for r in results]
+            )
+            self.assertIn('Traceback', results[1]['err'])
+            self.assertIn('RuntimeError: boom', results[1]['err'])
+
+    def test_invalid_line(self):
+        """
+        Test that lines which cannot be split only fail their record
+        """
+        for workers in (1, 2):
+            out = iostream()
+            self.assertEqual(2, calc(out=out).run_batch(
+                iostream('add 1\nadd "x\n\nadd 2\n'), workers=workers
+            ))
+            results = [
+                json.loads(line) for line in out.getvalue().splitlines()
+            ]
+            self.assertEqual([1, 2, 4], [r['record'] for r in results])
+            self.assertEqual([0, 2, 0], [r['retcode'] for r in results])
+            self.assertEqual(['1\n', '', '2\n'], [r['out'] for r in results])
+            self.assertIsNone(results[1]['args'])
+            self.assertIn('No closing quotation', results[1]['err'])
+            self.assertIn('add "x', results[1]['err'])
+
+    def test_subcommand(self):
+        """
+        Test batches of a subcommand run with its inherited arguments and
+        the validation of its ancestors, also in worker processes
+        """
+        for workers in (1, 2):
+            out = iostream()
+            self.assertEqual(0, tool(out=out)._subcommand('net').run_batch(
+                iostream('ping a\nping b -v\n'), workers=workers
+            ))
+            results = [
+                json.loads(line) for line in out.getvalue().splitlines()
+            ]
+            self.assertEqual(
+                ['a False\n', 'b True\n'], [r['out'] for r in results]
+            )
+            self.assertEqual(
+                ['validated\n'] * 2, [r['err'] for r in results]
+            )
+
+    def test_batch_option(self):
+        """
+        Test the --batch option
+        """
+        out = iostream()
+        with mock.patch('sys.stdin', iostream(RECORDS)):
+            with self.assertRaises(SystemExit) as e:
+                calc(out=out).run(['--batch'])
+        self.assertEqual(3, e.exception.code)
+        self.check(out.getvalue())
@@ -0,0 +1,174 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import cache, streams
+
+
+class inventory(ilcli.Command):
+    """list an inventory"""
+    result_cache_env = ['INVENTORY_TOKEN']
+
+    def _init_arguments(self):
+        self.add_argument('kind')
+
+    def _validate_extra_arguments(self, extra_args):
+        pass
+
+    def _run(self, args):
+        self._parent.runs += 1
+        self.out('%s %d', args.kind, self._parent.runs)
+        self.err('warning')
+        return 0 if args.kind != 'broken' else 3
+
+
+class tool(ilcli.Command):
+    subcommands = [inventory]
+    result_cache_ttl = 60
+    result_cache_size = 3
+
+    def _init_arguments(self):
+        self.runs = 0
+        self.add_argument('--region', default='eu')
+
+
+class ResultCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.tmp})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cmd = tool()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_cmd(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        with streams.capture(out, err):
+            retcode = self.cmd.run(list(args))
+        return retcode, out.getvalue(), err.getvalue()
+
+    def test_cached(self):
+        """
+        Test that results are cached by arguments and environment
+        """
+        expected = (0, 'a 1\n', 'warning\n')
+        self.assertEqual(expected, self.run_cmd('inventory', 'a'))
+        self.assertEqual(expected, self.run_cmd('inventory', 'a'))
+        self.assertEqual(
+            (0, 'a 2\n', 'warning\n'),
+            self.run_cmd('inventory', 'a', '--region', 'us')
+        )
+        with mock.patch.dict(os.environ, {'INVENTORY_TOKEN': 'x'}):
+            self.assertEqual(
+                (0, 'a 3\n', 'warning\n'), self.run_cmd('inventory', 'a')
+            )
+        self.assertEqual(
+            (0, 'a 4\n', 'warning\n'),
+            self.run_cmd('inventory', 'a', '--x', 'y')
+        )
+
+        # a new process
+        self.cmd = tool()
+        self.assertEqual(
+            (0, 'a 4\n', 'warning\n'),
+            self.run_cmd('inventory', 'a', '--x', 'y')
+        )
+        self.assertEqual(0, self.cmd.runs)
+
+    def test_no_cache(self):
+        """
+        Test that --no-cache runs the command, and failures are not cached
+        """
+        self.run_cmd('inventory', 'a')
+        self.assertEqual(
+            (0, 'a 2\n', 'warning\n'),
+            self.run_cmd('inventory', 'a', '--no-cache')
+        )
+        self.assertEqual(3, self.run_cmd('inventory', 'broken')[0])
+        self.assertEqual(3, self.run_cmd('inventory', 'broken')[0])
+        self.assertEqual(4, self.cmd.runs)
+
+    def test_expired(self):
+        """
+        Test that results expire
+        """
+        with mock.patch('time.time', return_value=1000):
+            self.run_cmd('inventory', 'a')
+            self.run_cmd('inventory', 'a')
+        with mock.patch('time.time', return_value=1060):
+            self.assertEqual(
+                (0, 'a 2\n', 'warning\n'), self.run_cmd('inventory', 'a')
+            )
+
+    def test_evicted(self):
+        """
+        Test that only the most recently used results are kept
+        """
+        for kind in ['a', 'b', 'c', 'a', 'd']:
+            self.run_cmd('inventory', kind)
+            # so modification times differ
+            time.sleep(0.02)
+        directory = cache.directory(self.cmd._subcommands[0])
+        self.assertEqual(3, len(os.listdir(directory)))
+        self.assertEqual(4, self.cmd.runs)
+        self.run_cmd('inventory', 'a')
+        self.assertEqual(4, self.cmd.runs)
+        self.run_cmd('inventory', 'b')
+        self.assertEqual(5, self.cmd.runs)
+
+    def test_other_cli(self):
+        """
+        Test that CLIs with the same name do not share results, and
+        results are only readable by the user
+        """
+        class other(tool):
+            name = 'tool'
+
+        self.run_cmd('inventory', 'a')
+        self.cmd = other()
+        self.assertEqual(
+            (0, 'a 1\n', 'warning\n'), self.run_cmd('inventory', 'a')
+        )
+        self.assertNotEqual(
+            cache.directory(tool()._subcommands[0]),
+            cache.directory(self.cmd._subcommands[0])
+        )
+
+        directory = cache.directory(self.cmd._subcommands[0])
+        for name in os.listdir(directory):
+            mode = os.stat(os.path.join(directory, name)).st_mode
+            self.assertEqual(0o600, mode & 0o777)
+
+    def test_not_comparable(self):
+        """
+        Test that arguments with values which cannot be compared
+        between processes are not cached
+        """
+        args = argparse.Namespace(log=io.StringIO())
+        self.assertIsNone(cache.key(self.cmd, args))
+        self.assertIsNotNone(cache.key(self.cmd, argparse.Namespace(n=[1])))
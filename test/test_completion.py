@@ -0,0 +1,208 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess as sp
+import tempfile
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import completion
+
+from .helpers import iostream
+
+
+def hosts(prefix):
+    return ['alpha', 'beta', 'alpine']
+
+
+class ssh(ilcli.Command):
+    """ssh into a host"""
+
+    def _init_arguments(self):
+        self.add_argument('host', completer=hosts)
+        self.add_argument('mode', choices=['fast', 'slow'])
+        self.add_argument('-p', '--port', type=int)
+        self.add_argument('--cipher', choices=['aes', 'chacha'])
+
+    def _run(self, args):
+        self.out('%s %s', args.host, args.mode)
+        return 0
+
+
+class ping(ilcli.Command):
+    """ping a host"""
+
+
+class net(ilcli.Command):
+    """network tools"""
+    subcommands = [ssh, ping]
+
+
+class mycli(ilcli.Command):
+    completion_mode = True
+    subcommands = [net]
+
+    def _init_arguments(self):
+        self.add_argument('-v', '--verbose', action='store_true')
+
+
+def requires(program):
+    return unittest.skipIf(
+        shutil.which(program) is None, '{} is not installed'.format(program)
+    )
+
+
+class CompletionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        environ = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.tmp})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.cmd = mycli()
+        self.index = completion.write_index(self.cmd)
+
+    def lookup(self, line):
+        words = line.split(' ')
+        env = dict(
+            os.environ, ILCLI_WORDS='\037'.join(words[:-1]),
+            ILCLI_CUR=words[-1]
+        )
+        return sp.check_output(
+            ['awk', completion.AWK, self.index], env=env,
+            universal_newlines=True
+        ).splitlines()
+
+    def test_index(self):
+        """
+        Test the index contains every node with its arguments
+        """
+        lines = list(completion.index_lines(self.cmd))
+        self.assertIn(('', 'c', 'net'), lines)
+        self.assertIn(('net', 'c', 'ping'), lines)
+        self.assertIn(('net ssh', 'o', '--port', '1'), lines)
+        self.assertIn(('net ssh', 'o', '--verbose', '0'), lines)
+        self.assertIn(('net ssh', 'p', '#1', '1'), lines)
+        self.assertIn(('net ssh', 'v', '#1', 'slow'), lines)
+        self.assertIn(('net ssh', 'd', '#0'), lines)
+        # lines of a node are written together, before its subcommands
+        paths = [fields[0] for fields in lines]
+        self.assertEqual(['', 'net', 'net ssh', 'net ping'], sorted(
+            set(paths), key=paths.index
+        ))
+        self.assertEqual(paths, sorted(paths, key=paths.index))
+
+    @requires('awk')
+    def test_lookup(self):
+        """
+        Test completions are looked up in the index
+        """
+        self.assertEqual(['net'], self.lookup(''))
+        self.assertEqual(['ssh', 'ping'], self.lookup('net '))
+        self.assertEqual(['ping'], self.lookup('net p'))
+        self.assertEqual(['--port'], self.lookup('net ssh --p'))
+        self.assertEqual(['aes', 'chacha'], self.lookup('net ssh --cipher '))
+        self.assertEqual(['--cipher=aes'], self.lookup('net ssh --cipher=a'))
+        self.assertEqual(['fast'], self.lookup('net ssh -p 22 host f'))
+        self.assertEqual(['@files'], self.lookup('net ssh --port '))
+        self.assertEqual(
+            ['@dynamic\037#0\037al\037'], self.lookup('net ssh -v al')
+        )
+
+    def test_dynamic(self):
+        """
+        Test dynamic completers are run by the CLI
+        """
+        out = iostream()
+        cmd = mycli(out=out)
+        env = {
+            'ILCLI_COMPLETE': '#0', 'ILCLI_WORDS': 'net\037ssh',
+            'ILCLI_CUR': 'al'
+        }
+        with mock.patch.dict(os.environ, env):
+            self.assertEqual(0, cmd.run(['ignored']))
+        self.assertEqual('alpha\nalpine\n', out.getvalue())
+        self.assertEqual(
+            [], completion.complete(cmd, ['net', 'ssh'], '--nope', '')
+        )
+
+    def test_not_enabled(self):
+        """
+        Test completion requests are ignored without completion_mode
+        """
+        out = iostream()
+        with mock.patch.dict(os.environ, {'ILCLI_COMPLETE': '@index'}):
+            self.assertEqual(0, ssh(out=out).run(['h', 'fast']))
+        self.assertEqual('h fast\n', out.getvalue())
+
+    def test_scripts(self):
+        """
+        Test the scripts use the index of the command
+        """
+        for shell in completion.SHELLS:
+            script = completion.script(self.cmd, shell)
+            self.assertIn(completion.index_path(self.cmd), script)
+            self.assertIn('_ilcli_mycli', script)
+            self.assertNotIn('@AWK@', script)
+
+    def test_index_path(self):
+        """
+        Test CLIs with the same name do not share their index, and the
+        scripts get it written where they read it
+        """
+        class other(mycli):
+            name = 'mycli'
+
+        self.assertNotEqual(
+            completion.index_path(self.cmd), completion.index_path(other())
+        )
+
+        path = os.path.join(self.tmp, 'other.idx')
+        with mock.patch.dict(
+            os.environ, {'ILCLI_COMPLETE': '@index', 'ILCLI_INDEX': path}
+        ):
+            self.assertEqual(0, other().run([]))
+        with open(path) as f:
+            self.assertIn('\tc\tnet\n', f.read())
+
+    @requires('bash')
+    def test_bash(self):
+        """
+        Test the bash script completes the current word
+        """
+        path = os.path.join(self.tmp, 'mycli.bash')
+        with open(path, 'w') as f:
+            f.write(completion.script(self.cmd, 'bash'))
+        code = '\n'.join([
+            'source {}'.format(path),
+            'COMP_LINE="mycli net ssh --cipher=a"',
+            'COMP_POINT=${#COMP_LINE}',
+            '_ilcli_mycli',
+            'echo "${COMPREPLY[@]}"',
+            'COMP_LINE="mycli net "',
+            'COMP_POINT=${#COMP_LINE}',
+            '_ilcli_mycli',
+            'echo "${COMPREPLY[@]}"',
+        ])
+        self.assertEqual(
+            'aes\nssh ping\n',
+            sp.check_output(['bash', '-c', code], universal_newlines=True)
+        )
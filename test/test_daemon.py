@@ -0,0 +1,169 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import signal
+import socket
+import subprocess as sp
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import daemon
+
+
+class greet(ilcli.Command):
+    """greet someone"""
+
+    def _init_arguments(self):
+        self.add_argument('name')
+
+    def _run(self, args):
+        self.state.append(args.name)
+        self.out('hello %s from %s (%s)', args.name, os.getcwd(),
+                 os.environ.get('GREETING'))
+        self.err('seen: %s', ' '.join(self.state))
+        return 3
+
+
+class tool(ilcli.Command):
+    subcommands = [greet]
+    serve_daemon = True
+
+    def _init_arguments(self):
+        greet.state = []
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork is required')
+@unittest.skipUnless(hasattr(socket, 'send_fds'), 'Python 3.9 is required')
+class DaemonTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'tool.sock')
+        self.server = sp.Popen(
+            [sys.executable, '-c',
+             'from ilcli import daemon; from test import test_daemon; '
+             'daemon.serve(test_daemon.tool(), {!r})'.format(self.path)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        while not os.path.exists(self.path):
+            self.assertIsNone(self.server.poll())
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.server.send_signal(signal.SIGTERM)
+        self.assertEqual(0, self.server.wait())
+        self.assertFalse(os.path.exists(self.path))
+        shutil.rmtree(self.tmp)
+
+    def call(self, argv, **kwargs):
+        with tempfile.TemporaryFile('w+') as out, \
+                tempfile.TemporaryFile('w+') as err:
+            code = daemon.client(
+                self.path, argv, stdio=(0, out.fileno(), err.fileno()),
+                **kwargs
+            )
+            out.seek(0)
+            err.seek(0)
+            return code, out.read(), err.read()
+
+    def test_run(self):
+        """
+        Test that commands run in the daemon with the client context
+        """
+        code, out, err = self.call(
+            ['greet', 'you'], cwd=self.tmp, env={'GREETING': 'hi'}
+        )
+        self.assertEqual(3, code)
+        self.assertEqual('hello you from {} (hi)\n'.format(self.tmp), out)
+        self.assertEqual('seen: you\n', err)
+
+        # state is not shared between requests
+        code, out, err = self.call(['greet', 'me'])
+        self.assertEqual('seen: me\n', err)
+
+    def test_parse_error(self):
+        """
+        Test the exit code and output of arguments errors
+        """
+        code, out, err = self.call(['greet'])
+        self.assertEqual(2, code)
+        self.assertIn('the following arguments are required: name', err)
+
+    def test_client_script(self):
+        """
+        Test the generated standalone client
+        """
+        script = os.path.join(self.tmp, 'client.py')
+        with open(script, 'w') as f:
+            f.write(daemon.client_script(self.path))
+        result = sp.run(
+            [sys.executable, '-S', script, 'greet', 'script'],
+            stdout=sp.PIPE, stderr=sp.PIPE, universal_newlines=True
+        )
+        self.assertEqual(3, result.returncode)
+        self.assertTrue(result.stdout.startswith('hello script'))
+
+    def test_other_user(self):
+        """
+        Test that clients do not send anything to a daemon run by another
+        user
+        """
+        with mock.patch('os.getuid', return_value=os.getuid() + 1):
+            self.assertRaises(PermissionError, self.call, ['greet', 'x'])
+
+
+class SocketPathTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_private_directory(self):
+        """
+        Test that the default socket is in a directory private to the
+        user
+        """
+        with mock.patch.dict(os.environ, {'XDG_RUNTIME_DIR': self.tmp}):
+            path = daemon.default_socket_path(tool())
+        directory = os.path.dirname(path)
+        self.assertEqual(
+            os.path.join(self.tmp, 'ilcli-{}'.format(os.getuid())), directory
+        )
+        daemon._private_directory(directory)
+        self.assertEqual(0o700, os.stat(directory).st_mode & 0o777)
+        daemon._private_directory(directory)
+
+        os.chmod(directory, 0o755)
+        self.assertRaises(
+            PermissionError, daemon._private_directory, directory
+        )
+
+    def test_not_supported(self):
+        """
+        Test that daemon mode is refused without file descriptor passing
+        """
+        with mock.patch.object(daemon, 'socket', object()):
+            self.assertRaises(OSError, daemon.client, 'x.sock')
+            self.assertRaises(OSError, daemon.serve, tool(), 'x.sock')
@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import unittest
+from unittest import mock
+
+import ilcli
+
+from .helpers import iostream
+
+
+class ssh(ilcli.Command):
+    """ssh into a host"""
+    man_page = 'ssh'
+
+    def _init_arguments(self):
+        self.add_argument('host')
+        self.add_argument('--port', type=int, default='22')
+
+
+class ping(ilcli.Command):
+    """ping a host"""
+
+    def _init_arguments(self):
+        self.add_argument('host', nargs='*')
+
+
+class net(ilcli.Command):
+    """network tools"""
+    subcommands = [ssh, ping]
+    man_page = 'net'
+
+    def _init_arguments(self):
+        self.add_argument('-v', '--verbose', action='store_true')
+
+
+class tool(ilcli.Command):
+    subcommands = [net, ping]
+
+
+class options(ilcli.Command):
+    """node command with its own option"""
+    subcommands = [ping]
+
+    def _init_arguments(self):
+        self.parser.add_argument('--zone', default='eu')
+
+
+class DispatchTests(unittest.TestCase):
+
+    def parse(self, parse, args):
+        err = iostream()
+        with contextlib.redirect_stderr(err):
+            try:
+                parsed_args, extra_args = parse(args)
+            except SystemExit as e:
+                return e.code, err.getvalue()
+        parsed_args.func = parsed_args.func.__self__
+        return parsed_args, extra_args
+
+    def assertSameParsing(self, cmd, args):
+        self.assertEqual(
+            self.parse(cmd.parser.parse_known_args, args),
+            self.parse(cmd._parse_known_args, args)
+        )
+
+    def test_same_as_argparse(self):
+        """
+        Test that the fast path parses as argparse does
+        """
+        for cmd_class in (tool, options):
+            cmd = cmd_class()
+            for args in (['net', 'ssh', 'h'],
+                         ['net', 'ssh', 'h', '--port', '2', '-v', 'x'],
+                         ['net', 'ping', 'a', 'b', '--', '-c'],
+                         ['ping'],
+                         ['net', 'ssh'],
+                         ['net', 'ssh', '-h'],
+                         ['net', 'nope'],
+                         ['net', '-v', 'ssh'],
+                         ['--zone', 'us', 'ping'],
+                         ['net'],
+                         []):
+                self.assertSameParsing(cmd, args)
+
+    def test_fallback(self):
+        """
+        Test that argparse is used for anything but subcommand names
+        """
+        cmd = tool()
+        with mock.patch.object(
+            cmd.parser, 'parse_known_args', wraps=cmd.parser.parse_known_args
+        ) as parse:
+            cmd._parse_known_args(['net', 'ssh', 'h'])
+            self.assertFalse(parse.called)
+            cmd._parse_known_args(['net', 'ping', '-v'])
+            self.assertFalse(parse.called)
+            with contextlib.redirect_stderr(iostream()):
+                self.assertRaises(
+                    SystemExit, cmd._parse_known_args, ['net', 'nope']
+                )
+            self.assertTrue(parse.called)
+
+        cmd = options()
+        self.assertIsNone(cmd._dispatch_defaults())
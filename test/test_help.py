@@ -0,0 +1,131 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import snapshot
+
+
+class ssh(ilcli.Command):
+    """ssh into a host"""
+
+    def _init_arguments(self):
+        self.add_argument('host', help='the host to connect to')
+        self.add_argument('-p', '--port', type=int, default=22,
+                          help='the port of the host')
+
+
+class net(ilcli.Command):
+    """network tools"""
+    subcommands = [ssh]
+
+
+class tool(ilcli.Command):
+    subcommands = [net]
+
+
+def _formatted():
+    """
+    Patch argparse so the help messages it formats are counted.
+    """
+    return mock.patch.object(
+        argparse.ArgumentParser, 'format_help', autospec=True,
+        side_effect=lambda parser: 'help of {}\n'.format(parser.prog)
+    )
+
+
+class HelpCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'snapshot.json')
+        patcher = mock.patch.dict(os.environ, {'COLUMNS': '80'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _ssh(self, cmd):
+        return cmd._subcommand('net')._subcommand('ssh')
+
+    def test_cached(self):
+        """
+        Test that the help of a command is only formatted once
+        """
+        parser = self._ssh(tool()).parser
+        with _formatted() as format_help:
+            self.assertEqual('help of tool net ssh\n', parser.format_help())
+            self.assertEqual('help of tool net ssh\n', parser.format_help())
+        self.assertEqual(1, format_help.call_count)
+
+    def test_terminal_width(self):
+        """
+        Test that the help is formatted again when the terminal width
+        changes
+        """
+        parser = self._ssh(tool()).parser
+        wide = parser.format_help()
+        with mock.patch.dict(os.environ, {'COLUMNS': '40'}):
+            narrow = parser.format_help()
+        self.assertNotEqual(wide, narrow)
+        self.assertEqual(wide, parser.format_help())
+        self.assertEqual(
+            argparse.ArgumentParser.format_help(parser), parser.format_help()
+        )
+
+    def test_arguments_changed(self):
+        """
+        Test that the help and usage are formatted again when the
+        arguments change
+        """
+        parser = self._ssh(tool()).parser
+        help, usage = parser.format_help(), parser.format_usage()
+        parser.add_argument('--user', help='the user to log in as')
+        self.assertNotEqual(help, parser.format_help())
+        self.assertIn('--user', parser.format_help())
+        self.assertIn('--user', parser.format_usage())
+        self.assertNotEqual(usage, parser.format_usage())
+
+        parser._actions[-1].help = 'the remote user'
+        self.assertIn('the remote user', parser.format_help())
+
+    def test_snapshot(self):
+        """
+        Test that the help formatted by a tree built from a snapshot is
+        stored in the snapshot for the next invocations
+        """
+        snapshot.compile_snapshot(tool, self.path)
+        expected = self._ssh(tool()).parser.format_help()
+        self.assertEqual(
+            expected, self._ssh(tool.from_snapshot(self.path)).parser
+            .format_help()
+        )
+        with open(self.path) as f:
+            node = json.load(f)['tree']['subcommands']['net']
+        self.assertIn(expected, node['subcommands']['ssh']['help'].values())
+
+        with _formatted() as format_help:
+            parser = self._ssh(tool.from_snapshot(self.path)).parser
+            self.assertEqual(expected, parser.format_help())
+        self.assertEqual(0, format_help.call_count)
@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import unittest
+
+import ilcli
+
+from .helpers import iostream
+
+
+built = []
+
+
+class leaf(ilcli.Command):
+    """a leaf"""
+
+    def __init__(self, *args, **kwargs):
+        built.append(self.__class__.__name__)
+        super(leaf, self).__init__(*args, **kwargs)
+
+    def _init_arguments(self):
+        self.add_argument('target')
+
+    def _run(self, args):
+        self.out('%s %s %s', self.name, args.target, args.verbose)
+        return 0
+
+
+class ssh(leaf):
+    """ssh into a host"""
+
+
+class ping(leaf):
+    """ping a host"""
+
+
+class net(ilcli.Command):
+    """network tools"""
+    subcommands = [ssh, ping]
+
+    def _init_arguments(self):
+        self.add_argument('--port', default='22')
+
+
+class tool(ilcli.Command):
+    subcommands = [net, ping]
+
+    def _init_arguments(self):
+        self.add_argument('-v', '--verbose', action='store_true')
+
+
+class lazytool(tool):
+    name = 'tool'
+    lazy_subcommands = True
+
+
+class LazyTests(unittest.TestCase):
+
+    def setUp(self):
+        del built[:]
+
+    def parse(self, cmd_class, args):
+        err = iostream()
+        with contextlib.redirect_stderr(err):
+            try:
+                return cmd_class().parser.parse_known_args(args), None
+            except SystemExit as e:
+                return e.code, err.getvalue()
+
+    def test_only_selected_path_is_built(self):
+        """
+        Test that only the selected subcommands are built in lazy mode
+        """
+        out = iostream()
+        cmd = lazytool(out=out)
+        self.assertEqual([], built)
+        self.assertEqual(0, cmd.run(['net', 'ssh', 'host', '-v']))
+        self.assertEqual(['ssh'], built)
+        self.assertEqual('ssh host True\n', out.getvalue())
+
+    def test_same_result_as_eager(self):
+        """
+        Test that lazy and eager modes parse the same way
+        """
+        for args in (['net', 'ssh', '--port', '23', '-v', 'h'],
+                     ['ping', 'h', 'extra'],
+                     ['net'],
+                     ['unknown'],
+                     ['net', 'ping', '--bad']):
+            eager = self.parse(tool, args)
+            lazy = self.parse(lazytool, args)
+            if eager[1] is None:
+                eager_ns, eager_extra = eager[0]
+                lazy_ns, lazy_extra = lazy[0]
+                self.assertEqual(eager_extra, lazy_extra)
+                eager_ns.func = lazy_ns.func = None
+                self.assertEqual(eager_ns, lazy_ns)
+            else:
+                self.assertEqual(eager, lazy)
+
+    def test_load_subcommands(self):
+        """
+        Test that the whole tree can be built on demand
+        """
+        cmd = lazytool()
+        cmd.load_subcommands()
+        self.assertEqual(['ping', 'ping', 'ssh'], sorted(built))
+        self.assertEqual(
+            ['net', 'ping'], [c.name for c in cmd._subcommands]
+        )
+        ssh_parser = cmd._subcommands[0]._subcommands[0].parser
+        self.assertIn('--port', ssh_parser.format_help())
+        self.assertIn('--verbose', ssh_parser.format_help())
+
+    def test_unselected_parsers_not_built(self):
+        """
+        Test that the parsers of unselected subcommands are not built in
+        lazy mode, even to list them in the help
+        """
+        def parsers(cmd):
+            return dict.items(cmd._subparsers.choices)
+
+        cmd = lazytool(out=iostream())
+        self.assertEqual([('net', None), ('ping', None)], list(parsers(cmd)))
+        help = cmd.parser.format_help()
+        self.assertIn('{net,ping}', help)
+        self.assertIn('network tools', help)
+        self.assertEqual([('net', None), ('ping', None)], list(parsers(cmd)))
+
+        cmd.run(['net', 'ssh', 'h'])
+        self.assertIsNone(dict.get(cmd._subparsers.choices, 'ping'))
+        net = cmd._subcommand('net')
+        self.assertIs(net.parser, dict.get(cmd._subparsers.choices, 'net'))
+        self.assertIsNone(dict.get(net._subparsers.choices, 'ping'))
+        self.assertEqual(['ssh'], built)
@@ -0,0 +1,158 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import manpage
+
+from .helpers import iostream
+
+PAGE = b'''.\\" a test page
+.TH MYTOOL 1
+.SH NAME
+mytool \\- do things
+.SH "SEE ALSO"
+.BR ls (1)
+.SH OPTIONS
+.SS General
+.TP
+.B \\-\\-verbose
+be \\fIverbose\\fR
+.SS Output
+.TP
+.B \\-\\-color
+use colors
+.SH AUTHOR
+someone
+'''
+
+
+class mytool(ilcli.Command):
+    """do things"""
+    man_page = 'mytool'
+    man_jump_into = 'OPTIONS'
+
+
+class missing(mytool):
+    man_jump_into = 'EXAMPLES'
+
+
+class ManPageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        man1 = os.path.join(self.tmp, 'man', 'man1')
+        os.makedirs(man1)
+        self.path = os.path.join(man1, 'mytool.1.gz')
+        with gzip.open(self.path, 'wb') as f:
+            f.write(PAGE)
+        environ = mock.patch.dict(os.environ, {
+            'MANPATH': os.path.join(self.tmp, 'man'),
+            'XDG_CACHE_HOME': os.path.join(self.tmp, 'cache')
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+        manpage._indexes.clear()
+        self.addCleanup(manpage._indexes.clear)
+
+    def test_locate(self):
+        """
+        Test pages are found in MANPATH
+        """
+        self.assertEqual(self.path, manpage.locate('mytool', 1))
+        self.assertEqual(self.path, manpage.locate(self.path))
+        self.assertIsNone(manpage.locate('mytool', 8))
+        self.assertIsNone(manpage.locate('mytoo', 1))
+
+    def test_index(self):
+        """
+        Test the index of the sections of a page
+        """
+        sections = manpage.index(self.path)
+        self.assertEqual(
+            [('NAME', 1), ('SEE ALSO', 1), ('OPTIONS', 1), ('General', 2),
+             ('Output', 2), ('AUTHOR', 1)],
+            [(s[0], s[1]) for s in sections]
+        )
+        options = sections[2]
+        self.assertEqual(sections[5][2], options[3])
+        self.assertEqual(sections[4][2], sections[3][3])
+
+    def test_cached_index(self):
+        """
+        Test pages are only parsed again when they change
+        """
+        manpage.index(self.path)
+        manpage._indexes.clear()
+        with mock.patch.object(manpage, 'parse') as parse:
+            manpage.index(self.path)
+            self.assertFalse(parse.called)
+            os.utime(self.path, ns=(0, 0))
+            parse.return_value = []
+            self.assertEqual([], manpage.index(self.path))
+            self.assertTrue(parse.called)
+
+    def test_find(self):
+        """
+        Test sections are found by name or by text
+        """
+        self.assertEqual('OPTIONS', manpage.find(self.path, 'options')[0])
+        self.assertEqual('Output', manpage.find(self.path, '--color')[0])
+        self.assertEqual('NAME', manpage.find(self.path, 'things')[0])
+        self.assertIsNone(manpage.find(self.path, 'EXAMPLES'))
+
+    def test_render(self):
+        """
+        Test rendering a section as text
+        """
+        self.assertEqual(
+            'OPTIONS\n\n  General\n\n--verbose\nbe verbose\n\n  Output\n\n'
+            '--color\nuse colors\n',
+            manpage.render(self.path, 'OPTIONS')
+        )
+        self.assertIn('ls(1)', manpage.render(self.path))
+
+    def test_doc_without_man(self):
+        """
+        Test --doc shows the section in a pager if man is not installed
+        """
+        with mock.patch('shutil.which', return_value=None), \
+                mock.patch('pydoc.pager') as pager:
+            with self.assertRaises(SystemExit) as e:
+                mytool().run(['--doc'])
+        self.assertEqual(0, e.exception.code)
+        self.assertTrue(pager.call_args[0][0].startswith('OPTIONS\n'))
+
+    def test_doc_missing_section(self):
+        """
+        Test --doc fails if the section to jump into does not exist
+        """
+        out = iostream()
+        with mock.patch('sys.stdout', out), \
+                mock.patch('subprocess.call') as call:
+            with self.assertRaises(SystemExit) as e:
+                missing().run(['--doc'])
+        self.assertEqual(1, e.exception.code)
+        self.assertFalse(call.called)
+        self.assertIn('unable to find EXAMPLES section', out.getvalue())
@@ -15,9 +15,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import time
 import unittest
 
 import ilcli
+from ilcli import streams
 
 from .helpers import iostream
 
@@ -74,3 +77,104 @@ class PrintTests(unittest.TestCase):
         self.err.seek(0)
         self.err_cmd.err('%s %s', 'hello', 'test!')
         self.assertEqual('hello test!\n', self.err.getvalue())
+
+
+class BufferingTests(unittest.TestCase):
+
+    class block(ilcli.Command):
+        output_buffering = 'block'
+        output_buffer_size = 16
+        output_flush_interval = 60
+
+        def _init_arguments(self):
+            self.add_argument('--fail', action='store_true')
+
+        def _run(self, args):
+            self.out('first')
+            self.written = self._out.getvalue()
+            if args.fail:
+                raise RuntimeError('failed')
+            self.out('second line is long')
+            return 0
+
+    def test_line_buffering_default(self):
+        """
+        Test the output is flushed after every line by default
+        """
+        out = iostream()
+        cmd = PrintTests.out(out=out)
+        self.assertEqual('line', cmd._out_writer.policy)
+        cmd.out('hello')
+        self.assertEqual('hello\n', out.getvalue())
+
+    def test_block_buffering(self):
+        """
+        Test block buffering flushes when full and at the end of run()
+        """
+        out = iostream()
+        cmd = BufferingTests.block(out=out)
+        self.assertEqual(0, cmd.run([]))
+        self.assertEqual('', cmd.written)
+        self.assertEqual('first\nsecond line is long\n', out.getvalue())
+
+    def test_block_buffering_error(self):
+        """
+        Test buffered output is flushed when the command fails
+        """
+        out = iostream()
+        cmd = BufferingTests.block(out=out)
+        with self.assertRaises(RuntimeError):
+            cmd.run(['--fail'])
+        self.assertEqual('first\n', out.getvalue())
+
+    def test_block_buffering_interval(self):
+        """
+        Test buffered output is flushed after the flush interval
+        """
+        out = iostream()
+        cmd = BufferingTests.block(out=out)
+        cmd._out_writer.interval = 0
+        cmd.out('now')
+        self.assertEqual('now\n', out.getvalue())
+
+    def test_block_buffering_timer(self):
+        """
+        Test buffered output is flushed after the flush interval even if
+        nothing else is written
+        """
+        out = iostream()
+        cmd = BufferingTests.block(out=out)
+        cmd._out_writer.interval = 0.1
+        cmd.out('started')
+        self.assertEqual('', out.getvalue())
+        time.sleep(0.5)
+        self.assertEqual('started\n', out.getvalue())
+        self.assertIsNone(cmd._out_writer._timer)
+
+    def test_auto_buffering(self):
+        """
+        Test auto buffering depends on the stream being a TTY
+        """
+        class tty(io.StringIO):
+            def isatty(self):
+                return True
+
+        self.assertEqual('line', streams.Writer(tty(), 'auto').policy)
+        self.assertEqual('block', streams.Writer(iostream(), 'auto').policy)
+        with self.assertRaises(ValueError):
+            streams.Writer(iostream(), 'never')
+
+    def test_shared_writer(self):
+        """
+        Test subcommands share the writers of their parent
+        """
+        class leaf(ilcli.Command):
+            pass
+
+        class root(ilcli.Command):
+            subcommands = [leaf]
+
+        out = iostream()
+        cmd = root(out=out)
+        self.assertIs(cmd._out_writer, cmd._subcommands[0]._out_writer)
+        self.assertIs(cmd._err_writer, cmd._subcommands[0]._err_writer)
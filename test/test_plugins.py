@@ -0,0 +1,143 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import plugins
+
+from .helpers import iostream
+
+MODULE = __name__.rpartition('.')[0] + '.subcommand_ref'
+
+
+class mycli(ilcli.Command):
+    plugin_group = 'ilcli_test.commands'
+
+    def _init_arguments(self):
+        self.add_argument('-v', '--verbose', action='store_true')
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec('importlib.metadata')
+    or importlib.util.find_spec('importlib_metadata'),
+    'importlib.metadata (or importlib_metadata) is required'
+)
+class PluginTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.site = os.path.join(self.tmp, 'site')
+        self.install('netplugin', [
+            'network = {}:net'.format(MODULE),
+            'broken = {}'.format(MODULE),
+        ])
+        sys.path.insert(0, self.site)
+        self.addCleanup(sys.path.remove, self.site)
+        environ = mock.patch.dict(
+            os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp, 'cache')}
+        )
+        environ.start()
+        self.addCleanup(environ.stop)
+        plugins._discovered.clear()
+        self.addCleanup(plugins._discovered.clear)
+        sys.modules.pop(MODULE, None)
+
+    def install(self, name, entry_points):
+        info = os.path.join(self.site, '{}-1.0.dist-info'.format(name))
+        os.makedirs(info)
+        with open(os.path.join(info, 'METADATA'), 'w') as f:
+            f.write('Metadata-Version: 2.1\nName: {}\nVersion: 1.0\n'
+                    'Summary: {} tools\n'.format(name, name))
+        with open(os.path.join(info, 'entry_points.txt'), 'w') as f:
+            f.write('[ilcli_test.commands]\n')
+            f.write('\n'.join(entry_points) + '\n')
+
+    def test_discover(self):
+        """
+        Test plugins are discovered and imported only when used
+        """
+        out = iostream()
+        cmd = mycli(out=out)
+        self.assertEqual(['network'], [c.name for c in cmd.subcommands])
+        self.assertEqual('netplugin tools', cmd.subcommands[0].__doc__)
+        self.assertNotIn(MODULE, sys.modules)
+
+        self.assertEqual(0, cmd.run(['network', 'ping', 'h', '-v']))
+        self.assertEqual('ping h True\n', out.getvalue())
+
+        help_out = iostream()
+        with contextlib.redirect_stdout(help_out):
+            with self.assertRaises(SystemExit):
+                mycli().run(['-h'])
+        self.assertIn('netplugin tools', help_out.getvalue())
+
+    def test_cached_index(self):
+        """
+        Test distributions are only scanned when sys.path changes
+        """
+        plugins.load_index(mycli.plugin_group)
+        self.assertTrue(os.path.exists(plugins.index_path(mycli.plugin_group)))
+        with mock.patch.object(plugins, 'scan') as scan:
+            entry_points = plugins.load_index(mycli.plugin_group)
+            self.assertFalse(scan.called)
+        self.assertEqual(['network'], [e['name'] for e in entry_points])
+
+        self.install('dbplugin', ['db = {}:ping'.format(MODULE)])
+        os.utime(self.site, ns=(0, 0))
+        entry_points = plugins.load_index(mycli.plugin_group)
+        self.assertEqual(
+            ['db', 'network'], sorted(e['name'] for e in entry_points)
+        )
+
+    def test_index_key_current_directory(self):
+        """
+        Test changes of the current directory do not invalidate the
+        cached indexes
+        """
+        cwd = os.getcwd()
+        os.chdir(self.tmp)
+        self.addCleanup(os.chdir, cwd)
+        sys.path[:0] = ['', self.tmp]
+        self.addCleanup(sys.path.remove, '')
+        self.addCleanup(sys.path.remove, self.tmp)
+
+        key = plugins.index_key()
+        os.utime(self.tmp, ns=(0, 0))
+        self.assertEqual(key, plugins.index_key())
+        os.utime(self.site, ns=(0, 0))
+        self.assertNotEqual(key, plugins.index_key())
+
+    def test_builtin_precedence(self):
+        """
+        Test built-in subcommands take precedence over plugins
+        """
+        class network(ilcli.Command):
+            """built-in"""
+
+        class other(mycli):
+            subcommands = [network]
+
+        self.assertEqual([network], plugins.subcommands(other))
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+import ilcli
+
+from .helpers import iostream
+
+
+def work():
+    return sum(range(1000))
+
+
+class slow(ilcli.Command):
+    """slow command"""
+
+    def _run(self, args):
+        self.out('total %d', work())
+        return 0
+
+
+class root(ilcli.Command):
+    profile_mode = True
+    subcommands = [slow]
+
+
+class ProfileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.out = iostream()
+        self.err = iostream()
+        self.cmd = root(out=self.out, err=self.err)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_no_profile(self):
+        """
+        Test commands are not profiled without --profile
+        """
+        self.assertEqual(0, self.cmd.run(['slow']))
+        self.assertEqual('total 499500\n', self.out.getvalue())
+        self.assertEqual('', self.err.getvalue())
+
+    def test_summary(self):
+        """
+        Test --profile writes a summary of the command's own work
+        """
+        self.assertEqual(0, self.cmd.run(['slow', '--profile']))
+        self.assertEqual('total 499500\n', self.out.getvalue())
+        summary = self.err.getvalue()
+        self.assertIn('cumulative', summary)
+        self.assertIn('(work)', summary)
+        self.assertNotIn('_parse_known_args', summary)
+
+    def test_pstats(self):
+        """
+        Test --profile=FILE writes pstats data
+        """
+        path = os.path.join(self.dir, 'slow.prof')
+        self.assertEqual(0, self.cmd.run(['slow', '--profile', path]))
+        stats = pstats.Stats(path).stats
+        self.assertIn('work', set(func[2] for func in stats))
+        self.assertIn(path, self.err.getvalue())
+
+    def test_callgrind(self):
+        """
+        Test --profile=FILE writes callgrind data
+        """
+        path = os.path.join(self.dir, 'callgrind.out.slow')
+        self.assertEqual(0, self.cmd.run(['slow', '--profile', path]))
+        with open(path) as f:
+            data = f.read()
+        self.assertTrue(data.startswith('events: Microseconds\n'))
+        self.assertIn('fn=work:', data)
+        self.assertIn('cfn=work:', data)
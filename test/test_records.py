@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import json
+import subprocess as sp
+import sys
+import unittest
+
+import ilcli
+from ilcli import records
+
+from .helpers import iostream
+
+
+class listing(ilcli.Command):
+    """list things"""
+
+    def _run(self, args):
+        for i in range(3):
+            self.emit({'name': 'item{}'.format(i), 'size': i})
+        return 0
+
+
+class nested(ilcli.Command):
+    """list nested things"""
+
+    def _run(self, args):
+        self.emit({'name': 'a,b', 'tags': ['x', 'y']})
+        self.emit({'name': 'c'})
+        return 0
+
+
+class root(ilcli.Command):
+    record_formats = ['ndjson', 'csv']
+    subcommands = [listing, nested]
+
+
+class RecordsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.out = iostream()
+        self.cmd = root(out=self.out)
+
+    def test_ndjson(self):
+        """
+        Test records are written as JSON lines by default
+        """
+        self.assertEqual(0, self.cmd.run(['listing']))
+        lines = self.out.getvalue().splitlines()
+        self.assertEqual(
+            [{'name': 'item0', 'size': 0}, {'name': 'item1', 'size': 1},
+             {'name': 'item2', 'size': 2}],
+            [json.loads(line) for line in lines]
+        )
+
+    def test_csv(self):
+        """
+        Test records are written as CSV with the inherited --output
+        """
+        self.assertEqual(0, self.cmd.run(['listing', '--output', 'csv']))
+        self.assertEqual(
+            'name,size\nitem0,0\nitem1,1\nitem2,2\n', self.out.getvalue()
+        )
+
+    def test_csv_header_per_run(self):
+        """
+        Test every invocation writes its own CSV header
+        """
+        self.cmd.run(['listing', '--output', 'csv'])
+        self.cmd.run(['listing', '--output', 'csv'])
+        self.assertEqual(2, self.out.getvalue().count('name,size\n'))
+
+    def test_csv_nested(self):
+        """
+        Test CSV quoting, nested values and missing keys
+        """
+        self.cmd.run(['nested', '--output', 'csv'])
+        self.assertEqual(
+            'name,tags\n"a,b","[""x"",""y""]"\nc,\n', self.out.getvalue()
+        )
+
+    def test_unknown_format(self):
+        """
+        Test --output only accepts the formats of the command
+        """
+        err = iostream()
+        with contextlib.redirect_stderr(err):
+            with self.assertRaises(SystemExit):
+                self.cmd.run(['listing', '--output', 'xml'])
+        self.assertIn("invalid choice: 'xml'", err.getvalue())
+
+    def test_dumps(self):
+        """
+        Test JSON encoding with and without string keys
+        """
+        self.assertEqual('{"a":[1,2]}', records.dumps({'a': [1, 2]}))
+        self.assertEqual('{"1":true}', records.dumps({1: True}))
+
+    def test_lazy_import(self):
+        """
+        Test the records module and its encoders are not imported by
+        CLIs not emitting records
+        """
+        result = sp.run([
+            sys.executable, '-c',
+            'import sys, ilcli; '
+            'print(*sorted({"ilcli.records", "orjson", "csv"} & '
+            'set(sys.modules)))'
+        ], stdout=sp.PIPE, universal_newlines=True, check=True)
+        self.assertEqual('\n', result.stdout)
@@ -0,0 +1,134 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import contextlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import ilcli
+from ilcli import response
+
+from .helpers import iostream
+
+
+class tool(ilcli.Command):
+    response_file_mode = True
+
+    def _init_arguments(self):
+        self.add_argument('names', nargs='*')
+        self.add_argument('--count', type=int, default=0)
+
+    def _validate_extra_arguments(self, extra_args):
+        self.extra = extra_args
+
+    def _run(self, args):
+        self.out('%s %s %s', args.count, ','.join(args.names), self.extra)
+        return 0
+
+
+class ResponseFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _file(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_lines(self):
+        """
+        Test that response files contain an argument per line
+        """
+        path = self._file('args', b'--count\r\n3\na b\n\n-x')
+        self.assertEqual(
+            ['0', '--count', '3', 'a b', '', '-x', '@'],
+            list(response.expand(['0', '@' + path, '@']))
+        )
+        self.assertEqual([], list(response.expand(['@' + self._file(
+            'empty', b''
+        )])))
+
+    def test_nul(self):
+        """
+        Test that response files can contain NUL-terminated arguments
+        """
+        path = self._file('args', b'a\nb\0c\0\xff\0')
+        self.assertEqual(
+            ['a\nb', 'c', os.fsdecode(b'\xff')],
+            list(response.expand(['@' + path]))
+        )
+
+    def test_nested(self):
+        """
+        Test that response files can include other ones, relative to
+        them
+        """
+        os.mkdir(os.path.join(self.tmp, 'sub'))
+        self._file('sub/inner', b'b\n@../last')
+        self._file('last', b'c')
+        path = self._file('outer', b'a\n@sub/inner\nd')
+        self.assertEqual(
+            ['a', 'b', 'c', 'd'], list(response.expand(['@' + path]))
+        )
+
+    def test_cycle(self):
+        """
+        Test that response files including themselves are an error
+        """
+        self._file('a', b'@b')
+        self._file('b', b'x\n@a')
+        with self.assertRaises(response.ResponseFileError) as cm:
+            list(response.expand(['@a'], self.tmp))
+        self.assertIn('includes itself', str(cm.exception))
+
+    def test_run(self):
+        """
+        Test that commands expand response files when they are enabled
+        """
+        args = ['n{}'.format(i) for i in range(1000)]
+        path = self._file(
+            'args', '\n'.join(args + ['--count', '2', '--x', 'y']).encode()
+        )
+        out = iostream()
+        self.assertEqual(0, tool(out=out).run(['@' + path]))
+        self.assertEqual(
+            "2 {} ['--x', 'y']\n".format(','.join(args)), out.getvalue()
+        )
+
+        class plain(tool):
+            response_file_mode = False
+
+        out = iostream()
+        plain(out=out).run(['@' + path])
+        self.assertEqual("0 @{} []\n".format(path), out.getvalue())
+
+    def test_missing(self):
+        """
+        Test that missing response files are argument errors
+        """
+        err = iostream()
+        with contextlib.redirect_stderr(err):
+            with self.assertRaises(SystemExit) as cm:
+                tool().run(['@' + os.path.join(self.tmp, 'missing')])
+        self.assertEqual(2, cm.exception.code)
+        self.assertIn('cannot read response file', err.getvalue())
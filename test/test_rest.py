@@ -0,0 +1,256 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib.util
+import json
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import ilcli
+from ilcli import rest
+
+
+class echo(ilcli.Command):
+    """echo a message"""
+    serve_rest = True
+    rest_workers = 4
+
+    def _init_arguments(self):
+        self.add_argument('msg')
+        self.add_argument('--times', type=int, default=1)
+
+    def _run(self, args):
+        for _ in range(args.times):
+            self.out(args.msg)
+            time.sleep(0.01)
+        print('printed ' + args.msg)
+        self.err('done %s', args.msg)
+        return 0
+
+
+class lines(ilcli.Command):
+    """write lots of lines"""
+    rest_stream_buffer = 2
+    written = 0
+
+    def _init_arguments(self):
+        self.add_argument('count', type=int)
+
+    def _run(self, args):
+        for i in range(args.count):
+            self.out('line %d', i)
+            lines.written = i + 1
+        print('no newline', end='')
+        return 5
+
+
+class ssh(ilcli.Command):
+    """ssh into a host"""
+
+    def _init_arguments(self):
+        self.add_argument('host')
+
+    def _run(self, args):
+        self.out('ssh %s %s', args.host, args.verbose)
+        return 0
+
+
+class net(ilcli.Command):
+    """network tools"""
+    subcommands = [ssh, echo]
+
+
+class tool(ilcli.Command):
+    serve_rest = True
+    subcommands = [net, echo]
+
+    def _init_arguments(self):
+        self.add_argument('-v', '--verbose', action='store_true')
+
+
+class options(ilcli.Command):
+    subcommands = [echo]
+
+    def _init_arguments(self):
+        self.parser.add_argument('--zone', default='eu')
+
+
+flask_required = unittest.skipUnless(
+    importlib.util.find_spec('flask'), 'flask is required'
+)
+
+
+class RoutesTests(unittest.TestCase):
+
+    def test_routes(self):
+        """
+        Test the routing table of a command tree
+        """
+        table = dict((r.path, r) for r in rest.routes(tool()))
+        self.assertEqual(
+            ['/echo', '/net/echo', '/net/ssh'], sorted(table)
+        )
+        route = table['/net/ssh']
+        self.assertEqual('ssh', route.leaf.name)
+        parsed_args, extra_args = route.parse(['host', '-v', 'extra'])
+        self.assertEqual(
+            ('host', True), (parsed_args.host, parsed_args.verbose)
+        )
+        self.assertEqual('ssh', parsed_args.cmd)
+        self.assertEqual(['extra'], extra_args)
+
+    def test_routes_with_node_options(self):
+        """
+        Test routes whose parents need to be parsed by argparse
+        """
+        route = rest.routes(options())[0]
+        self.assertIsNone(route.values)
+        self.assertEqual('eu', route.parse(['hi'])[0].zone)
+
+
+@flask_required
+class RestTests(unittest.TestCase):
+
+    #: the served command and the path of echo
+    served, path = echo, '/'
+
+    def setUp(self):
+        self.stdout, self.stderr = sys.stdout, sys.stderr
+        self.pool = ThreadPoolExecutor(echo.rest_workers)
+        self.client = rest.create_app(self.served(), self.pool).test_client()
+
+    def tearDown(self):
+        self.pool.shutdown()
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+
+    def get(self, path, *args):
+        query = [(str(i), a) for i, a in enumerate(args)]
+        return json.loads(self.client.get(path, query_string=query).data)
+
+    def test_run(self):
+        """
+        Test that output is captured per request
+        """
+        self.assertEqual(
+            {'retcode': 0, 'out': 'hi\nprinted hi\n', 'err': 'done hi\n'},
+            self.get(self.path, 'hi')
+        )
+
+    def test_parse_error(self):
+        """
+        Test that argument errors are returned
+        """
+        response = self.get(self.path)
+        self.assertEqual(1, response['retcode'])
+        self.assertIn('required: msg', response['err'])
+
+    def test_concurrent_requests(self):
+        """
+        Test that concurrent requests do not mix their output
+        """
+        responses = {}
+
+        def call(i):
+            responses[i] = self.get(self.path, str(i), '--times', '5')
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for i in range(8):
+            self.assertEqual(
+                '{0}\n{0}\n{0}\n{0}\n{0}\nprinted {0}\n'.format(i),
+                responses[i]['out']
+            )
+            self.assertEqual('done {}\n'.format(i), responses[i]['err'])
+
+
+@flask_required
+class RestTreeTests(RestTests):
+
+    served, path = tool, '/net/echo'
+
+    def test_subcommands(self):
+        """
+        Test that every leaf command is served
+        """
+        self.assertEqual(
+            {'retcode': 0, 'out': 'ssh h True\n', 'err': ''},
+            self.get('/net/ssh', 'h', '-v')
+        )
+        self.assertEqual(404, self.client.get('/net').status_code)
+
+
+@flask_required
+class StreamTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout, self.stderr = sys.stdout, sys.stderr
+        self.pool = ThreadPoolExecutor(2)
+        self.client = rest.create_app(lines(), self.pool).test_client()
+
+    def tearDown(self):
+        self.pool.shutdown()
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+
+    def get(self, *args, **kwargs):
+        query = [(str(i), a) for i, a in enumerate(args)]
+        return self.client.get(
+            '/', query_string=query, headers={'Accept': rest.NDJSON},
+            **kwargs
+        )
+
+    def test_stream(self):
+        """
+        Test streamed responses
+        """
+        response = self.get('3')
+        self.assertEqual(rest.NDJSON, response.mimetype)
+        self.assertEqual(
+            [{'stream': 'out', 'line': 'line 0'},
+             {'stream': 'out', 'line': 'line 1'},
+             {'stream': 'out', 'line': 'line 2'},
+             {'stream': 'out', 'line': 'no newline'},
+             {'retcode': 5}],
+            [json.loads(line) for line in response.data.splitlines()]
+        )
+
+    def test_stream_parse_error(self):
+        """
+        Test streamed argument errors
+        """
+        frames = [json.loads(f) for f in self.get('x').data.splitlines()]
+        self.assertEqual({'retcode': 1}, frames[-1])
+        self.assertTrue(all(f['stream'] == 'err' for f in frames[:-1]))
+
+    def test_client_disconnection(self):
+        """
+        Test that the command stops when the client is gone
+        """
+        lines.written = 0
+        response = self.get('1000', buffered=False)
+        first = next(iter(response.response))
+        self.assertEqual(
+            {'stream': 'out', 'line': 'line 0'}, json.loads(first)
+        )
+        response.close()
+        self.pool.shutdown()
+        self.assertLess(lines.written, 10)
@@ -0,0 +1,165 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import snapshot
+
+from .helpers import iostream
+
+
+class ssh(ilcli.Command):
+    """ssh into a host"""
+    man_page = 'ssh'
+
+    def _init_arguments(self):
+        self.add_argument('host')
+        self.add_argument('-p', '--port', type=int, default=22)
+        self.add_argument('--mode', choices=('a', 'b'), nargs='*')
+
+    def _run(self, args):
+        self.out('%s %s %s %s', args.host, args.port, args.mode, args.debug)
+        return 0
+
+
+class net(ilcli.Command):
+    """network tools"""
+    subcommands = [ssh]
+
+
+class tool(ilcli.Command):
+    subcommands = [net]
+
+    def _init_arguments(self):
+        self.add_argument('-d', '--debug', action='store_true')
+
+
+class dynamic(ilcli.Command):
+
+    def _init_arguments(self):
+        self.add_argument('--size', type=lambda v: int(v) * 2)
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'snapshot.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_same_parsers(self):
+        """
+        Test that a tree built from a snapshot parses as the original
+        """
+        snapshot.compile_snapshot(tool, self.path)
+        cmd = tool.from_snapshot(self.path)
+        self.assertIsNotNone(cmd._snapshot)
+        original = tool()
+
+        args = ['net', 'ssh', 'h', '-p', '2', '--mode', 'a', 'b', '-d']
+        ns, extra = cmd.parser.parse_known_args(args)
+        expected, _ = original.parser.parse_known_args(args)
+        self.assertEqual(2, ns.port)
+        self.assertEqual(set(vars(expected)), set(vars(ns)))
+        ssh_cmd = cmd._subcommands[0]._subcommands[0]
+        self.assertIs(ssh_cmd, ns.doc)
+        self.assertEqual(ssh_cmd._validate_and_run, ns.func)
+        self.assertEqual(
+            original._subcommands[0]._subcommands[0].parser.format_help(),
+            ssh_cmd.parser.format_help()
+        )
+
+        out = iostream()
+        self.assertEqual(0, tool.from_snapshot(self.path, out=out).run(args))
+        self.assertEqual("h 2 ['a', 'b'] True\n", out.getvalue())
+
+    def test_stale_snapshot_is_rebuilt(self):
+        """
+        Test that snapshots are not used when the sources change
+        """
+        snapshot.compile_snapshot(tool, self.path)
+        with open(self.path) as f:
+            data = json.load(f)
+        data['hash'] = 'stale'
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+
+        cmd = tool.from_snapshot(self.path)
+        self.assertIsNone(cmd._snapshot)
+        with open(self.path) as f:
+            self.assertEqual(snapshot.source_hash(tool), json.load(f)['hash'])
+
+    def test_not_static_arguments(self):
+        """
+        Test that trees with not importable objects are not snapshotted
+        """
+        self.assertRaises(
+            snapshot.SnapshotError,
+            snapshot.compile_snapshot, dynamic, self.path
+        )
+        cmd = dynamic.from_snapshot(self.path)
+        self.assertEqual(6, cmd.parser.parse_args(['--size', '3']).size)
+
+        # remembered until the sources change, so the whole tree is not
+        # built again
+        with open(self.path) as f:
+            data = json.load(f)
+        self.assertIsNone(data['tree'])
+        self.assertEqual(snapshot.source_hash(dynamic), data['hash'])
+        with mock.patch.object(dynamic, 'load_subcommands') as load:
+            cmd = dynamic.from_snapshot(self.path)
+            self.assertFalse(load.called)
+        self.assertIsNone(cmd._snapshot)
+        self.assertEqual(6, cmd.parser.parse_args(['--size', '3']).size)
+
+    def test_lazy(self):
+        """
+        Test that trees built from a snapshot only build the selected
+        commands, sharing the decoding of the inherited actions
+        """
+        snapshot.compile_snapshot(tool, self.path)
+        with open(self.path) as f:
+            data = json.load(f)
+        # -d/--debug is stored once for the whole tree
+        debug = [e for e in data['tree']['table']
+                 if e['attrs']['__dict__']['dest'] == 'debug']
+        self.assertEqual(1, len(debug))
+
+        cmd = tool.from_snapshot(self.path, out=iostream())
+        self.assertEqual([], cmd._subcommands)
+        self.assertIn('net', cmd.parser.format_help())
+        self.assertEqual([], cmd._subcommands)
+        cmd.run(['net', 'ssh', 'h'])
+        ssh_cmd = cmd._subcommand('net')._subcommand('ssh')
+        debug_actions = [
+            a for c in (cmd, cmd._subcommand('net'), ssh_cmd)
+            for a in c.parser._actions if a.dest == 'debug'
+        ]
+        self.assertEqual(1, len(debug_actions))
+        ssh_cmd.parser.set_defaults(port=23)
+        out = iostream()
+        other = tool.from_snapshot(self.path, out=out)
+        other.run(['net', 'ssh', 'h'])
+        self.assertEqual('h 22 None False\n', out.getvalue())
@@ -0,0 +1,123 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import ilcli
+from ilcli import snapshot
+
+from .helpers import iostream
+
+MODULE = __name__.rpartition('.')[0] + '.subcommand_ref'
+
+
+class local(ilcli.Command):
+    """local command"""
+
+    def _run(self, args):
+        self.out('local')
+        return 0
+
+
+class mycli(ilcli.Command):
+    subcommands = [
+        local,
+        ilcli.SubcommandRef(MODULE + ':net', help='network tools'),
+        ilcli.SubcommandRef(MODULE + ':ping', name='pong', help='pong'),
+    ]
+
+    def _init_arguments(self):
+        self.add_argument('-v', '--verbose', action='store_true')
+
+
+class SubcommandRefTests(unittest.TestCase):
+
+    def setUp(self):
+        sys.modules.pop(MODULE, None)
+        for ref in mycli.subcommands[1:]:
+            ref._class = None
+        self.out = iostream()
+
+    def test_not_imported(self):
+        """
+        Test referenced modules are not imported until they are used
+        """
+        cmd = mycli(out=self.out)
+        self.assertEqual(0, cmd.run(['local']))
+        self.assertNotIn(MODULE, sys.modules)
+        self.assertEqual(['local'], [c.name for c in cmd._subcommands])
+
+        help_out = iostream()
+        with contextlib.redirect_stdout(help_out):
+            with self.assertRaises(SystemExit):
+                cmd.run(['-h'])
+        self.assertIn('network tools', help_out.getvalue())
+        self.assertNotIn(MODULE, sys.modules)
+
+    def test_run(self):
+        """
+        Test referenced subcommands are imported when selected
+        """
+        cmd = mycli(out=self.out)
+        self.assertEqual(0, cmd.run(['net', 'ping', 'h', '-v']))
+        self.assertIn(MODULE, sys.modules)
+        self.assertEqual(0, cmd.run(['pong', 'h']))
+        self.assertEqual('ping h True\nping h False\n', self.out.getvalue())
+        self.assertEqual(
+            ['net', 'pong'], [c.name for c in cmd._subcommands[1:]]
+        )
+
+    def test_subcommand_help(self):
+        """
+        Test referenced subcommands are imported for their help
+        """
+        cmd = mycli(out=self.out)
+        help_out = iostream()
+        with contextlib.redirect_stdout(help_out):
+            with self.assertRaises(SystemExit):
+                cmd.run(['net', '-h'])
+        self.assertIn('ping a host', help_out.getvalue())
+
+    def test_invalid_path(self):
+        """
+        Test paths without a class name are rejected
+        """
+        self.assertRaises(ValueError, ilcli.SubcommandRef, 'mycli.net')
+
+    def test_snapshot(self):
+        """
+        Test checking a snapshot does not import referenced modules
+        """
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, 'snapshot.json')
+        snapshot.compile_snapshot(mycli, path)
+        self.assertIn(
+            sys.modules[MODULE].__file__, snapshot.source_files(mycli)
+        )
+
+        self.setUp()
+        cmd = mycli.from_snapshot(path, out=self.out)
+        self.assertIsNotNone(cmd._snapshot)
+        self.assertNotIn(MODULE, sys.modules)
+        self.assertEqual(0, cmd.run(['net', 'ping', 'h']))
+        self.assertEqual('ping h False\n', self.out.getvalue())
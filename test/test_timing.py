@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess as sp
+import sys
+import unittest
+
+import ilcli
+from ilcli import timing
+
+from .helpers import iostream
+
+
+class ssh(ilcli.Command):
+    """connect"""
+
+    def _init_arguments(self):
+        self.add_argument('host')
+
+    def _run(self, args):
+        self.out(args.host)
+        return 0
+
+
+class net(ilcli.Command):
+    subcommands = [ssh]
+
+
+class mycli(ilcli.Command):
+    subcommands = [net]
+
+
+class TimingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.timings = []
+        timing.add_hook(self.timings.append)
+
+    def tearDown(self):
+        timing.remove_hook(self.timings.append)
+
+    def phases(self):
+        return [(t.phase, '/'.join(t.path)) for t in self.timings]
+
+    def test_disabled(self):
+        """
+        Test nothing is recorded without hooks
+        """
+        timing.remove_hook(self.timings.append)
+        self.assertFalse(timing.active)
+        mycli(out=iostream()).run(['net', 'ssh', 'host'])
+        timing.add_hook(self.timings.append)
+        self.assertEqual([], self.timings)
+
+    def test_phases(self):
+        """
+        Test every phase of every node is recorded
+        """
+        cmd = mycli(out=iostream())
+        self.assertEqual(
+            [('construct', 'mycli/net/ssh'), ('construct', 'mycli/net'),
+             ('construct', 'mycli')],
+            self.phases()
+        )
+        del self.timings[:]
+        self.assertEqual(0, cmd.run(['net', 'ssh', 'host']))
+        self.assertEqual(
+            [('parse', 'mycli'), ('validate', 'mycli'),
+             ('validate', 'mycli/net'), ('validate', 'mycli/net/ssh'),
+             ('run', 'mycli/net/ssh')],
+            self.phases()
+        )
+        for t in self.timings:
+            self.assertGreaterEqual(t.duration, 0)
+
+    def test_environ(self):
+        """
+        Test timings are written to stderr with ILCLI_TIMING
+        """
+        code = '\n'.join([
+            'import ilcli',
+            'class mycli(ilcli.Command):',
+            '    def _run(self, args):',
+            '        return 0',
+            'mycli().run([])',
+        ])
+        env = dict(os.environ, ILCLI_TIMING='1')
+        result = sp.run(
+            [sys.executable, '-c', code], env=env, stderr=sp.PIPE,
+            universal_newlines=True, check=True
+        )
+        lines = result.stderr.splitlines()
+        self.assertEqual(
+            ['construct', 'parse', 'validate', 'run'],
+            [line.split()[1] for line in lines]
+        )
+        self.assertTrue(all(line.endswith('ms') for line in lines))
@@ -0,0 +1,246 @@
+#! /usr/bin/env python
+# -*- coding:utf-8; mode:python -*-
+
+# Copyright (c) 2020 IBM Corp. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import ilcli
+from ilcli import snapshot, streams, validation
+
+
+class show(ilcli.Command):
+    """show a resource"""
+
+    def _init_arguments(self):
+        self.add_argument('what')
+
+    def _validate_arguments(self, args):
+        self._parent.validated.append(('show', args.what))
+
+    def _run(self, args):
+        self.out('%s %s', args.region, args.what)
+        return 0
+
+
+class cloud(ilcli.Command):
+    subcommands = [show]
+    validation_cache_ttl = 60
+    validation_cache_size = 2
+
+    def _init_arguments(self):
+        self.validated = []
+        self.add_argument('--region', default='eu')
+        self.add_argument('--tags', nargs='*')
+
+    def _validate_arguments(self, args):
+        self.validated.append(('cloud', args.region))
+        if args.region == 'mars':
+            self.err('unknown region')
+            return 1
+
+
+class ValidationCacheTests(unittest.TestCase):
+
+    def run_cmd(self, cmd, args):
+        out, err = io.StringIO(), io.StringIO()
+        with streams.capture(out, err):
+            retcode = cmd.run(args)
+        return retcode, out.getvalue(), err.getvalue()
+
+    def test_cached(self):
+        """
+        Test that ancestors are only validated once for the same values
+        of their arguments
+        """
+        cmd = cloud()
+        for what in ('a', 'b'):
+            self.assertEqual(
+                (0, 'eu {}\n'.format(what), ''),
+                self.run_cmd(cmd, ['show', what])
+            )
+        self.run_cmd(cmd, ['show', 'c', '--region', 'us'])
+        self.run_cmd(cmd, ['show', 'c', '--region', 'us', '--tags', 'x'])
+        self.run_cmd(cmd, ['show', 'c', '--region', 'us', '--tags', 'x'])
+        self.assertEqual([
+            ('cloud', 'eu'), ('show', 'a'), ('show', 'b'),
+            ('cloud', 'us'), ('show', 'c'), ('cloud', 'us'), ('show', 'c'),
+            ('show', 'c')
+        ], cmd.validated)
+
+    def test_failure_cached(self):
+        """
+        Test that failed validations are cached too
+        """
+        cmd = cloud()
+        args = ['show', 'a', '--region', 'mars']
+        self.assertEqual((1, '', 'unknown region\n'), self.run_cmd(cmd, args))
+        self.assertEqual((1, '', ''), self.run_cmd(cmd, args))
+        self.assertEqual(
+            [('cloud', 'mars'), ('show', 'a'), ('show', 'a')], cmd.validated
+        )
+
+    def test_not_cached(self):
+        """
+        Test that validations are not cached by default
+        """
+        class uncached(cloud):
+            validation_cache_ttl = None
+
+        cmd = uncached()
+        self.run_cmd(cmd, ['show', 'a'])
+        self.run_cmd(cmd, ['show', 'a'])
+        self.assertEqual(2, cmd.validated.count(('cloud', 'eu')))
+
+    def test_snapshot(self):
+        """
+        Test that trees built from a snapshot know the arguments of their
+        ancestors
+        """
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'snapshot.json')
+            snapshot.compile_snapshot(cloud, path)
+            cmd = cloud.from_snapshot(path)
+            self.assertIsNotNone(cmd._snapshot)
+            cmd.validated = []
+            self.run_cmd(cmd, ['show', 'a'])
+            self.run_cmd(cmd, ['show', 'a', '--region', 'us'])
+            self.run_cmd(cmd, ['show', 'a'])
+            self.assertEqual(
+                ('help', 'region', 'tags'), cmd._validation_dests
+            )
+            self.assertEqual([
+                ('cloud', 'eu'), ('show', 'a'), ('cloud', 'us'),
+                ('show', 'a'), ('show', 'a')
+            ], cmd.validated)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_cache(self):
+        """
+        Test that cache entries expire and the least recently used ones
+        are evicted
+        """
+        cache = validation.Cache(size=2, ttl=10)
+        with mock.patch('time.monotonic', return_value=100):
+            cache.put('a', 1)
+            cache.put('b', None)
+            self.assertEqual((True, 1), cache.get('a'))
+            cache.put('c', 3)
+            self.assertEqual((False, None), cache.get('b'))
+            cache.put('b', None)
+            self.assertEqual((False, None), cache.get('a'))
+            self.assertEqual((True, None), cache.get('b'))
+            self.assertEqual(2, len(cache))
+        with mock.patch('time.monotonic', return_value=110):
+            self.assertEqual((False, None), cache.get('c'))
+            self.assertEqual(1, len(cache))
+
+    def test_unhashable(self):
+        """
+        Test that values which cannot be hashed are not cached
+        """
+        args = mock.Mock(a={'x': [1, {2}]}, b=[[1], 2])
+        self.assertEqual(
+            ((('x', (1, frozenset([2]))),), ((1,), 2)),
+            validation.key(('a', 'b'), args)
+        )
+        self.assertIsNone(validation.key(('a',), mock.Mock(a=bytearray())))
+
+
+class check(ilcli.Command):
+    """check something"""
+
+    def _init_arguments(self):
+        self.add_argument('what')
+
+    def _validate_arguments(self, args):
+        self._parent.barrier.wait()
+        self.err('checked %s', args.what)
+
+    def _run(self, args):
+        self.out('ok %s', args.what)
+        return 0
+
+
+class concurrent(ilcli.Command):
+    subcommands = [check]
+    concurrent_validation = True
+
+    def _init_arguments(self):
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def _validate_arguments(self, args):
+        self.barrier.wait()
+        self.err('parent checked')
+
+
+class acheck(ilcli.Command):
+    """check something asynchronously"""
+
+    async def _validate_arguments(self, args):
+        await self._parent.events[1].wait()
+        self._parent.events[0].set()
+
+    async def _run(self, args):
+        self.out('ok')
+        return 0
+
+
+class aconcurrent(ilcli.Command):
+    subcommands = [acheck]
+    concurrent_validation = True
+
+    async def _validate_arguments(self, args):
+        self.events[1].set()
+        await asyncio.wait_for(self.events[0].wait(), 5)
+
+
+class ConcurrentValidationTests(unittest.TestCase):
+
+    def test_threads(self):
+        """
+        Test that the validations of a command and its ancestors run
+        concurrently, keeping their output captured
+        """
+        out, err = io.StringIO(), io.StringIO()
+        with streams.capture(out, err):
+            self.assertEqual(0, concurrent().run(['check', 'x']))
+        self.assertEqual('ok x\n', out.getvalue())
+        self.assertEqual(
+            ['', 'checked x', 'parent checked'],
+            sorted(err.getvalue().split('\n'))
+        )
+
+    def test_async(self):
+        """
+        Test that async validations run concurrently
+        """
+        async def run():
+            cmd = aconcurrent()
+            cmd.events = (asyncio.Event(), asyncio.Event())
+            return await cmd.run_async(['acheck'])
+
+        out = io.StringIO()
+        with streams.capture(out, io.StringIO()):
+            self.assertEqual(0, asyncio.run(run()))
+        self.assertEqual('ok\n', out.getvalue())